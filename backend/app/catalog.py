@@ -0,0 +1,110 @@
+"""
+Bulk import and export of the catalog.
+
+Usage:
+    python -m app.catalog import PATH [--format ndjson|csv] [--batch-size N]
+        [--concurrency N] [--checkpoint PATH] [--restart]
+    python -m app.catalog export PATH [--format ndjson|csv] [--batch-size N]
+
+Commands:
+    import: Streams a NDJSON or CSV file of models (`name`, `average_price` and
+        `brand_name`, like `models.json`) into the database in validated bulk batches,
+        creating the missing brands. Progress is checkpointed to `PATH.checkpoint`, so
+        running the same command again after an interruption resumes where it stopped.
+    export: Writes every model to a NDJSON or CSV file readable by `import`, or to the
+        standard output when PATH is `-`.
+
+The format defaults to CSV for `.csv` files and NDJSON otherwise.
+"""
+
+import argparse
+import asyncio
+import sys
+
+from app.config import SEED_BATCH_SIZE, STREAM_BATCH_SIZE
+from app.repositories import close_storage, open_storage
+from app.services.catalog_service import (
+    FORMATS,
+    IMPORT_CONCURRENCY_DEFAULT,
+    export_catalog,
+    import_catalog,
+)
+
+
+def report(message: str):
+    # Progress goes to stderr, so `export -` can be piped.
+    print(message, file=sys.stderr, flush=True)
+
+
+async def import_command(args):
+    try:
+        summary = await import_catalog(
+            args.path,
+            file_format=args.format,
+            batch_size=args.batch_size,
+            concurrency=args.concurrency,
+            checkpoint_path=args.checkpoint,
+            restart=args.restart,
+            report=report,
+        )
+    except ValueError as e:
+        report(str(e))
+        raise SystemExit(1)
+    report(
+        f"Importación completa: {summary['rows']} filas, "
+        f"{summary['models_inserted']} modelos y {summary['brands_created']} marcas "
+        f"creados, {summary['duplicates_skipped']} duplicados, "
+        f"{summary['invalid_rows']} inválidos "
+        f"({summary['rows_per_second']:.0f} filas/s)."
+    )
+
+
+async def export_command(args):
+    summary = await export_catalog(
+        args.path, file_format=args.format, batch_size=args.batch_size
+    )
+    report(
+        f"Exportación completa: {summary['rows']} modelos "
+        f"({summary['rows_per_second']:.0f} filas/s)."
+    )
+
+
+COMMANDS = {
+    "import": import_command,
+    "export": export_command,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.catalog")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--format", choices=FORMATS)
+    import_parser.add_argument("--batch-size", type=int, default=SEED_BATCH_SIZE)
+    import_parser.add_argument(
+        "--concurrency", type=int, default=IMPORT_CONCURRENCY_DEFAULT
+    )
+    import_parser.add_argument("--checkpoint")
+    import_parser.add_argument("--restart", action="store_true")
+
+    export_parser = commands.add_parser("export")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--format", choices=FORMATS)
+    export_parser.add_argument("--batch-size", type=int, default=STREAM_BATCH_SIZE)
+
+    args = parser.parse_args(argv)
+    asyncio.run(run(COMMANDS[args.command], args))
+
+
+async def run(command, args):
+    await open_storage()
+    try:
+        await command(args)
+    finally:
+        await close_storage()
+
+
+if __name__ == "__main__":
+    main()
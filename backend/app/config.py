@@ -1,36 +1,228 @@
 import os
 
 """
-This module is responsible for configuring the database connection and collections
-used in the application.
+This module is responsible for the settings of the application, including the database
+connection.
 
 Modules:
     os: Provides a way of using operating system dependent functionality.
-    motor.motor_asyncio: Provides an asynchronous MongoDB driver.
     dotenv: Loads environment variables from a .env file.
 
+The MongoDB client itself is created on startup by `app.database`, from these settings.
+
 Environment Variables:
     MONGO_DETAILS: The MongoDB connection string. Defaults to "mongodb://localhost:27017" 
                    if not provided.
+    MONGO_DB_NAME: The name of the database. Defaults to "pinguea-test".
+    MONGO_MIN_POOL_SIZE: Connections each process keeps open to every server, even when
+                         idle. Defaults to 10.
+    MONGO_MAX_POOL_SIZE: Maximum connections of each process to every server. Defaults
+                         to 100.
+    MONGO_WARMUP_CONNECTIONS: Connections opened on startup, before serving requests.
+                              Defaults to 10.
+    MONGO_COMPRESSORS: Comma-separated wire compressors offered to the server, among
+                       "zstd", "snappy" and "zlib". Defaults to "" (no compression).
+    MONGO_CONNECT_TIMEOUT_MS: Timeout to open a connection. Defaults to 5000.
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: Time to wait for a suitable server before failing
+                                       an operation, or the startup. Defaults to 5000.
+    MONGO_SOCKET_TIMEOUT_MS: Timeout of a read or write on a connection, 0 for none.
+                             Defaults to 20000.
+    MONGO_GET_READ_PREFERENCE: Read preference of the queries of GET requests.
+                               Defaults to "secondaryPreferred".
+    STORAGE_BACKEND: The storage backend of the catalog: "mongo" for MongoDB or "memory"
+                     for the embedded in-memory engine. Defaults to "mongo".
+    MEMORY_JOURNAL_PATH: File where the in-memory engine journals its writes, replayed on
+                         startup. Defaults to "" (no journal, the data is lost on exit).
+    SEQUENCE_BLOCK_SIZE: Number of IDs each process reserves per round trip to the
+                         counters collection. Defaults to 50.
+    SEED_BATCH_SIZE: Number of models written per bulk insert when seeding the database
+                     from `models.json`. Defaults to 1000.
+    PAGE_SIZE_DEFAULT: Page size of the paginated listings when only a cursor is given.
+                       Defaults to 100.
+    PAGE_SIZE_MAX: Largest `limit` accepted by the paginated listings. Defaults to 1000.
+    BATCH_MAX_ITEMS: Maximum number of items accepted by the batch endpoints. Defaults to 1000.
+    CACHE_ENABLED: Whether brands and model listings are cached in memory ("1"/"0").
+                   Defaults to "1".
+    CACHE_MAX_ENTRIES: Maximum number of cached entries per process. Defaults to 1024.
+    CACHE_TTL_SECONDS: Seconds a cached entry is served before it is reloaded. Defaults to 30.
+    SINGLE_FLIGHT_ENABLED: Whether concurrent identical reads of the cached services share
+                           one database load ("1"/"0"). Defaults to "1".
+    PRICE_WRITE_BEHIND_ENABLED: Whether price updates are queued and written in bulk by
+                                `PriceWriteQueue` ("1"/"0"). Defaults to "0".
+    PRICE_WRITE_BATCH_SIZE: Queued models that trigger a flush of the price updates.
+                            Defaults to 500.
+    PRICE_WRITE_FLUSH_SECONDS: Longest time a price update waits in the queue. Defaults to
+                               0.05.
+    PRICE_HISTORY_ENABLED: Whether price updates are appended to the price history of
+                           their model ("1"/"0"). Defaults to "1".
+    PRICE_HISTORY_BUCKET: Period grouped in one price history document, "day" or
+                          "week". Defaults to "day".
+    PRICE_HISTORY_BUCKET_SIZE: Maximum number of price changes per history document.
+                               Defaults to 200.
+    PRICE_INDEX_ENABLED: Whether price range filters are answered from an in-memory sorted
+                         index built at startup ("1"/"0"). Defaults to "0".
+    PRICE_INDEX_CHECK_SECONDS: Interval of the comparisons of the price index of each
+                               process with the models collection, 0 for none.
+                               Defaults to 300.
+    STREAM_BATCH_SIZE: Documents fetched per cursor round trip by the NDJSON streaming
+                       listing. Defaults to 1000.
+    SEARCH_INDEX_ENABLED: Whether `GET /search` is answered from an in-memory index of
+                          the brand and model names built at startup ("1"/"0").
+                          Defaults to "1".
+    CHANGE_STREAM_ENABLED: Whether each process watches the MongoDB change stream to
+                           invalidate its cache and price index on the writes of other
+                           processes ("1"/"0"). Defaults to "1".
+    CHANGE_STREAM_BACKOFF_SECONDS: First delay before reopening a failed change stream,
+                                   doubled on every consecutive failure. Defaults to 0.5.
+    CHANGE_STREAM_BACKOFF_MAX_SECONDS: Longest delay between reopening attempts.
+                                       Defaults to 30.
+    WEB_CONCURRENCY: Number of worker processes started by `app.server`. Defaults to 0,
+                     one per available CPU.
+    SERVER_HOST / SERVER_PORT: Address `app.server` listens on. Defaults to "0.0.0.0"
+                               and 8000.
+    SERVER_BACKLOG: Maximum number of pending connections. Defaults to 2048.
+    SERVER_KEEPALIVE_SECONDS: Seconds an idle keep-alive connection is kept open.
+                              Defaults to 5.
+    SERVER_MAX_REQUESTS: Requests a worker serves before it is replaced by a fresh one,
+                         0 to never recycle them. Defaults to 50000.
+    SERVER_MAX_REQUESTS_JITTER: Random extra requests added to the limit of each worker.
+                                Defaults to 5000.
+    SERVER_GRACEFUL_SHUTDOWN_SECONDS: Time a stopping worker waits for the requests in
+                                      flight. Defaults to 30.
+    METRICS_ENABLED: Whether request latencies and MongoDB command timings are recorded
+                     and served at `/metrics` ("1"/"0"). Defaults to "1".
+    ADMISSION_CONTROL_ENABLED: Whether the API routes limit the requests they handle at
+                               once and shed the excess ("1"/"0"). Defaults to "1".
+    ADMISSION_CONCURRENCY: Requests each route of a worker handles at once. Defaults to
+                           32.
+    ADMISSION_QUEUE_SIZE: Requests each route of a worker keeps waiting for a slot before
+                          answering 503. Defaults to 64.
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: Longest time a request waits for a slot. Defaults
+                                     to 1.
+    ADMISSION_ROUTE_LIMITS: Comma-separated per-route overrides of the two limits, as
+                            `METHOD /path=concurrency[:queue]` (e.g.
+                            `GET /models=8:16`). Defaults to "".
+    ADMISSION_RETRY_AFTER_SECONDS: `Retry-After` of the shed requests. Defaults to 1.
+    REQUEST_DEADLINE_SECONDS: Time an API request has for its MongoDB operations, sent to
+                              the server as their `maxTimeMS`, 0 for none. Defaults
+                              to 10.
 
 Attributes:
     MONGO_DETAILS (str): The MongoDB connection string.
-    client (AsyncIOMotorClient): The asynchronous MongoDB client instance.
-    database (AsyncIOMotorDatabase): The MongoDB database instance.
-    brands_collection (AsyncIOMotorCollection): The MongoDB collection for "brands".
-    models_collection (AsyncIOMotorCollection): The MongoDB collection for "models".
+    MONGO_DB_NAME (str): The name of the database.
+    MONGO_MIN_POOL_SIZE (int): Minimum size of the connection pool.
+    MONGO_MAX_POOL_SIZE (int): Maximum size of the connection pool.
+    MONGO_WARMUP_CONNECTIONS (int): Connections opened on startup.
+    MONGO_COMPRESSORS (str): The wire compressors, comma-separated.
+    MONGO_CONNECT_TIMEOUT_MS (int): Connection timeout.
+    MONGO_SERVER_SELECTION_TIMEOUT_MS (int): Server selection timeout.
+    MONGO_SOCKET_TIMEOUT_MS (int): Socket timeout, 0 for none.
+    MONGO_GET_READ_PREFERENCE (str): Read preference of the GET requests.
+    STORAGE_BACKEND (str): The name of the storage backend.
+    MEMORY_JOURNAL_PATH (str): The journal file of the in-memory engine.
+    SEQUENCE_BLOCK_SIZE (int): Block size of the hi/lo ID allocator.
+    SEED_BATCH_SIZE (int): Batch size of the bulk seeding pipeline.
+    PAGE_SIZE_DEFAULT (int): Default page size of the paginated listings.
+    PAGE_SIZE_MAX (int): Maximum page size of the paginated listings.
+    BATCH_MAX_ITEMS (int): Size limit of the batch endpoints.
+    CACHE_ENABLED (bool): Whether the in-process read cache is enabled.
+    CACHE_MAX_ENTRIES (int): Size bound of the read cache.
+    CACHE_TTL_SECONDS (float): Time to live of the read cache entries.
+    SINGLE_FLIGHT_ENABLED (bool): Whether concurrent identical loads are coalesced.
+    PRICE_WRITE_BEHIND_ENABLED (bool): Whether price updates go through the write queue.
+    PRICE_WRITE_BATCH_SIZE (int): Size threshold of the price write queue.
+    PRICE_WRITE_FLUSH_SECONDS (float): Time threshold of the price write queue.
+    PRICE_HISTORY_ENABLED (bool): Whether the price history is recorded.
+    PRICE_HISTORY_BUCKET (str): Period of a price history bucket.
+    PRICE_HISTORY_BUCKET_SIZE (int): Size bound of a price history bucket.
+    PRICE_INDEX_ENABLED (bool): Whether the in-memory price index is enabled.
+    PRICE_INDEX_CHECK_SECONDS (float): Interval of the price index checks, 0 for none.
+    STREAM_BATCH_SIZE (int): Cursor batch size of the streaming listing.
+    SEARCH_INDEX_ENABLED (bool): Whether the in-memory search index is enabled.
+    CHANGE_STREAM_ENABLED (bool): Whether the change stream watcher runs.
+    CHANGE_STREAM_BACKOFF_SECONDS (float): Initial reconnection delay of the watcher.
+    CHANGE_STREAM_BACKOFF_MAX_SECONDS (float): Maximum reconnection delay of the watcher.
+    METRICS_ENABLED (bool): Whether the request and MongoDB metrics are recorded.
+    ADMISSION_CONTROL_ENABLED (bool): Whether the admission control is enabled.
+    ADMISSION_CONCURRENCY (int): Concurrency limit of each route.
+    ADMISSION_QUEUE_SIZE (int): Size bound of the wait queue of each route.
+    ADMISSION_QUEUE_TIMEOUT_SECONDS (float): Time bound of the wait for a slot.
+    ADMISSION_ROUTE_LIMITS (str): Per-route limits, comma-separated.
+    ADMISSION_RETRY_AFTER_SECONDS (int): Retry delay suggested to the shed requests.
+    REQUEST_DEADLINE_SECONDS (float): Deadline of the API requests, 0 for none.
+    WEB_CONCURRENCY (int): Worker processes of the server, 0 for one per CPU.
+    SERVER_HOST (str): Listening host of the server.
+    SERVER_PORT (int): Listening port of the server.
+    SERVER_BACKLOG (int): Listen backlog of the server.
+    SERVER_KEEPALIVE_SECONDS (int): Keep-alive timeout of the server.
+    SERVER_MAX_REQUESTS (int): Requests served by a worker before it is recycled.
+    SERVER_MAX_REQUESTS_JITTER (int): Jitter of the recycling limit.
+    SERVER_GRACEFUL_SHUTDOWN_SECONDS (int): Graceful shutdown timeout of a worker.
 """
 
-import motor.motor_asyncio
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
 MONGO_DETAILS = os.getenv("MONGO_DETAILS", "mongodb://localhost:27017")
+MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "pinguea-test")
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "10"))
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_WARMUP_CONNECTIONS = int(os.getenv("MONGO_WARMUP_CONNECTIONS", "10"))
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "")
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(
+    os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")
+)
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "20000"))
+MONGO_GET_READ_PREFERENCE = os.getenv("MONGO_GET_READ_PREFERENCE", "secondaryPreferred")
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mongo")
+MEMORY_JOURNAL_PATH = os.getenv("MEMORY_JOURNAL_PATH", "")
 
-client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_DETAILS)
-database = client["pinguea-test"]
+SEQUENCE_BLOCK_SIZE = int(os.getenv("SEQUENCE_BLOCK_SIZE", "50"))
+SEED_BATCH_SIZE = int(os.getenv("SEED_BATCH_SIZE", "1000"))
+PAGE_SIZE_DEFAULT = int(os.getenv("PAGE_SIZE_DEFAULT", "100"))
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "1000"))
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "1000"))
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "1") == "1"
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "30"))
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "1") == "1"
+PRICE_WRITE_BEHIND_ENABLED = os.getenv("PRICE_WRITE_BEHIND_ENABLED", "0") == "1"
+PRICE_WRITE_BATCH_SIZE = int(os.getenv("PRICE_WRITE_BATCH_SIZE", "500"))
+PRICE_WRITE_FLUSH_SECONDS = float(os.getenv("PRICE_WRITE_FLUSH_SECONDS", "0.05"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+PRICE_HISTORY_ENABLED = os.getenv("PRICE_HISTORY_ENABLED", "1") == "1"
+PRICE_HISTORY_BUCKET = os.getenv("PRICE_HISTORY_BUCKET", "day")
+PRICE_HISTORY_BUCKET_SIZE = int(os.getenv("PRICE_HISTORY_BUCKET_SIZE", "200"))
+PRICE_INDEX_ENABLED = os.getenv("PRICE_INDEX_ENABLED", "0") == "1"
+PRICE_INDEX_CHECK_SECONDS = float(os.getenv("PRICE_INDEX_CHECK_SECONDS", "300"))
+SEARCH_INDEX_ENABLED = os.getenv("SEARCH_INDEX_ENABLED", "1") == "1"
+CHANGE_STREAM_ENABLED = os.getenv("CHANGE_STREAM_ENABLED", "1") == "1"
+CHANGE_STREAM_BACKOFF_SECONDS = float(os.getenv("CHANGE_STREAM_BACKOFF_SECONDS", "0.5"))
+CHANGE_STREAM_BACKOFF_MAX_SECONDS = float(
+    os.getenv("CHANGE_STREAM_BACKOFF_MAX_SECONDS", "30")
+)
+ADMISSION_CONTROL_ENABLED = os.getenv("ADMISSION_CONTROL_ENABLED", "1") == "1"
+ADMISSION_CONCURRENCY = int(os.getenv("ADMISSION_CONCURRENCY", "32"))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "64"))
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(
+    os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "1")
+)
+ADMISSION_ROUTE_LIMITS = os.getenv("ADMISSION_ROUTE_LIMITS", "")
+ADMISSION_RETRY_AFTER_SECONDS = int(os.getenv("ADMISSION_RETRY_AFTER_SECONDS", "1"))
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "10"))
 
-brands_collection = database.get_collection("brands")
-models_collection = database.get_collection("models")
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "0"))
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+SERVER_BACKLOG = int(os.getenv("SERVER_BACKLOG", "2048"))
+SERVER_KEEPALIVE_SECONDS = int(os.getenv("SERVER_KEEPALIVE_SECONDS", "5"))
+SERVER_MAX_REQUESTS = int(os.getenv("SERVER_MAX_REQUESTS", "50000"))
+SERVER_MAX_REQUESTS_JITTER = int(os.getenv("SERVER_MAX_REQUESTS_JITTER", "5000"))
+SERVER_GRACEFUL_SHUTDOWN_SECONDS = int(
+    os.getenv("SERVER_GRACEFUL_SHUTDOWN_SECONDS", "30")
+)
@@ -0,0 +1,174 @@
+"""
+MongoDB client of the application.
+
+The client is created by the FastAPI lifespan handler (see `app.main`), not at import
+time, so every worker builds its own pool after it starts, validates the settings and
+the connection before serving requests, and closes the pool on shutdown.
+
+- `connect` builds the client from the `MONGO_*` settings of `app.config`, checks that
+  the server answers, and opens `MONGO_WARMUP_CONNECTIONS` pooled connections up front,
+  so the first requests of a worker do not pay the connection handshakes.
+- `ReadRoutingMiddleware` marks GET and HEAD requests, whose queries the MongoDB
+  repositories send with the `MONGO_GET_READ_PREFERENCE` read preference. Every other
+  request, and any work outside of a request, reads from the primary.
+"""
+
+import asyncio
+import time
+from contextvars import ContextVar
+
+import motor.motor_asyncio
+from app.config import (
+    METRICS_ENABLED,
+    MONGO_COMPRESSORS,
+    MONGO_CONNECT_TIMEOUT_MS,
+    MONGO_DETAILS,
+    MONGO_GET_READ_PREFERENCE,
+    MONGO_MAX_POOL_SIZE,
+    MONGO_MIN_POOL_SIZE,
+    MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    MONGO_SOCKET_TIMEOUT_MS,
+    MONGO_WARMUP_CONNECTIONS,
+)
+from app.utils.metrics import command_timer
+from pymongo.errors import PyMongoError
+from pymongo.read_preferences import make_read_preference, read_pref_mode_from_name
+
+SUPPORTED_COMPRESSORS = ("snappy", "zlib", "zstd")
+READ_METHODS = ("GET", "HEAD")
+
+read_from_secondaries = ContextVar("read_from_secondaries", default=False)
+
+
+def from_primary(loader):
+    """
+    Wrap a loader so its queries read from the primary, even while serving a GET
+    request, e.g. when its result is cached: a lagging secondary could otherwise put a
+    value older than the last write in the cache, where it would stay until it expires.
+    """
+
+    async def load():
+        token = read_from_secondaries.set(False)
+        try:
+            return await loader()
+        finally:
+            read_from_secondaries.reset(token)
+
+    return load
+
+
+def compressors() -> list:
+    return [name.strip() for name in MONGO_COMPRESSORS.split(",") if name.strip()]
+
+
+def validate_settings():
+    """
+    Check the `MONGO_*` settings before any connection is made.
+
+    Raises:
+        RuntimeError: If a setting is out of range or names an unknown option.
+    """
+    errors = []
+    if MONGO_MIN_POOL_SIZE < 0 or MONGO_MAX_POOL_SIZE < 1:
+        errors.append("los tamaños del pool deben ser positivos")
+    if MONGO_MIN_POOL_SIZE > MONGO_MAX_POOL_SIZE:
+        errors.append("MONGO_MIN_POOL_SIZE es mayor que MONGO_MAX_POOL_SIZE")
+    if not 0 <= MONGO_WARMUP_CONNECTIONS <= MONGO_MAX_POOL_SIZE:
+        errors.append(
+            "MONGO_WARMUP_CONNECTIONS debe estar entre 0 y MONGO_MAX_POOL_SIZE"
+        )
+    unknown = [name for name in compressors() if name not in SUPPORTED_COMPRESSORS]
+    if unknown:
+        errors.append(f"compresores desconocidos: {', '.join(unknown)}")
+    try:
+        read_pref_mode_from_name(MONGO_GET_READ_PREFERENCE)
+    except (KeyError, ValueError):
+        errors.append(
+            f"preferencia de lectura desconocida: {MONGO_GET_READ_PREFERENCE}"
+        )
+    if errors:
+        raise RuntimeError(f"Configuración de MongoDB inválida: {'; '.join(errors)}")
+
+
+def get_read_preference():
+    """
+    Return the read preference of the queries issued by GET requests.
+    """
+    return make_read_preference(
+        read_pref_mode_from_name(MONGO_GET_READ_PREFERENCE), None
+    )
+
+
+def create_client(url: str = MONGO_DETAILS):
+    """
+    Build an `AsyncIOMotorClient` with the pool, compression and timeout settings of
+    `app.config`. No connection is made until the client is first used.
+    """
+    options = {
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS or None,
+        "event_listeners": [command_timer] if METRICS_ENABLED else [],
+    }
+    if compressors():
+        options["compressors"] = compressors()
+    return motor.motor_asyncio.AsyncIOMotorClient(url, **options)
+
+
+async def warm_up(client, connections: int = MONGO_WARMUP_CONNECTIONS):
+    """
+    Open up to `connections` pooled connections by sending that many concurrent pings.
+    """
+    if connections:
+        await asyncio.gather(
+            *(client.admin.command("ping") for _ in range(connections))
+        )
+
+
+async def connect(url: str = MONGO_DETAILS):
+    """
+    Create the client, check that the server answers and warm up its pool.
+
+    Returns:
+        AsyncIOMotorClient: The connected client.
+
+    Raises:
+        RuntimeError: If the settings are invalid or the server cannot be reached
+            within `MONGO_SERVER_SELECTION_TIMEOUT_MS`.
+    """
+    validate_settings()
+    started = time.perf_counter()
+    client = create_client(url)
+    try:
+        hello = await client.admin.command("hello")
+        await warm_up(client)
+    except PyMongoError as e:
+        client.close()
+        raise RuntimeError(f"No se pudo conectar a MongoDB: {e}") from e
+    topology = f"réplica {hello['setName']}" if "setName" in hello else "servidor único"
+    print(
+        f"Conexión a MongoDB lista en {(time.perf_counter() - started) * 1000:.0f} ms "
+        f"({topology}, {MONGO_WARMUP_CONNECTIONS} conexiones precalentadas)."
+    )
+    return client
+
+
+class ReadRoutingMiddleware:
+    """
+    ASGI middleware that lets the queries of GET and HEAD requests read from secondaries.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in READ_METHODS:
+            await self.app(scope, receive, send)
+            return
+        token = read_from_secondaries.set(True)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            read_from_secondaries.reset(token)
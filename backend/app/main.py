@@ -1,15 +1,83 @@
 import json
+from contextlib import asynccontextmanager
 from pathlib import Path
 
-from app.config import brands_collection, models_collection
-from app.models import BrandCreate, ModelCreate
-from app.routes import brands, models
-from app.services.brand_service import create_brand, get_brand_by_id
-from app.services.model_service import create_model_for_brand
+from app.config import CHANGE_STREAM_ENABLED, METRICS_ENABLED, STORAGE_BACKEND
+from app.database import ReadRoutingMiddleware
+from app.repositories import close_storage, get_storage, open_storage
+from app.routes import brands, health, metrics, models, search, stats
+from app.services.brand_service import get_all_brands, recompute_brand_price_totals
+from app.services.cache import cache
+from app.services.invalidation import change_watcher
+from app.services.price_index import price_index, price_index_check
+from app.services.readiness import readiness
+from app.services.search_index import search_index
+from app.services.seed_service import bulk_populate
+from app.services.write_queue import price_write_queue
+from app.utils.metrics import MetricsMiddleware
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI(title="Backend de Agencia de Automóviles")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Opens the storage backend, warms the process up and closes it when it stops.
+
+    With MongoDB this creates the client of the process, validates the settings and the
+    connection and warms up the pool (see `app.database.connect`), so a worker that
+    cannot reach the database fails on startup instead of on its first requests.
+
+    The rest of the preparation (indexes, initial population, price and search indexes
+    and read cache) runs in the background, tracked by `readiness`: the server accepts
+    connections right away and `/readyz` reports when the process can take traffic.
+
+    With MongoDB, `change_watcher` follows the changes made by the other processes, and
+    the cache and the in-memory indexes are only filled once its stream is open, so no change
+    made in between is missed. Without it, the ETags of the cache are also renewed every
+    `CACHE_TTL_SECONDS` (see `CatalogCache`).
+
+    With the price index enabled, `price_index_check` compares it with the database
+    every `PRICE_INDEX_CHECK_SECONDS` and reports the differences in `/metrics`.
+
+    On shutdown, the price updates still queued in `price_write_queue` are written
+    before the storage is closed.
+    """
+    await open_storage()
+    steps = [
+        ("indexes", startup_ensure_indexes),
+        ("population", startup_db_population),
+    ]
+    # The in-memory engine is private to its single process: nothing else writes to it.
+    watching = (
+        CHANGE_STREAM_ENABLED
+        and STORAGE_BACKEND == "mongo"
+        and (cache.enabled or price_index.enabled or search_index.enabled)
+    )
+    cache.shared_versions = watching or STORAGE_BACKEND != "mongo"
+    if watching:
+        change_watcher.start()
+        steps.append(("change_stream", change_watcher.wait_started))
+    steps += [
+        ("price_index", startup_build_price_index),
+        ("search_index", startup_build_search_index),
+        ("cache", startup_warm_cache),
+    ]
+    readiness.start(steps)
+    price_index_check.start()
+    print(f"Aceptando conexiones {readiness.uptime():.2f}s después del arranque.")
+    try:
+        yield
+    finally:
+        await readiness.stop()
+        await price_index_check.stop()
+        await price_write_queue.drain()
+        if watching:
+            await change_watcher.stop()
+        await close_storage()
+
+
+app = FastAPI(title="Backend de Agencia de Automóviles", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -21,37 +89,42 @@ app.add_middleware(
 
 app.include_router(brands.router)
 app.include_router(models.router)
+app.include_router(stats.router)
+app.include_router(search.router)
+app.include_router(health.router)
+
+app.add_middleware(ReadRoutingMiddleware)
 
+if METRICS_ENABLED:
+    # Added last so it is the outermost middleware and times the whole request.
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics.router)
 
-async def get_or_create_brand_by_name(brand_name: str):
-    brand = await brands_collection.find_one({"name": brand_name})
-    if brand:
-        brand["id"] = brand["_id"]
-        return brand
-    new_brand, error = await create_brand(BrandCreate(name=brand_name))
-    if error:
-        return None
-    return new_brand
+
+async def startup_ensure_indexes():
+    """
+    Creates and verifies the storage indexes before the process reports ready.
+    """
+    await get_storage().ensure_indexes()
 
 
-@app.on_event("startup")
 async def startup_db_population():
     """
     Populates the database with initial data from a JSON file if the database is empty.
 
-    This function checks if the `brands_collection` in the database already contains documents.
+    This function checks if the brands repository of the storage already contains brands.
     If it does, the function skips the population process. Otherwise, it reads data from a
-    `models.json` file located in the parent directory, processes the data, and inserts it
-    into the database.
+    `models.json` file located in the parent directory and loads it with the bulk seeding
+    pipeline of `seed_service.bulk_populate`.
 
     The function performs the following steps:
-    1. Checks if the database already contains brand documents.
+    1. Checks if the database already contains brand documents. Brands created before
+       the running price totals existed get them backfilled.
     2. Reads the `models.json` file if it exists.
-    3. Iterates through the data in the JSON file and:
-       - Retrieves or creates a brand by its name.
-       - Checks if a model for the brand already exists in the database.
-       - Creates a new model for the brand if it does not exist.
-    4. Logs messages for each step, including errors and successful insertions.
+    3. Loads all of its rows in bulk: brands are resolved or created in one pass, model
+       IDs are reserved up front and models are inserted in batches of `SEED_BATCH_SIZE`.
+       Duplicated models are skipped.
+    4. Logs a summary of the load, including the time it took.
 
     Notes:
     - If the `models.json` file is not found, the function logs a message and exits.
@@ -61,53 +134,55 @@ async def startup_db_population():
         Any exceptions raised by the database operations or file handling will propagate.
 
     Dependencies:
-        - `brands_collection`: MongoDB collection for brand documents.
-        - `models_collection`: MongoDB collection for model documents.
-        - `get_or_create_brand_by_name`: Async function to retrieve or create a brand.
-        - `create_model_for_brand`: Async function to create a model for a brand.
-        - `ModelCreate`: Data model for creating a new model.
+        - `get_storage`: The active storage backend, MongoDB or the in-memory engine.
+        - `bulk_populate`: Async function that loads the catalog rows in bulk.
 
     """
-    if await brands_collection.count_documents({}) > 0:
+    brands_repository = get_storage().brands
+    if await brands_repository.count() > 0:
         print("La base de datos ya fue poblada. Saltando carga inicial.")
+        if await brands_repository.count_without_totals():
+            repaired = await recompute_brand_price_totals()
+            print(f"Totales de precios por marca recalculados para {repaired} marcas.")
         return
 
     file_path = Path("../models.json")
     if file_path.exists():
         with file_path.open("r", encoding="utf-8") as f:
             models_data = json.load(f)
-        for item in models_data:
-            brand_name = item.get("brand_name")
-            model_name = item.get("name")
-            average_price = item.get("average_price")
-
-            if average_price is not None and average_price <= 0:
-                average_price = 0
-
-            brand = await get_or_create_brand_by_name(brand_name)
-            if not brand:
-                print(f"Error al procesar la marca: {brand_name}")
-                continue
-
-            existing_model = await models_collection.find_one(
-                {"brand_id": brand["id"], "name": model_name}
-            )
-            if existing_model:
-                print(
-                    f"El modelo {model_name} para la marca {brand_name} ya existe. Saltando."
-                )
-                continue
-
-            new_model, error = await create_model_for_brand(
-                brand["id"], ModelCreate(name=model_name, average_price=average_price)
-            )
-            if error:
-                print(
-                    f"Error al crear el modelo {model_name} para la marca {brand_name}: {error}"
-                )
-            else:
-                print(
-                    f"Modelo {model_name} insertado exitosamente para la marca {brand_name}"
-                )
+        summary = await bulk_populate(models_data)
+        print(
+            f"Carga inicial completada en {summary['elapsed_seconds']:.2f}s: "
+            f"{summary['brands_created']} marcas y {summary['models_inserted']} modelos "
+            f"insertados, {summary['duplicates_skipped']} duplicados y "
+            f"{summary['invalid_rows']} inválidos omitidos."
+        )
     else:
         print("No se encontró el archivo models.json para la población inicial.")
+
+
+async def startup_build_price_index():
+    """
+    Builds the in-memory price index once the database is populated, if enabled.
+    """
+    if price_index.enabled:
+        await price_index.build()
+        print(f"Índice de precios construido con {price_index.count()} modelos.")
+
+
+async def startup_build_search_index():
+    """
+    Builds the in-memory index of the brand and model names, if enabled.
+    """
+    if search_index.enabled:
+        await search_index.build()
+        print(f"Índice de búsqueda construido con {len(search_index)} nombres.")
+
+
+async def startup_warm_cache():
+    """
+    Loads the brand listing into the read cache, if enabled, so the first
+    `GET /brands` of the process is served from memory.
+    """
+    if cache.enabled:
+        await get_all_brands()
@@ -0,0 +1,48 @@
+"""
+Maintenance commands for the catalog database.
+
+Usage:
+    python -m app.maintenance recompute-brand-prices
+
+Commands:
+    recompute-brand-prices: Rebuilds the running price totals (`price_sum` and
+        `price_count`) of every brand from the models collection, repairing any drift.
+
+The price index lives in the memory of each server process, so it is checked by the
+processes themselves (see `PriceIndexCheck`), not by a command.
+"""
+
+import argparse
+import asyncio
+
+from app.repositories import close_storage, open_storage
+from app.services.brand_service import recompute_brand_price_totals
+
+
+async def recompute_brand_prices():
+    repaired = await recompute_brand_price_totals()
+    print(f"Totales de precios recalculados. Marcas corregidas: {repaired}")
+
+
+COMMANDS = {
+    "recompute-brand-prices": recompute_brand_prices,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.maintenance")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    args = parser.parse_args(argv)
+    asyncio.run(run(COMMANDS[args.command]))
+
+
+async def run(command):
+    await open_storage()
+    try:
+        await command()
+    finally:
+        await close_storage()
+
+
+if __name__ == "__main__":
+    main()
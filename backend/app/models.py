@@ -1,6 +1,8 @@
-from typing import List, Optional
+from datetime import datetime
+from typing import Dict, List, Literal, Optional
 
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, TypeAdapter, field_validator
+from typing_extensions import TypedDict
 
 
 class BrandCreate(BaseModel):
@@ -27,7 +29,7 @@ class ModelCreate(BaseModel):
 
     @field_validator("average_price")
     def validate_price(cls, v):
-        if v is not None and v < 0 or v > 0 and v < 100_000:
+        if v is not None and (v < 0 or v > 0 and v < 100_000):
             raise ValueError(
                 "El precio promedio debe siempre debe ser un valor mayor a 100,000.00"
             )
@@ -59,6 +61,22 @@ class ModelUpdate(BaseModel):
         return v
 
 
+class ModelPriceUpdate(ModelUpdate):
+    """
+    A price update for one model of a batch, identified by its ID.
+
+    Attributes:
+        id (int): The ID of the model to update.
+        average_price (float): The new average price, validated as in `ModelUpdate`.
+    """
+
+    id: int
+
+
+ModelCreateList = TypeAdapter(List[ModelCreate])
+ModelPriceUpdateList = TypeAdapter(List[ModelPriceUpdate])
+
+
 class ModelResponse(BaseModel):
     """
     ModelResponse represents the structure of a response model with the following attributes:
@@ -87,3 +105,167 @@ class BrandResponse(BaseModel):
     id: int
     name: str
     average_price: Optional[float] = None
+
+
+class ModelPage(BaseModel):
+    """
+    Represents one page of a paginated model listing.
+
+    Attributes:
+        items (List[ModelResponse]): The models in the page.
+        next_cursor (Optional[str]): Opaque cursor to pass as `after` to fetch the next page.
+            None when this is the last page.
+    """
+
+    items: List[ModelResponse]
+    next_cursor: Optional[str] = None
+
+
+class PriceHistogramBucket(BaseModel):
+    """
+    A bucket of a price histogram.
+
+    Attributes:
+        lower (float): The lower bound of the bucket, included.
+        upper (float): The upper bound of the bucket, excluded except in the last bucket.
+        count (int): The number of prices within the bucket.
+    """
+
+    lower: float
+    upper: float
+    count: int
+
+
+class PriceStats(BaseModel):
+    """
+    The distribution of the prices of a set of models. Models without a price are not
+    counted.
+
+    Attributes:
+        count (int): The number of priced models.
+        min (Optional[float]): The lowest price. None without prices.
+        max (Optional[float]): The highest price. None without prices.
+        mean (Optional[float]): The mean price. None without prices.
+        std (Optional[float]): The population standard deviation of the prices. None
+            without prices.
+        percentiles (Dict[str, float]): The 5th to 99th percentiles, keyed as "p50".
+        histogram (List[PriceHistogramBucket]): Equal-width buckets between `min` and `max`.
+    """
+
+    count: int
+    min: Optional[float]
+    max: Optional[float]
+    mean: Optional[float]
+    std: Optional[float]
+    percentiles: Dict[str, float]
+    histogram: List[PriceHistogramBucket]
+
+
+class SearchResult(BaseModel):
+    """
+    A brand or model matching a search.
+
+    Attributes:
+        type (str): "brand" or "model".
+        id (int): The ID of the brand or model.
+        name (str): The name of the brand or model.
+        brand_id (Optional[int]): The brand of a model. None for brands.
+        brand_name (Optional[str]): The name of the brand of a model. None for brands.
+    """
+
+    type: Literal["brand", "model"]
+    id: int
+    name: str
+    brand_id: Optional[int] = None
+    brand_name: Optional[str] = None
+
+
+class PriceChange(BaseModel):
+    """
+    A change of the price of a model, from its price history.
+
+    Attributes:
+        at (datetime): When the price was updated, in UTC.
+        average_price (float): The price set by the update.
+        previous_price (Optional[float]): The price before the update. None if the model
+            had no price.
+    """
+
+    at: datetime
+    average_price: float
+    previous_price: Optional[float]
+
+
+class ModelRecord(TypedDict):
+    """
+    The shape of a `ModelResponse` as built by the services, for serializing it directly.
+    """
+
+    id: int
+    name: str
+    average_price: Optional[float]
+
+
+class BrandRecord(TypedDict):
+    """
+    The shape of a `BrandResponse` as built by the services, for serializing it directly.
+    """
+
+    id: int
+    name: str
+    average_price: Optional[float]
+
+
+class ModelPageRecord(TypedDict):
+    """
+    The shape of a `ModelPage` as built by the services, for serializing it directly.
+    """
+
+    items: List[ModelRecord]
+    next_cursor: Optional[str]
+
+
+class PriceHistogramBucketRecord(TypedDict):
+    """
+    The shape of a `PriceHistogramBucket` as built by the services.
+    """
+
+    lower: float
+    upper: float
+    count: int
+
+
+class PriceStatsRecord(TypedDict):
+    """
+    The shape of a `PriceStats` as built by the services, for serializing it directly.
+    """
+
+    count: int
+    min: Optional[float]
+    max: Optional[float]
+    mean: Optional[float]
+    std: Optional[float]
+    percentiles: Dict[str, float]
+    histogram: List[PriceHistogramBucketRecord]
+
+
+class SearchResultRecord(TypedDict):
+    """
+    The shape of a `SearchResult` as built by the search index.
+    """
+
+    type: str
+    id: int
+    name: str
+    brand_id: Optional[int]
+    brand_name: Optional[str]
+
+
+# Serializers of the list, stats and search endpoints. They write the dicts of the services
+# straight to JSON with the fields and types of the response models, without building
+# the models.
+BrandResponseList = TypeAdapter(List[BrandRecord])
+ModelResponseList = TypeAdapter(List[ModelRecord])
+ModelPageResponse = TypeAdapter(ModelPageRecord)
+PriceStatsResponse = TypeAdapter(PriceStatsRecord)
+SearchResultList = TypeAdapter(List[SearchResultRecord])
@@ -0,0 +1,87 @@
+"""
+Storage backends of the catalog.
+
+The services never talk to a database directly: they go through the repositories of
+the active `Storage`, returned by `get_storage`. The backend is opened by the lifespan
+handler of the application with `open_storage`, and chosen with the `STORAGE_BACKEND`
+setting of `app.config`:
+
+- `mongo` (default): `MongoStorage`, over a client connected by `app.database`.
+- `memory`: `MemoryStorage`, an embedded engine that keeps the catalog in the memory of
+  the process, optionally journaled to `MEMORY_JOURNAL_PATH`.
+"""
+
+from app.config import MEMORY_JOURNAL_PATH, MONGO_DB_NAME, STORAGE_BACKEND
+from app.database import connect, get_read_preference
+from app.repositories.base import (
+    ChangeStreamHistoryLost,
+    ChangeStreamUnavailable,
+    DuplicateError,
+    Storage,
+    StorageError,
+)
+from app.repositories.memory import MemoryStorage
+from app.repositories.mongo import MongoStorage
+
+
+async def create_storage(backend: str = STORAGE_BACKEND) -> Storage:
+    """
+    Build the storage backend named `backend`, connecting to MongoDB if needed.
+
+    Raises:
+        ValueError: If the backend is unknown.
+        RuntimeError: If the MongoDB settings are invalid or the server is unreachable.
+    """
+    if backend == "mongo":
+        client = await connect()
+        return MongoStorage.from_database(
+            client[MONGO_DB_NAME], read_preference=get_read_preference(), client=client
+        )
+    if backend == "memory":
+        return MemoryStorage(MEMORY_JOURNAL_PATH or None)
+    raise ValueError(f"STORAGE_BACKEND desconocido: {backend}")
+
+
+_storage = None
+
+
+def get_storage() -> Storage:
+    """
+    Return the active storage backend.
+
+    Raises:
+        RuntimeError: If no backend has been opened yet.
+    """
+    if _storage is None:
+        raise RuntimeError("El almacenamiento no ha sido inicializado.")
+    return _storage
+
+
+def use_storage(storage: Storage) -> Storage:
+    """
+    Make `storage` the active storage backend, e.g. in tests or benchmarks.
+
+    Returns:
+        Storage: The previously active backend.
+    """
+    global _storage
+    previous, _storage = _storage, storage
+    return previous
+
+
+async def open_storage(backend: str = STORAGE_BACKEND) -> Storage:
+    """
+    Build the storage backend named `backend` and make it the active one.
+    """
+    storage = await create_storage(backend)
+    use_storage(storage)
+    return storage
+
+
+async def close_storage():
+    """
+    Close the active storage backend, e.g. the MongoDB client, and deactivate it.
+    """
+    storage = use_storage(None)
+    if storage is not None:
+        await storage.close()
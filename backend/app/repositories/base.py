@@ -0,0 +1,326 @@
+from abc import ABC, abstractmethod
+
+
+class StorageError(Exception):
+    """
+    A write rejected by the storage backend.
+    """
+
+
+class DuplicateError(StorageError):
+    """
+    A write rejected because it would break a uniqueness constraint: a brand name, or a
+    model name within its brand.
+    """
+
+
+class ChangeStreamUnavailable(StorageError):
+    """
+    The backend cannot stream its changes, e.g. a standalone MongoDB server.
+    """
+
+
+class ChangeStreamHistoryLost(StorageError):
+    """
+    A change stream cannot be resumed because its resume token is no longer valid, so
+    the changes made since then are unknown.
+    """
+
+
+class BrandRepository(ABC):
+    """
+    Storage of the brand documents.
+
+    Brand documents are dictionaries with an integer `_id`, a unique `name` and the
+    running `price_sum` and `price_count` of their priced models.
+    """
+
+    @abstractmethod
+    async def list_all(self) -> list:
+        """
+        Return every brand with its `_id`, `name`, `price_sum` and `price_count`.
+        """
+
+    @abstractmethod
+    async def get(self, brand_id: int):
+        """
+        Return the brand with the given ID, or None if it does not exist.
+        """
+
+    @abstractmethod
+    async def get_many(self, brand_ids: list) -> list:
+        """
+        Return the stored brands among the given IDs, in no particular order.
+        """
+
+    @abstractmethod
+    async def ids_by_name(self, names: list) -> dict:
+        """
+        Map each of the given names that belongs to a stored brand to the brand ID.
+        """
+
+    @abstractmethod
+    async def search_names(self, text: str, limit: int) -> list:
+        """
+        Return up to `limit` brands whose name contains `text` once both are folded
+        with `app.utils.text.normalize`.
+        """
+
+    @abstractmethod
+    async def insert(self, brand: dict):
+        """
+        Store a new brand.
+
+        Raises:
+            DuplicateError: If a brand with the same ID or name already exists.
+        """
+
+    @abstractmethod
+    async def insert_many(self, brands: list) -> dict:
+        """
+        Store many new brands, independently of each other.
+
+        Returns:
+            dict: Maps the position of every rejected brand to its `StorageError`.
+            Empty if all of them were stored.
+        """
+
+    @abstractmethod
+    async def count(self) -> int:
+        """
+        Return the number of stored brands.
+        """
+
+    @abstractmethod
+    async def count_without_totals(self) -> int:
+        """
+        Return the number of brands that lack the running price totals.
+        """
+
+    @abstractmethod
+    async def increment_totals(self, brand_id: int, sum_delta, count_delta: int):
+        """
+        Atomically add the deltas to the running price totals of a brand.
+        """
+
+    @abstractmethod
+    async def increment_totals_many(self, deltas: dict):
+        """
+        Add `(sum_delta, count_delta)` pairs to the running price totals of many brands.
+        """
+
+    @abstractmethod
+    async def set_totals(self, totals: dict) -> int:
+        """
+        Overwrite the running price totals of every brand.
+
+        Args:
+            totals (dict): Maps brand IDs to `(price_sum, price_count)` pairs. Brands
+                left out get zero totals.
+
+        Returns:
+            int: The number of brands whose totals changed.
+        """
+
+
+class ModelRepository(ABC):
+    """
+    Storage of the model documents.
+
+    Model documents are dictionaries with an integer `_id`, the `brand_id` of their
+    brand, a `name` unique within the brand and an optional `average_price`.
+    """
+
+    @abstractmethod
+    def iter_by_brand(self, brand_id: int):
+        """
+        Iterate asynchronously over the models of a brand.
+        """
+
+    @abstractmethod
+    async def page_by_brand(
+        self, brand_id: int, limit: int, after_id: int = None, descending=False
+    ) -> list:
+        """
+        Return up to `limit` models of a brand sorted by `_id`, after `after_id` if given.
+        """
+
+    @abstractmethod
+    def iter_by_price(self, greater=None, lower=None, batch_size: int = None):
+        """
+        Iterate asynchronously over the models priced strictly between the given bounds.
+
+        Models without a price never match a bound. Without bounds every model is
+        returned. `batch_size` is a hint of how many models to fetch at a time.
+        """
+
+    @abstractmethod
+    async def prices(self, greater=None, lower=None, brand_id: int = None) -> list:
+        """
+        Return the sorted prices strictly between the given bounds, of a brand if given.
+
+        Models without a price are left out, with or without bounds.
+        """
+
+    @abstractmethod
+    async def page_by_price(
+        self, greater, lower, limit: int, after: list = None, descending=False
+    ) -> list:
+        """
+        Return up to `limit` models within the price bounds sorted by
+        `(average_price, _id)`, after the `[average_price, _id]` key `after` if given.
+        Models without a price sort first.
+        """
+
+    @abstractmethod
+    async def get_many(self, model_ids: list) -> list:
+        """
+        Return the stored models among the given IDs, in no particular order.
+        """
+
+    @abstractmethod
+    async def existing_keys(self, keys: list) -> set:
+        """
+        Return the `(brand_id, name)` pairs among the given ones that are already stored.
+        """
+
+    @abstractmethod
+    async def search_names(self, text: str, limit: int) -> list:
+        """
+        Return up to `limit` models whose name contains `text` once both are folded
+        with `app.utils.text.normalize`.
+        """
+
+    @abstractmethod
+    async def insert(self, model: dict):
+        """
+        Store a new model.
+
+        Raises:
+            DuplicateError: If a model with the same ID, or the same name within its
+                brand, already exists.
+        """
+
+    @abstractmethod
+    async def insert_many(self, models: list) -> dict:
+        """
+        Store many new models, independently of each other.
+
+        Returns:
+            dict: Maps the position of every rejected model to its `StorageError`.
+            Empty if all of them were stored.
+        """
+
+    @abstractmethod
+    async def set_price(self, model_id: int, price):
+        """
+        Atomically replace the price of a model.
+
+        Returns:
+            dict or None: The model as it was before the update, or None if it does not exist.
+        """
+
+    @abstractmethod
+    async def set_prices(self, prices: dict):
+        """
+        Replace the price of many models, given as a dict of model ID to price.
+        """
+
+    @abstractmethod
+    async def price_totals_by_brand(self) -> dict:
+        """
+        Compute the `(price_sum, price_count)` of the priced models of every brand.
+        """
+
+
+class PriceHistoryRepository(ABC):
+    """
+    Storage of the price history of the models, in time buckets.
+
+    A bucket document holds the price changes of one model within one period (a day or
+    a week): the `model_id`, the `start` of the period, the `count` of changes and the
+    `changes` themselves, each with the time `at` it was made, the new `price` and the
+    `previous` price. A bucket holds at most `bucket_size` changes; a busier period
+    spreads over several buckets with the same start.
+    """
+
+    @abstractmethod
+    async def append(self, changes: list, bucket_size: int):
+        """
+        Append price changes to the buckets of their models, in order.
+
+        Args:
+            changes (list): Dicts with the `model_id`, the `start` of the bucket and the
+                `at`, `price` and `previous` of the change.
+            bucket_size (int): The maximum number of changes per bucket.
+        """
+
+    @abstractmethod
+    async def buckets(self, model_id: int, since=None, until=None) -> list:
+        """
+        Return the buckets of a model that start in `[since, until)`, sorted by start.
+
+        Either bound may be None, for no bound.
+        """
+
+
+class SequenceRepository(ABC):
+    """
+    Storage of the named counters the IDs are allocated from.
+    """
+
+    @abstractmethod
+    async def claim(self, name: str, count: int) -> int:
+        """
+        Atomically advance the `name` counter by `count`, creating it at 0 if needed.
+
+        Returns:
+            int: The new value of the counter, i.e. the last number claimed.
+        """
+
+
+class Storage(ABC):
+    """
+    A storage backend: the repositories used by the services.
+
+    Attributes:
+        brands (BrandRepository): The brand documents.
+        models (ModelRepository): The model documents.
+        price_history (PriceHistoryRepository): The price history buckets.
+        sequences (SequenceRepository): The ID counters.
+    """
+
+    brands: BrandRepository
+    models: ModelRepository
+    price_history: PriceHistoryRepository
+    sequences: SequenceRepository
+
+    @abstractmethod
+    async def ensure_indexes(self):
+        """
+        Make sure the indexes the repositories rely on exist.
+        """
+
+    def watch(self, resume_after=None, full_document: bool = False):
+        """
+        Open a stream of the changes made to the brands and models by any process.
+
+        Returns an async context manager that yields an async iterator of MongoDB-shaped
+        change events: `_id` (the resume token), `operationType`, `ns.coll`,
+        `documentKey._id` and, with `full_document`, the `fullDocument` after the change
+        (None if it no longer exists).
+
+        Args:
+            resume_after: The `_id` of the last event processed, to resume after it.
+            full_document (bool): Whether to look up the current document of updates.
+
+        Raises:
+            ChangeStreamUnavailable: If the backend has no change stream.
+            ChangeStreamHistoryLost: If `resume_after` can no longer be resumed.
+        """
+        raise ChangeStreamUnavailable("El almacenamiento no tiene flujo de cambios.")
+
+    async def close(self):
+        """
+        Release the resources held by the backend.
+        """
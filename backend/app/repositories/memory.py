@@ -0,0 +1,561 @@
+import asyncio
+import bisect
+import json
+import math
+import os
+from datetime import datetime, timezone
+
+from app.repositories.base import (
+    BrandRepository,
+    DuplicateError,
+    ModelRepository,
+    PriceHistoryRepository,
+    SequenceRepository,
+    Storage,
+)
+from app.utils.text import normalize
+
+
+class Journal:
+    """
+    Append-only log of the writes applied to an in-memory backend, one JSON record
+    per line.
+
+    Every write is appended, flushed and fsynced before it is acknowledged, and the
+    whole log is replayed when the backend starts. A record torn by a crash can only be
+    the last one; it is discarded and the file truncated before new writes are appended.
+    The log is never compacted, so its size and the replay time grow with the number of
+    writes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def replay(self):
+        """
+        Yield the records of the journal, in the order they were written.
+        """
+        if not os.path.exists(self.path):
+            return
+        offset = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                offset += len(line)
+                yield record
+        if offset != os.path.getsize(self.path):
+            os.truncate(self.path, offset)
+
+    def append(self, *records):
+        """
+        Durably append records to the journal.
+        """
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(
+            "".join(
+                json.dumps(record, separators=(",", ":")) + "\n" for record in records
+            )
+        )
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class _MemoryRepository:
+    """
+    Common plumbing of the in-memory repositories.
+
+    Every write is applied by one of the `_apply_<op>` methods, which are also used to
+    replay the journal, so both paths cannot diverge. Writes are only journaled once
+    they were applied.
+    """
+
+    name = None
+
+    def __init__(self, journal: Journal = None):
+        self._journal = journal
+
+    def _write(self, op: str, *args):
+        getattr(self, f"_apply_{op}")(*args)
+        if self._journal is not None:
+            self._journal.append([self.name, op, *args])
+
+
+class MemoryBrandRepository(_MemoryRepository, BrandRepository):
+    """
+    Brands kept in a dict by ID, with a hash index on the name.
+    """
+
+    name = "brands"
+
+    def __init__(self, journal: Journal = None):
+        super().__init__(journal)
+        self._brands = {}
+        self._by_name = {}
+
+    def _apply_insert(self, brand: dict):
+        self._brands[brand["_id"]] = dict(brand)
+        self._by_name[brand["name"]] = brand["_id"]
+
+    def _apply_insert_many(self, brands: list):
+        for brand in brands:
+            self._apply_insert(brand)
+
+    def _apply_increment(self, rows: list):
+        for brand_id, sum_delta, count_delta in rows:
+            brand = self._brands.get(brand_id)
+            if brand is not None:
+                brand["price_sum"] = brand.get("price_sum", 0) + sum_delta
+                brand["price_count"] = brand.get("price_count", 0) + count_delta
+
+    def _apply_set_totals(self, rows: list):
+        for brand_id, price_sum, price_count in rows:
+            self._brands[brand_id]["price_sum"] = price_sum
+            self._brands[brand_id]["price_count"] = price_count
+
+    def _check_unique(self, brand: dict):
+        if brand["_id"] in self._brands or brand["name"] in self._by_name:
+            raise DuplicateError(f"La marca {brand['name']} ya existe")
+
+    async def list_all(self) -> list:
+        return [dict(brand) for brand in self._brands.values()]
+
+    async def get(self, brand_id: int):
+        brand = self._brands.get(brand_id)
+        return dict(brand) if brand is not None else None
+
+    async def get_many(self, brand_ids: list) -> list:
+        return [
+            dict(self._brands[brand_id])
+            for brand_id in dict.fromkeys(brand_ids)
+            if brand_id in self._brands
+        ]
+
+    async def ids_by_name(self, names: list) -> dict:
+        return {name: self._by_name[name] for name in names if name in self._by_name}
+
+    async def search_names(self, text: str, limit: int) -> list:
+        return _search_names(self._brands.values(), text, limit)
+
+    async def insert(self, brand: dict):
+        self._check_unique(brand)
+        self._write("insert", brand)
+
+    async def insert_many(self, brands: list) -> dict:
+        errors = {}
+        accepted = []
+        names = set()
+        for index, brand in enumerate(brands):
+            try:
+                self._check_unique(brand)
+                if brand["name"] in names:
+                    raise DuplicateError(f"La marca {brand['name']} ya existe")
+            except DuplicateError as e:
+                errors[index] = e
+                continue
+            names.add(brand["name"])
+            accepted.append(brand)
+        if accepted:
+            self._write("insert_many", accepted)
+        return errors
+
+    async def count(self) -> int:
+        return len(self._brands)
+
+    async def count_without_totals(self) -> int:
+        return sum("price_count" not in brand for brand in self._brands.values())
+
+    async def increment_totals(self, brand_id: int, sum_delta, count_delta: int):
+        self._write("increment", [[brand_id, sum_delta, count_delta]])
+
+    async def increment_totals_many(self, deltas: dict):
+        self._write(
+            "increment",
+            [
+                [brand_id, sum_delta, count_delta]
+                for brand_id, (sum_delta, count_delta) in deltas.items()
+            ],
+        )
+
+    async def set_totals(self, totals: dict) -> int:
+        rows = []
+        for brand_id, brand in self._brands.items():
+            price_sum, price_count = totals.get(brand_id, (0, 0))
+            if (brand.get("price_sum"), brand.get("price_count")) != (
+                price_sum,
+                price_count,
+            ):
+                rows.append([brand_id, price_sum, price_count])
+        if rows:
+            self._write("set_totals", rows)
+        return len(rows)
+
+
+def _search_names(documents, text: str, limit: int) -> list:
+    text = normalize(text)
+    matches = []
+    for document in documents:
+        if len(matches) == limit:
+            break
+        if text in normalize(document["name"]):
+            matches.append(dict(document))
+    return matches
+
+
+def _price_key(price, model_id: int) -> tuple:
+    # Models without a price sort before any price, as in MongoDB.
+    if price is None:
+        return (0, 0, model_id)
+    return (1, price, model_id)
+
+
+class MemoryModelRepository(_MemoryRepository, ModelRepository):
+    """
+    Models kept in a dict by ID, with a hash index on `(brand_id, name)`, the sorted IDs
+    of every brand and a sorted `(average_price, _id)` index for the price filters and
+    their pagination. Range queries are answered with binary searches.
+    """
+
+    name = "models"
+
+    def __init__(self, journal: Journal = None):
+        super().__init__(journal)
+        self._models = {}
+        self._by_key = {}
+        self._by_brand = {}
+        self._by_price = []
+
+    def _apply_insert(self, model: dict):
+        model = dict(model)
+        self._models[model["_id"]] = model
+        self._by_key[(model["brand_id"], model["name"])] = model["_id"]
+        bisect.insort(self._by_brand.setdefault(model["brand_id"], []), model["_id"])
+        bisect.insort(
+            self._by_price, _price_key(model.get("average_price"), model["_id"])
+        )
+
+    def _apply_insert_many(self, models: list):
+        # Sorting the merged keys once is linear on two sorted runs, unlike inserting
+        # every key into the middle of the list.
+        keys = []
+        for model in models:
+            model = dict(model)
+            self._models[model["_id"]] = model
+            self._by_key[(model["brand_id"], model["name"])] = model["_id"]
+            bisect.insort(
+                self._by_brand.setdefault(model["brand_id"], []), model["_id"]
+            )
+            keys.append(_price_key(model.get("average_price"), model["_id"]))
+        keys.sort()
+        self._by_price.extend(keys)
+        self._by_price.sort()
+
+    def _apply_set_prices(self, rows: list):
+        for model_id, price in rows:
+            model = self._models.get(model_id)
+            if model is None:
+                continue
+            old_key = _price_key(model.get("average_price"), model_id)
+            del self._by_price[bisect.bisect_left(self._by_price, old_key)]
+            model["average_price"] = price
+            bisect.insort(self._by_price, _price_key(price, model_id))
+
+    def _check_unique(self, model: dict):
+        if (
+            model["_id"] in self._models
+            or (model["brand_id"], model["name"]) in self._by_key
+        ):
+            raise DuplicateError(
+                f"El modelo {model['name']} ya existe para la marca {model['brand_id']}"
+            )
+
+    def _price_range(self, greater, lower) -> tuple:
+        if greater is None and lower is None:
+            return 0, len(self._by_price)
+        if greater is not None:
+            start = bisect.bisect_right(self._by_price, (1, greater, math.inf))
+        else:
+            start = bisect.bisect_left(self._by_price, (1, -math.inf, -math.inf))
+        end = len(self._by_price)
+        if lower is not None:
+            end = bisect.bisect_left(self._by_price, (1, lower, -math.inf))
+        return start, max(start, end)
+
+    async def iter_by_brand(self, brand_id: int):
+        for model_id in list(self._by_brand.get(brand_id, ())):
+            yield dict(self._models[model_id])
+
+    async def page_by_brand(
+        self, brand_id: int, limit: int, after_id: int = None, descending=False
+    ) -> list:
+        ids = self._by_brand.get(brand_id, [])
+        if descending:
+            end = len(ids) if after_id is None else bisect.bisect_left(ids, after_id)
+            page = ids[max(0, end - limit) : end][::-1]
+        else:
+            start = 0 if after_id is None else bisect.bisect_right(ids, after_id)
+            page = ids[start : start + limit]
+        return [dict(self._models[model_id]) for model_id in page]
+
+    async def iter_by_price(self, greater=None, lower=None, batch_size: int = None):
+        if greater is None and lower is None:
+            ids = list(self._models)
+        else:
+            start, end = self._price_range(greater, lower)
+            ids = [key[2] for key in self._by_price[start:end]]
+        for position, model_id in enumerate(ids):
+            if batch_size and position and position % batch_size == 0:
+                await asyncio.sleep(0)
+            model = self._models.get(model_id)
+            if model is not None:
+                yield dict(model)
+
+    async def prices(self, greater=None, lower=None, brand_id: int = None) -> list:
+        if brand_id is None:
+            start, end = self._price_range(
+                -math.inf if greater is None else greater, lower
+            )
+            return [key[1] for key in self._by_price[start:end]]
+        return sorted(
+            price
+            for price in (
+                self._models[model_id].get("average_price")
+                for model_id in self._by_brand.get(brand_id, ())
+            )
+            if price is not None
+            and (greater is None or price > greater)
+            and (lower is None or price < lower)
+        )
+
+    async def page_by_price(
+        self, greater, lower, limit: int, after: list = None, descending=False
+    ) -> list:
+        start, end = self._price_range(greater, lower)
+        if after is not None:
+            key = _price_key(after[0], after[1])
+            if descending:
+                end = min(end, bisect.bisect_left(self._by_price, key))
+            else:
+                start = max(start, bisect.bisect_right(self._by_price, key))
+        if descending:
+            keys = self._by_price[max(start, end - limit) : end][::-1]
+        else:
+            keys = self._by_price[start : min(end, start + limit)]
+        return [dict(self._models[key[2]]) for key in keys]
+
+    async def get_many(self, model_ids: list) -> list:
+        return [
+            dict(self._models[model_id])
+            for model_id in dict.fromkeys(model_ids)
+            if model_id in self._models
+        ]
+
+    async def existing_keys(self, keys: list) -> set:
+        return {key for key in keys if key in self._by_key}
+
+    async def search_names(self, text: str, limit: int) -> list:
+        return _search_names(self._models.values(), text, limit)
+
+    async def insert(self, model: dict):
+        self._check_unique(model)
+        self._write("insert", model)
+
+    async def insert_many(self, models: list) -> dict:
+        errors = {}
+        accepted = []
+        keys = set()
+        for index, model in enumerate(models):
+            key = (model["brand_id"], model["name"])
+            try:
+                self._check_unique(model)
+                if key in keys:
+                    raise DuplicateError(
+                        f"El modelo {model['name']} ya existe para la marca "
+                        f"{model['brand_id']}"
+                    )
+            except DuplicateError as e:
+                errors[index] = e
+                continue
+            keys.add(key)
+            accepted.append(model)
+        if accepted:
+            self._write("insert_many", accepted)
+        return errors
+
+    async def set_price(self, model_id: int, price):
+        model = self._models.get(model_id)
+        if model is None:
+            return None
+        previous = dict(model)
+        self._write("set_prices", [[model_id, price]])
+        return previous
+
+    async def set_prices(self, prices: dict):
+        self._write(
+            "set_prices", [[model_id, price] for model_id, price in prices.items()]
+        )
+
+    async def price_totals_by_brand(self) -> dict:
+        totals = {}
+        for model in self._models.values():
+            if model.get("average_price") is not None:
+                price_sum, price_count = totals.get(model["brand_id"], (0, 0))
+                totals[model["brand_id"]] = (
+                    price_sum + model["average_price"],
+                    price_count + 1,
+                )
+        return totals
+
+
+def _timestamp(value: datetime) -> float:
+    # Naive datetimes are UTC, as the ones read from MongoDB.
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _datetime(timestamp: float) -> datetime:
+    return datetime.fromtimestamp(timestamp, timezone.utc)
+
+
+class MemoryPriceHistoryRepository(_MemoryRepository, PriceHistoryRepository):
+    """
+    Price history buckets kept per model in a list sorted by start, with their start
+    times alongside for binary searches. Times are kept, and journaled, as UNIX
+    timestamps.
+    """
+
+    name = "price_history"
+
+    def __init__(self, journal: Journal = None):
+        super().__init__(journal)
+        self._buckets = {}
+        self._starts = {}
+
+    def _apply_append(self, rows: list, bucket_size: int):
+        for model_id, start, at, price, previous in rows:
+            buckets = self._buckets.setdefault(model_id, [])
+            starts = self._starts.setdefault(model_id, [])
+            position = bisect.bisect_right(starts, start)
+            if (
+                position == 0
+                or starts[position - 1] != start
+                or len(buckets[position - 1]["changes"]) >= bucket_size
+            ):
+                buckets.insert(position, {"start": start, "changes": []})
+                starts.insert(position, start)
+                position += 1
+            buckets[position - 1]["changes"].append([at, price, previous])
+
+    async def append(self, changes: list, bucket_size: int):
+        self._write(
+            "append",
+            [
+                [
+                    change["model_id"],
+                    _timestamp(change["start"]),
+                    _timestamp(change["at"]),
+                    change["price"],
+                    change["previous"],
+                ]
+                for change in changes
+            ],
+            bucket_size,
+        )
+
+    async def buckets(self, model_id: int, since=None, until=None) -> list:
+        starts = self._starts.get(model_id, [])
+        first = 0 if since is None else bisect.bisect_left(starts, _timestamp(since))
+        end = (
+            len(starts)
+            if until is None
+            else bisect.bisect_left(starts, _timestamp(until))
+        )
+        return [
+            {
+                "model_id": model_id,
+                "start": _datetime(bucket["start"]),
+                "count": len(bucket["changes"]),
+                "changes": [
+                    {"at": _datetime(at), "price": price, "previous": previous}
+                    for at, price, previous in bucket["changes"]
+                ],
+            }
+            for bucket in self._buckets.get(model_id, [])[first:end]
+        ]
+
+
+class MemorySequenceRepository(_MemoryRepository, SequenceRepository):
+    """
+    Counters kept in a dict by name.
+    """
+
+    name = "counters"
+
+    def __init__(self, journal: Journal = None):
+        super().__init__(journal)
+        self._counters = {}
+
+    def _apply_claim(self, name: str, count: int):
+        self._counters[name] = self._counters.get(name, 0) + count
+
+    async def claim(self, name: str, count: int) -> int:
+        self._write("claim", name, count)
+        return self._counters[name]
+
+
+class MemoryStorage(Storage):
+    """
+    Embedded backend that keeps the whole catalog in the memory of the process.
+
+    Reads and writes never leave the process and run at memory speed, which suits
+    single-process deployments without a database (e.g. edge kiosks) and load tests.
+    Every operation completes without yielding to the event loop, so each one is atomic
+    with respect to the other requests. The uniqueness of brand names and of model
+    names within their brand is enforced by the hash indexes, like the unique indexes
+    of MongoDB.
+
+    With a `journal_path`, every write is appended to a `Journal` before it is
+    acknowledged and the journal is replayed on construction, so the catalog survives
+    restarts. Without it, the catalog only lives as long as the process. The data is
+    private to the process: several workers would each see their own catalog.
+
+    Args:
+        journal_path (str, optional): The file of the journal. None to keep no journal.
+    """
+
+    def __init__(self, journal_path: str = None):
+        self.journal = Journal(journal_path) if journal_path else None
+        self.brands = MemoryBrandRepository(self.journal)
+        self.models = MemoryModelRepository(self.journal)
+        self.price_history = MemoryPriceHistoryRepository(self.journal)
+        self.sequences = MemorySequenceRepository(self.journal)
+        if self.journal is not None:
+            repositories = {
+                repository.name: repository
+                for repository in (
+                    self.brands,
+                    self.models,
+                    self.price_history,
+                    self.sequences,
+                )
+            }
+            for name, op, *args in self.journal.replay():
+                getattr(repositories[name], f"_apply_{op}")(*args)
+
+    async def ensure_indexes(self):
+        # The hash and sorted indexes are maintained by the repositories themselves.
+        return None
+
+    async def close(self):
+        if self.journal is not None:
+            self.journal.close()
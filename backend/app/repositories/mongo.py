@@ -0,0 +1,452 @@
+import contextlib
+
+from app.repositories.base import (
+    BrandRepository,
+    ChangeStreamHistoryLost,
+    ChangeStreamUnavailable,
+    DuplicateError,
+    ModelRepository,
+    PriceHistoryRepository,
+    SequenceRepository,
+    Storage,
+    StorageError,
+)
+from app.database import read_from_secondaries
+from app.utils.indexes import ensure_indexes
+from app.utils.pagination import keyset_filter
+from app.utils.text import name_pattern, normalize
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+
+DUPLICATE_KEY_ERROR = 11000
+# Server error codes of change streams opened on a standalone server, and of resume
+# tokens that fell off the oplog or follow an invalidate event.
+CHANGE_STREAM_UNSUPPORTED_ERRORS = (40573,)
+CHANGE_STREAM_HISTORY_LOST_ERRORS = (260, 280, 286)
+WATCHED_COLLECTIONS = ("brands", "models")
+
+BRAND_PRICE_TOTALS_PIPELINE = [
+    {"$match": {"average_price": {"$ne": None}}},
+    {
+        "$group": {
+            "_id": "$brand_id",
+            "price_sum": {"$sum": "$average_price"},
+            "price_count": {"$sum": 1},
+        }
+    },
+]
+
+
+def _name_query(text: str) -> dict:
+    return {"name": {"$regex": name_pattern(normalize(text)), "$options": "i"}}
+
+
+def _price_query(greater=None, lower=None):
+    query = {}
+    if greater is not None and lower is not None:
+        query["average_price"] = {"$gt": greater, "$lt": lower}
+    elif greater is not None:
+        query["average_price"] = {"$gt": greater}
+    elif lower is not None:
+        query["average_price"] = {"$lt": lower}
+    return query
+
+
+async def _insert_many(collection, documents) -> dict:
+    """
+    Insert documents with an unordered `insert_many` and map its write errors by position.
+    """
+    try:
+        await collection.insert_many(documents, ordered=False)
+    except BulkWriteError as e:
+        return {
+            error["index"]: (
+                DuplicateError(error["errmsg"])
+                if error["code"] == DUPLICATE_KEY_ERROR
+                else StorageError(error["errmsg"])
+            )
+            for error in e.details["writeErrors"]
+        }
+    return {}
+
+
+class _MongoRepository:
+    """
+    A repository over one collection.
+
+    The queries that serve GET requests go through `reader`, which holds the collection
+    with the read preference of those requests; writes and the reads they depend on
+    always use the primary.
+    """
+
+    def __init__(self, collection, read_preference=None):
+        self.collection = collection
+        self.read_collection = (
+            collection.with_options(read_preference=read_preference)
+            if read_preference is not None
+            else collection
+        )
+
+    @property
+    def reader(self):
+        if read_from_secondaries.get():
+            return self.read_collection
+        return self.collection
+
+
+class MongoBrandRepository(_MongoRepository, BrandRepository):
+    """
+    Brands stored in a MongoDB collection, with a unique index on the name.
+    """
+
+    async def list_all(self) -> list:
+        return [
+            brand
+            async for brand in self.reader.find(
+                {}, {"name": 1, "price_sum": 1, "price_count": 1}
+            )
+        ]
+
+    async def get(self, brand_id: int):
+        return await self.reader.find_one({"_id": brand_id})
+
+    async def get_many(self, brand_ids: list) -> list:
+        return await self.reader.find({"_id": {"$in": brand_ids}}).to_list(None)
+
+    async def ids_by_name(self, names: list) -> dict:
+        return {
+            brand["name"]: brand["_id"]
+            async for brand in self.collection.find(
+                {"name": {"$in": names}}, {"name": 1}
+            )
+        }
+
+    async def search_names(self, text: str, limit: int) -> list:
+        return await self.reader.find(_name_query(text)).to_list(limit)
+
+    async def insert(self, brand: dict):
+        try:
+            await self.collection.insert_one(brand)
+        except DuplicateKeyError as e:
+            raise DuplicateError(str(e)) from e
+
+    async def insert_many(self, brands: list) -> dict:
+        return await _insert_many(self.collection, brands)
+
+    async def count(self) -> int:
+        return await self.collection.count_documents({})
+
+    async def count_without_totals(self) -> int:
+        return await self.collection.count_documents(
+            {"price_count": {"$exists": False}}
+        )
+
+    async def increment_totals(self, brand_id: int, sum_delta, count_delta: int):
+        await self.collection.update_one(
+            {"_id": brand_id},
+            {"$inc": {"price_sum": sum_delta, "price_count": count_delta}},
+        )
+
+    async def increment_totals_many(self, deltas: dict):
+        await self.collection.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": brand_id},
+                    {"$inc": {"price_sum": sum_delta, "price_count": count_delta}},
+                )
+                for brand_id, (sum_delta, count_delta) in deltas.items()
+            ],
+            ordered=False,
+        )
+
+    async def set_totals(self, totals: dict) -> int:
+        updates = []
+        async for brand in self.collection.find({}, {"_id": 1}):
+            price_sum, price_count = totals.get(brand["_id"], (0, 0))
+            updates.append(
+                UpdateOne(
+                    {"_id": brand["_id"]},
+                    {"$set": {"price_sum": price_sum, "price_count": price_count}},
+                )
+            )
+        if not updates:
+            return 0
+        result = await self.collection.bulk_write(updates, ordered=False)
+        return result.modified_count
+
+
+class MongoModelRepository(_MongoRepository, ModelRepository):
+    """
+    Models stored in a MongoDB collection.
+
+    The indexes declared in `app.utils.indexes` back every query: `brand_id_name_unique`
+    the uniqueness of a name within its brand, `brand_id_id` the listings of a brand and
+    `average_price_id` the price filters.
+    """
+
+    async def iter_by_brand(self, brand_id: int):
+        async for model in self.reader.find({"brand_id": brand_id}):
+            yield model
+
+    async def _page(self, query, sort_field, limit, after, descending):
+        direction = DESCENDING if descending else ASCENDING
+        sort = [("_id", direction)]
+        if sort_field:
+            sort.insert(0, (sort_field, direction))
+        if after is not None:
+            if sort_field:
+                after_filter = keyset_filter(sort_field, after[0], after[1], descending)
+            else:
+                after_filter = {"_id": {"$lt" if descending else "$gt": after}}
+            query = {"$and": [query, after_filter]} if query else after_filter
+        return [
+            document
+            async for document in self.reader.find(query).sort(sort).limit(limit)
+        ]
+
+    async def page_by_brand(
+        self, brand_id: int, limit: int, after_id: int = None, descending=False
+    ) -> list:
+        return await self._page(
+            {"brand_id": brand_id}, None, limit, after_id, descending
+        )
+
+    async def iter_by_price(self, greater=None, lower=None, batch_size: int = None):
+        cursor = self.reader.find(_price_query(greater, lower))
+        if batch_size:
+            cursor = cursor.batch_size(batch_size)
+        async for model in cursor:
+            yield model
+
+    async def prices(self, greater=None, lower=None, brand_id: int = None) -> list:
+        query = _price_query(greater, lower) or {"average_price": {"$ne": None}}
+        if brand_id is not None:
+            query["brand_id"] = brand_id
+        cursor = self.reader.find(query, {"_id": 0, "average_price": 1})
+        return sorted([document["average_price"] async for document in cursor])
+
+    async def page_by_price(
+        self, greater, lower, limit: int, after: list = None, descending=False
+    ) -> list:
+        return await self._page(
+            _price_query(greater, lower), "average_price", limit, after, descending
+        )
+
+    async def get_many(self, model_ids: list) -> list:
+        return [
+            model async for model in self.collection.find({"_id": {"$in": model_ids}})
+        ]
+
+    async def existing_keys(self, keys: list) -> set:
+        if not keys:
+            return set()
+        names = {}
+        for brand_id, name in keys:
+            names.setdefault(brand_id, []).append(name)
+        query = {
+            "$or": [
+                {"brand_id": brand_id, "name": {"$in": brand_names}}
+                for brand_id, brand_names in names.items()
+            ]
+        }
+        return {
+            (model["brand_id"], model["name"])
+            async for model in self.collection.find(
+                query, {"_id": 0, "brand_id": 1, "name": 1}
+            )
+        }
+
+    async def search_names(self, text: str, limit: int) -> list:
+        return await self.reader.find(_name_query(text)).to_list(limit)
+
+    async def insert(self, model: dict):
+        try:
+            await self.collection.insert_one(model)
+        except DuplicateKeyError as e:
+            raise DuplicateError(str(e)) from e
+
+    async def insert_many(self, models: list) -> dict:
+        return await _insert_many(self.collection, models)
+
+    async def set_price(self, model_id: int, price):
+        return await self.collection.find_one_and_update(
+            {"_id": model_id},
+            {"$set": {"average_price": price}},
+            return_document=ReturnDocument.BEFORE,
+        )
+
+    async def set_prices(self, prices: dict):
+        await self.collection.bulk_write(
+            [
+                UpdateOne({"_id": model_id}, {"$set": {"average_price": price}})
+                for model_id, price in prices.items()
+            ],
+            ordered=False,
+        )
+
+    async def price_totals_by_brand(self) -> dict:
+        return {
+            row["_id"]: (row["price_sum"], row["price_count"])
+            async for row in self.collection.aggregate(BRAND_PRICE_TOTALS_PIPELINE)
+        }
+
+
+class MongoPriceHistoryRepository(_MongoRepository, PriceHistoryRepository):
+    """
+    Price history buckets stored in a MongoDB collection, indexed by `(model_id, start)`.
+
+    The changes of a model and period are pushed to its open bucket with one upsert per
+    batch of changes: the filter only matches a bucket with room for the whole batch, so
+    when the bucket is full the upsert creates the next one. Every write of `append` is
+    sent in one ordered `bulk_write`.
+    """
+
+    async def append(self, changes: list, bucket_size: int):
+        groups = {}
+        for change in changes:
+            groups.setdefault((change["model_id"], change["start"]), []).append(
+                {key: change[key] for key in ("at", "price", "previous")}
+            )
+        requests = [
+            UpdateOne(
+                {
+                    "model_id": model_id,
+                    "start": start,
+                    "count": {"$lte": bucket_size - len(batch)},
+                },
+                {"$push": {"changes": {"$each": batch}}, "$inc": {"count": len(batch)}},
+                upsert=True,
+            )
+            for (model_id, start), group in groups.items()
+            for batch in (
+                group[i : i + bucket_size] for i in range(0, len(group), bucket_size)
+            )
+        ]
+        if requests:
+            await self.collection.bulk_write(requests, ordered=True)
+
+    async def buckets(self, model_id: int, since=None, until=None) -> list:
+        query = {"model_id": model_id}
+        bounds = {}
+        if since is not None:
+            bounds["$gte"] = since
+        if until is not None:
+            bounds["$lt"] = until
+        if bounds:
+            query["start"] = bounds
+        cursor = self.reader.find(query).sort(
+            [("start", ASCENDING), ("_id", ASCENDING)]
+        )
+        return [bucket async for bucket in cursor]
+
+
+class MongoSequenceRepository(SequenceRepository):
+    """
+    Counters stored as `{"_id": name, "seq": <last claimed number>}` documents.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def claim(self, name: str, count: int) -> int:
+        counter = await self.collection.find_one_and_update(
+            {"_id": name},
+            {"$inc": {"seq": count}},
+            return_document=ReturnDocument.AFTER,
+            upsert=True,
+        )
+        return counter["seq"]
+
+
+class MongoStorage(Storage):
+    """
+    The MongoDB backend, over the `brands`, `models`, `price_history` and `counters`
+    collections.
+
+    Args:
+        read_preference: The read preference of the queries of GET requests. Defaults
+            to None, the read preference of the collections.
+        client (AsyncIOMotorClient, optional): A client owned by the backend, closed
+            with it.
+    """
+
+    def __init__(
+        self,
+        brands_collection,
+        models_collection,
+        price_history_collection,
+        counters_collection,
+        read_preference=None,
+        client=None,
+    ):
+        self.brands = MongoBrandRepository(brands_collection, read_preference)
+        self.models = MongoModelRepository(models_collection, read_preference)
+        self.price_history = MongoPriceHistoryRepository(
+            price_history_collection, read_preference
+        )
+        self.sequences = MongoSequenceRepository(counters_collection)
+        self.client = client
+
+    @classmethod
+    def from_database(cls, database, read_preference=None, client=None):
+        """
+        Build the backend over the collections of a Motor database.
+        """
+        return cls(
+            database.brands,
+            database.models,
+            database.price_history,
+            database.counters,
+            read_preference=read_preference,
+            client=client,
+        )
+
+    async def ensure_indexes(self):
+        await ensure_indexes(
+            {
+                "brands": self.brands.collection,
+                "models": self.models.collection,
+                "price_history": self.price_history.collection,
+            }
+        )
+
+    @contextlib.asynccontextmanager
+    async def watch(self, resume_after=None, full_document: bool = False):
+        pipeline = [
+            {
+                "$match": {
+                    "$or": [
+                        {"ns.coll": {"$in": list(WATCHED_COLLECTIONS)}},
+                        {"operationType": {"$in": ["dropDatabase", "invalidate"]}},
+                    ]
+                }
+            },
+            {
+                "$project": {
+                    "operationType": 1,
+                    "ns": 1,
+                    "documentKey": 1,
+                    "fullDocument.name": 1,
+                    "fullDocument.average_price": 1,
+                    "fullDocument.brand_id": 1,
+                }
+            },
+        ]
+        database = self.brands.collection.database
+        try:
+            async with database.watch(
+                pipeline,
+                resume_after=resume_after,
+                full_document="updateLookup" if full_document else None,
+            ) as stream:
+                yield stream
+        except OperationFailure as e:
+            if e.code in CHANGE_STREAM_UNSUPPORTED_ERRORS:
+                raise ChangeStreamUnavailable(str(e)) from e
+            if e.code in CHANGE_STREAM_HISTORY_LOST_ERRORS:
+                raise ChangeStreamHistoryLost(str(e)) from e
+            raise
+
+    async def close(self):
+        if self.client is not None:
+            self.client.close()
@@ -1,20 +1,47 @@
-from app.models import BrandCreate, BrandResponse, ModelCreate
+from typing import Any, List, Literal, Optional, Union
+
+from app.config import BATCH_MAX_ITEMS, PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX
+from app.models import (
+    BrandCreate,
+    BrandResponse,
+    BrandResponseList,
+    ModelCreate,
+    ModelCreateList,
+    ModelPage,
+    ModelPageResponse,
+    ModelResponse,
+    ModelResponseList,
+)
 from app.services import brand_service, model_service
-from fastapi import APIRouter, HTTPException, status
+from app.services.cache import cache
+from app.utils.admission import AdmissionRoute
+from app.utils.batch import batch_results, validate_batch
+from app.utils.etag import etag_matches
+from app.utils.responses import trusted_json
+from fastapi import APIRouter, Body, HTTPException, Query, Request, Response, status
 
-router = APIRouter()
+router = APIRouter(route_class=AdmissionRoute)
 
 
 @router.get("/brands", response_model=list[BrandResponse])
-async def list_brands():
+async def list_brands(request: Request):
     """
     Retrieve a list of all brands.
 
+    The response carries an `ETag` derived from the version of the brands collection;
+    a request whose `If-None-Match` matches it gets an empty 304 response. The brands
+    built by the service are serialized directly, without validating them again.
+
     Returns:
         list[BrandResponse]: A list of brand objects.
     """
+    etag = cache.etag("brands")
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+        )
     brands = await brand_service.get_all_brands()
-    return brands
+    return trusted_json(BrandResponseList, brands, headers={"ETag": etag})
 
 
 @router.post(
@@ -39,25 +66,56 @@ async def add_brand(brand: BrandCreate):
     return new_brand
 
 
-@router.get("/brands/{brand_id}/models", response_model=list)
-async def list_models_by_brand(brand_id: int):
+@router.get(
+    "/brands/{brand_id}/models", response_model=Union[list[ModelResponse], ModelPage]
+)
+async def list_models_by_brand(
+    request: Request,
+    brand_id: int,
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_SIZE_MAX),
+    after: Optional[str] = None,
+    order: Literal["asc", "desc"] = "asc",
+):
     """
     Retrieve a list of models for a specific brand.
 
+    Without `limit` or `after` the full list is returned, as in previous versions. When
+    either is given the models are returned one page at a time, ordered by `id`, wrapped
+    in a `ModelPage` whose `next_cursor` is passed as `after` to fetch the following page.
+
+    The response carries an `ETag` derived from the version of the models collection;
+    a request whose `If-None-Match` matches it gets an empty 304 response.
+
     Args:
         brand_id (int): The ID of the brand.
+        limit (int, optional): The page size. Enables pagination. Defaults to None.
+        after (str, optional): The cursor of the previous page. Enables pagination. Defaults to None.
+        order (str): The sort direction of the pages, "asc" or "desc". Defaults to "asc".
 
     Returns:
-        list: A list of model objects.
+        list | ModelPage: A list of model objects, or one page of them.
 
     Raises:
-        HTTPException: If the brand is not found.
+        HTTPException: If the brand is not found or the cursor is invalid.
     """
     brand = await brand_service.get_brand_by_id(brand_id)
     if not brand:
         raise HTTPException(status_code=404, detail="Marca no encontrada")
-    models = await model_service.get_models_by_brand(brand_id)
-    return models
+    etag = cache.etag("models")
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+        )
+    headers = {"ETag": etag}
+    if limit is None and after is None:
+        models = await model_service.get_models_by_brand(brand_id)
+        return trusted_json(ModelResponseList, models, headers)
+    page, error = await model_service.get_models_by_brand_page(
+        brand_id, limit or PAGE_SIZE_DEFAULT, after, order == "desc"
+    )
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    return trusted_json(ModelPageResponse, page, headers)
 
 
 @router.post("/brands/{brand_id}/models", status_code=status.HTTP_201_CREATED)
@@ -79,3 +137,37 @@ async def add_model_to_brand(brand_id: int, model: ModelCreate):
     if error:
         raise HTTPException(status_code=400, detail=error)
     return new_model
+
+
+@router.post("/brands/{brand_id}/models:batch")
+async def add_models_to_brand_batch(
+    brand_id: int, models: List[Any] = Body(..., max_length=BATCH_MAX_ITEMS)
+):
+    """
+    Add many models to a specific brand in one request.
+
+    The body is a list of `ModelCreate` objects. It is validated in one pass, and every
+    item gets its own result, so invalid or duplicated models do not prevent the others
+    from being created.
+
+    Args:
+        brand_id (int): The ID of the brand.
+        models (list): The model data to create, at most `BATCH_MAX_ITEMS` items.
+
+    Returns:
+        list: One result per item, in order: `{"index": i, "model": {...}}` for created
+        models, or `{"index": i, "error": "..."}` with the same error messages as
+        `POST /brands/{brand_id}/models`.
+
+    Raises:
+        HTTPException: If the brand does not exist.
+    """
+    validated = validate_batch(ModelCreateList, ModelCreate, models)
+    valid = [model for model, error in validated if error is None]
+    created, error = await model_service.create_models_for_brand(brand_id, valid)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    created = iter(created)
+    return batch_results(
+        next(created) if error is None else (None, error) for _, error in validated
+    )
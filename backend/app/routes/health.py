@@ -0,0 +1,33 @@
+from app.services.readiness import readiness
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
+
+router = APIRouter()
+
+
+@router.get("/healthz", include_in_schema=False)
+async def healthz():
+    """
+    Liveness probe: the process is up and its warm-up has not failed.
+
+    Returns 503 once a warm-up step fails, so the orchestrator restarts the process.
+    """
+    code = (
+        status.HTTP_503_SERVICE_UNAVAILABLE if readiness.failed else status.HTTP_200_OK
+    )
+    return JSONResponse(
+        {"status": "failed" if readiness.failed else "alive"}, status_code=code
+    )
+
+
+@router.get("/readyz", include_in_schema=False)
+async def readyz():
+    """
+    Readiness probe: the warm-up finished and the process can take traffic.
+
+    Returns 503 while the warm-up is running, with the progress of each step.
+    """
+    code = (
+        status.HTTP_200_OK if readiness.ready else status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+    return JSONResponse(readiness.report(), status_code=code)
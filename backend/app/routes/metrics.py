@@ -0,0 +1,114 @@
+from app.services.cache import cache
+from app.services.invalidation import STREAMING, change_watcher
+from app.services.price_index import price_index_check
+from app.services.singleflight import COUNTERS, single_flight
+from app.services.write_queue import price_write_queue
+from app.utils.metrics import render_metrics
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+router = APIRouter()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Export the request, MongoDB, cache, single-flight, price write queue, change stream
+    and price index check metrics of this process in the Prometheus text format.
+
+    Each worker process keeps its own metrics, so every worker has to be scraped.
+    """
+    stats = cache.stats()
+    lines = [
+        "# HELP catalog_cache_entries Entries held by the read cache.",
+        "# TYPE catalog_cache_entries gauge",
+        f"catalog_cache_entries {stats['entries']}",
+    ]
+    for name in ("hits", "misses", "evictions"):
+        lines.extend(
+            [
+                f"# HELP catalog_cache_{name}_total Read cache {name}.",
+                f"# TYPE catalog_cache_{name}_total counter",
+                f"catalog_cache_{name}_total {stats[name]}",
+            ]
+        )
+    flights = single_flight.stats()
+    lines.extend(
+        [
+            "# HELP catalog_single_flight_in_flight Database loads shared by the "
+            "concurrent identical reads, running.",
+            "# TYPE catalog_single_flight_in_flight gauge",
+            f"catalog_single_flight_in_flight {single_flight.in_flight()}",
+        ]
+    )
+    for name in COUNTERS:
+        lines.extend(
+            [
+                f"# HELP catalog_single_flight_{name}_total Single-flight {name}, by "
+                "collection.",
+                f"# TYPE catalog_single_flight_{name}_total counter",
+            ]
+        )
+        lines.extend(
+            f'catalog_single_flight_{name}_total{{collection="{collection}"}} '
+            f"{counters[name]}"
+            for collection, counters in sorted(flights.items())
+        )
+    queue = price_write_queue.stats()
+    lines.extend(
+        [
+            "# HELP catalog_price_write_pending Models with a queued price update.",
+            "# TYPE catalog_price_write_pending gauge",
+            f"catalog_price_write_pending {queue['pending']}",
+        ]
+    )
+    for name in ("updates", "coalesced", "flushes", "failures"):
+        lines.extend(
+            [
+                f"# HELP catalog_price_write_{name}_total Price write queue {name}.",
+                f"# TYPE catalog_price_write_{name}_total counter",
+                f"catalog_price_write_{name}_total {queue[name]}",
+            ]
+        )
+    watcher = change_watcher.stats()
+    lines.extend(
+        [
+            "# HELP catalog_change_stream_up Whether the change stream of the catalog "
+            "is open.",
+            "# TYPE catalog_change_stream_up gauge",
+            f"catalog_change_stream_up {int(watcher['state'] == STREAMING)}",
+        ]
+    )
+    for name in ("events", "skipped", "reconnects", "resyncs"):
+        lines.extend(
+            [
+                f"# HELP catalog_change_stream_{name}_total Change stream {name}.",
+                f"# TYPE catalog_change_stream_{name}_total counter",
+                f"catalog_change_stream_{name}_total {watcher[name]}",
+            ]
+        )
+    report = price_index_check.report or {}
+    lines.extend(
+        [
+            "# HELP catalog_price_index_drift Models of the price index that differ from "
+            "the database in the last check, by kind.",
+            "# TYPE catalog_price_index_drift gauge",
+        ]
+    )
+    lines.extend(
+        f'catalog_price_index_drift{{kind="{kind}"}} {len(model_ids)}'
+        for kind, model_ids in sorted(report.items())
+    )
+    for name in ("checks", "inconclusive"):
+        lines.extend(
+            [
+                f"# HELP catalog_price_index_{name}_total Price index checks "
+                f"({name}).",
+                f"# TYPE catalog_price_index_{name}_total counter",
+                f"catalog_price_index_{name}_total "
+                f"{getattr(price_index_check, name)}",
+            ]
+        )
+    return PlainTextResponse(render_metrics(lines), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -1,8 +1,61 @@
-from app.models import ModelUpdate
-from app.services import model_service
-from fastapi import APIRouter, HTTPException
+import json
+from datetime import datetime
+from typing import Any, List, Literal, Optional, Union
 
-router = APIRouter()
+from app.config import BATCH_MAX_ITEMS, PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX
+from app.models import (
+    ModelPage,
+    ModelPageResponse,
+    ModelPriceUpdate,
+    ModelPriceUpdateList,
+    ModelResponse,
+    ModelResponseList,
+    ModelUpdate,
+    PriceChange,
+)
+from app.services import history_service, model_service
+from app.services.cache import cache
+from app.utils.admission import AdmissionRoute, each_within_deadline
+from app.utils.batch import batch_results, validate_batch
+from app.utils.etag import etag_matches
+from app.utils.metrics import requests_timed_out
+from app.utils.responses import trusted_json
+from fastapi import APIRouter, Body, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from pymongo.errors import PyMongoError
+
+router = APIRouter(route_class=AdmissionRoute)
+
+
+@router.put("/models:batch")
+async def update_models_batch(
+    updates: List[Any] = Body(..., max_length=BATCH_MAX_ITEMS)
+):
+    """
+    Update the average price of many models in one request.
+
+    The body is a list of `{"id": ..., "average_price": ...}` objects. It is validated in
+    one pass and the valid updates are written with a single bulk write; every item gets
+    its own result.
+
+    Args:
+        updates (list): The price updates, at most `BATCH_MAX_ITEMS` items.
+
+    Returns:
+        list: One result per item, in order: `{"index": i, "model": {...}}` for updated
+        models, or `{"index": i, "error": "..."}` with the same error messages as
+        `PUT /models/{model_id}`.
+    """
+    validated = validate_batch(ModelPriceUpdateList, ModelPriceUpdate, updates)
+    updated = iter(
+        await model_service.update_models(
+            [update for update, invalid in validated if invalid is None]
+        )
+    )
+    return batch_results(
+        next(updated) if invalid is None else (None, invalid)
+        for _, invalid in validated
+    )
 
 
 @router.put("/models/{model_id}")
@@ -27,17 +80,135 @@ async def update_model(model_id: int, data: ModelUpdate):
     return updated_model
 
 
-@router.get("/models", response_model=list)
-async def list_models(greater: float = None, lower: float = None):
+@router.get("/models/{model_id}/history", response_model=List[PriceChange])
+async def get_model_history(
+    model_id: int,
+    since: Optional[datetime] = Query(None, alias="from"),
+    until: Optional[datetime] = Query(None, alias="to"),
+):
+    """
+    Retrieve the price changes of a model, oldest first.
+
+    Only the history buckets of the periods overlapping the range are read. Times
+    without a timezone are read as UTC.
+
+    Args:
+        model_id (int): The ID of the model.
+        since (datetime, optional): The `from` query parameter: the start of the range,
+            included. Defaults to the first change.
+        until (datetime, optional): The `to` query parameter: the end of the range,
+            excluded. Defaults to no end.
+
+    Returns:
+        list: The changes, each with the time `at`, the new `average_price` and the
+        `previous_price`.
+
+    Raises:
+        HTTPException: 404 if the model does not exist, 400 if the range is empty.
+    """
+    if since is not None and until is not None:
+        since, until = history_service.as_utc(since), history_service.as_utc(until)
+        if since >= until:
+            raise HTTPException(
+                status_code=400, detail="El rango de fechas es inválido"
+            )
+    changes, error = await history_service.get_price_history(model_id, since, until)
+    if error:
+        raise HTTPException(status_code=404, detail="Modelo no encontrado")
+    return changes
+
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+NDJSON_CHUNK_LINES = 100
+
+
+async def _ndjson(models):
+    """
+    Encode models as newline-delimited JSON, flushing every `NDJSON_CHUNK_LINES` lines.
+
+    Every read of the stream has its own deadline. If one runs out, the lines already
+    encoded are followed by a last `{"error": ...}` line, so a client can tell the cut
+    listing from a complete one.
+    """
+    lines = []
+    try:
+        async for model in each_within_deadline(models):
+            lines.append(json.dumps(model))
+            if len(lines) == NDJSON_CHUNK_LINES:
+                yield "\n".join(lines) + "\n"
+                lines = []
+    except PyMongoError as e:
+        if not e.timeout:
+            raise
+        requests_timed_out.add(("GET", "/models"))
+        lines.append(
+            json.dumps({"error": "La lectura del listado excedió su tiempo límite"})
+        )
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+@router.get("/models", response_model=Union[list[ModelResponse], ModelPage])
+async def list_models(
+    request: Request,
+    greater: float = None,
+    lower: float = None,
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_SIZE_MAX),
+    after: Optional[str] = None,
+    order: Literal["asc", "desc"] = "asc",
+    stream: bool = False,
+):
     """
     Retrieve a list of models filtered by optional greater and lower bounds.
 
+    Without `limit` or `after` the full list is returned, as in previous versions. When
+    either is given the models are returned one page at a time, ordered by
+    `(average_price, id)`, wrapped in a `ModelPage` whose `next_cursor` is passed as
+    `after` to fetch the following page.
+
+    With `stream=1` or an `Accept: application/x-ndjson` header the whole listing is
+    streamed instead as newline-delimited JSON, one model per line, as it is read from
+    the database, so neither the server nor the client has to hold it in memory. Each
+    database read of the stream has its own deadline; a stream cut by one ends with an
+    `{"error": ...}` line.
+
+    Non-streamed responses carry an `ETag` derived from the version of the models
+    collection; a request whose `If-None-Match` matches it gets an empty 304 response.
+    They are serialized directly from the dicts of the service, without validating them
+    again.
+
     Args:
         greater (float, optional): The lower bound for filtering models. Defaults to None.
         lower (float, optional): The upper bound for filtering models. Defaults to None.
+        limit (int, optional): The page size. Enables pagination. Defaults to None.
+        after (str, optional): The cursor of the previous page. Enables pagination. Defaults to None.
+        order (str): The sort direction of the pages, "asc" or "desc". Defaults to "asc".
+        stream (bool): Stream the listing as NDJSON. Defaults to False.
 
     Returns:
-        list: A list of models that meet the filtering criteria.
+        list | ModelPage | StreamingResponse: A list of models that meet the filtering
+        criteria, one page of them, or the NDJSON stream of all of them.
+
+    Raises:
+        HTTPException: If the cursor is invalid.
     """
-    models = await model_service.get_models_filtered(greater, lower)
-    return models
+    if stream or NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        return StreamingResponse(
+            _ndjson(model_service.iter_models_filtered(greater, lower)),
+            media_type=NDJSON_MEDIA_TYPE,
+        )
+    etag = cache.etag("models")
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+        )
+    headers = {"ETag": etag}
+    if limit is None and after is None:
+        models = await model_service.get_models_filtered(greater, lower)
+        return trusted_json(ModelResponseList, models, headers)
+    page, error = await model_service.get_models_filtered_page(
+        greater, lower, limit or PAGE_SIZE_DEFAULT, after, order == "desc"
+    )
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    return trusted_json(ModelPageResponse, page, headers)
@@ -0,0 +1,36 @@
+from app.models import SearchResult, SearchResultList
+from app.services.search_index import (
+    SEARCH_LIMIT_DEFAULT,
+    SEARCH_LIMIT_MAX,
+    search_catalog,
+)
+from app.utils.admission import AdmissionRoute
+from app.utils.responses import trusted_json
+from fastapi import APIRouter, Query
+
+router = APIRouter(route_class=AdmissionRoute)
+
+
+@router.get("/search", response_model=list[SearchResult])
+async def search(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(SEARCH_LIMIT_DEFAULT, ge=1, le=SEARCH_LIMIT_MAX),
+):
+    """
+    Search the brands and models by name.
+
+    Matching ignores case and accents. Results are ranked: names equal to the query
+    first, then names starting with it, names with a word starting with it, names
+    containing it and, when fewer than `limit` names match, the names matching the
+    query with its misspelled words corrected. Within a rank, brands come before models,
+    then names sort alphabetically.
+
+    Args:
+        q (str): The text to search for.
+        limit (int): The maximum number of results. Defaults to 10.
+
+    Returns:
+        list[SearchResult]: The matching brands and models, best first.
+    """
+    results = await search_catalog(q, limit)
+    return trusted_json(SearchResultList, results)
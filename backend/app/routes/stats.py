@@ -0,0 +1,87 @@
+from app.models import PriceStats, PriceStatsResponse
+from app.services import brand_service, stats_service
+from app.services.cache import cache
+from app.services.stats_service import (
+    HISTOGRAM_BUCKETS_DEFAULT,
+    HISTOGRAM_BUCKETS_MAX,
+)
+from app.utils.admission import AdmissionRoute
+from app.utils.etag import etag_matches
+from app.utils.responses import trusted_json
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+
+router = APIRouter(route_class=AdmissionRoute)
+
+
+def _not_modified(request: Request):
+    etag = cache.etag("models")
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return etag, Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+        )
+    return etag, None
+
+
+@router.get("/stats", response_model=PriceStats)
+async def catalog_stats(
+    request: Request,
+    greater: float = None,
+    lower: float = None,
+    buckets: int = Query(HISTOGRAM_BUCKETS_DEFAULT, ge=1, le=HISTOGRAM_BUCKETS_MAX),
+):
+    """
+    Retrieve the price distribution of the whole catalog.
+
+    The `greater` and `lower` bounds select the same models as `GET /models`. The
+    response carries an `ETag` derived from the version of the models collection; a
+    request whose `If-None-Match` matches it gets an empty 304 response.
+
+    Args:
+        greater (float, optional): Only include models priced above this value.
+        lower (float, optional): Only include models priced below this value.
+        buckets (int): The number of buckets of the histogram. Defaults to 10.
+
+    Returns:
+        PriceStats: The count, min, max, mean, standard deviation, percentiles and
+        histogram of the prices.
+    """
+    etag, not_modified = _not_modified(request)
+    if not_modified:
+        return not_modified
+    stats = await stats_service.get_price_stats(greater, lower, buckets=buckets)
+    return trusted_json(PriceStatsResponse, stats, headers={"ETag": etag})
+
+
+@router.get("/brands/{brand_id}/stats", response_model=PriceStats)
+async def brand_stats(
+    request: Request,
+    brand_id: int,
+    greater: float = None,
+    lower: float = None,
+    buckets: int = Query(HISTOGRAM_BUCKETS_DEFAULT, ge=1, le=HISTOGRAM_BUCKETS_MAX),
+):
+    """
+    Retrieve the price distribution of the models of a brand.
+
+    Args:
+        brand_id (int): The ID of the brand.
+        greater (float, optional): Only include models priced above this value.
+        lower (float, optional): Only include models priced below this value.
+        buckets (int): The number of buckets of the histogram. Defaults to 10.
+
+    Returns:
+        PriceStats: The statistics of `GET /stats`, for the models of the brand.
+
+    Raises:
+        HTTPException: If the brand is not found.
+    """
+    brand = await brand_service.get_brand_by_id(brand_id)
+    if not brand:
+        raise HTTPException(status_code=404, detail="Marca no encontrada")
+    etag, not_modified = _not_modified(request)
+    if not_modified:
+        return not_modified
+    stats = await stats_service.get_price_stats(
+        greater, lower, brand_id=brand_id, buckets=buckets
+    )
+    return trusted_json(PriceStatsResponse, stats, headers={"ETag": etag})
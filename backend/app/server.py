@@ -0,0 +1,148 @@
+"""
+Production entrypoint: serves the API with several uvicorn worker processes.
+
+Usage:
+    python -m app.server [--workers N] [--host HOST] [--port PORT] [--backlog N]
+        [--keep-alive SECONDS] [--max-requests N] [--access-log]
+
+- The number of workers defaults to `WEB_CONCURRENCY`, or to the CPUs available to the
+  process (its CPU affinity, capped by the cgroup CPU quota of the container).
+- The event loop is uvloop and the HTTP parser httptools when they are installed, with
+  the standard asyncio loop and h11 parser as the fallback.
+- The application is imported by each worker, not by the supervisor, so every worker
+  creates its own MongoDB client, read cache and price index in its lifespan handler.
+  IDs stay unique across workers because each one claims its own blocks from the
+  counters collection (see `app.utils.sequence`).
+- With `--max-requests`, a worker exits after serving that many requests (plus a random
+  jitter, so the workers do not all restart at once), finishing the requests in flight,
+  and the supervisor starts a fresh one in its place.
+
+The in-memory storage backend keeps the catalog inside the process, so it only runs
+with a single worker, which is never recycled.
+"""
+
+import argparse
+import importlib.util
+import math
+import os
+import random
+
+from app.config import (
+    SERVER_BACKLOG,
+    SERVER_GRACEFUL_SHUTDOWN_SECONDS,
+    SERVER_HOST,
+    SERVER_KEEPALIVE_SECONDS,
+    SERVER_MAX_REQUESTS,
+    SERVER_MAX_REQUESTS_JITTER,
+    SERVER_PORT,
+    STORAGE_BACKEND,
+    WEB_CONCURRENCY,
+)
+from uvicorn import Config, Server
+from uvicorn.supervisors import Multiprocess
+
+CGROUP_CPU_MAX = "/sys/fs/cgroup/cpu.max"
+
+
+def available_cpus(cgroup_cpu_max: str = CGROUP_CPU_MAX) -> int:
+    """
+    Return the CPUs the process may use: its CPU affinity, capped by the cgroup quota.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open(cgroup_cpu_max, encoding="utf-8") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def event_loop() -> str:
+    return "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+
+
+def http_protocol() -> str:
+    return "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+
+class RecyclingServer(Server):
+    """
+    A uvicorn server that draws its own request limit, so workers started together do
+    not all reach it at the same time.
+    """
+
+    def __init__(self, config: Config, jitter: int = 0):
+        super().__init__(config)
+        self.jitter = jitter
+
+    def run(self, sockets=None):
+        # Runs in the worker process, after the server has been sent to it.
+        if self.config.limit_max_requests and self.jitter:
+            self.config.limit_max_requests += random.randint(0, self.jitter)
+        super().run(sockets=sockets)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.server")
+    parser.add_argument("--workers", type=int, default=WEB_CONCURRENCY or None)
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--backlog", type=int, default=SERVER_BACKLOG)
+    parser.add_argument("--keep-alive", type=int, default=SERVER_KEEPALIVE_SECONDS)
+    parser.add_argument("--max-requests", type=int, default=SERVER_MAX_REQUESTS)
+    parser.add_argument(
+        "--max-requests-jitter", type=int, default=SERVER_MAX_REQUESTS_JITTER
+    )
+    parser.add_argument("--access-log", action="store_true")
+    args = parser.parse_args(argv)
+    args.workers = args.workers or available_cpus()
+    if STORAGE_BACKEND == "memory":
+        if args.workers > 1:
+            parser.error(
+                "STORAGE_BACKEND=memory guarda el catálogo dentro del proceso; "
+                "usa --workers 1."
+            )
+        # Restarting the only worker would drop the catalog it holds in memory.
+        args.max_requests = 0
+    return args
+
+
+def build_config(args) -> Config:
+    return Config(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop=event_loop(),
+        http=http_protocol(),
+        backlog=args.backlog,
+        timeout_keep_alive=args.keep_alive,
+        limit_max_requests=args.max_requests or None,
+        timeout_graceful_shutdown=SERVER_GRACEFUL_SHUTDOWN_SECONDS,
+        access_log=args.access_log,
+        proxy_headers=True,
+    )
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = build_config(args)
+    print(
+        f"Iniciando {args.workers} workers en {args.host}:{args.port} "
+        f"(loop {config.loop}, http {config.http}, backlog {args.backlog}, "
+        f"keep-alive {args.keep_alive}s, reciclaje cada "
+        f"{args.max_requests or '∞'} solicitudes)."
+    )
+    server = RecyclingServer(config, jitter=args.max_requests_jitter)
+    # The supervisor restarts any worker that exits, which is what recycles them, so
+    # it is used even with a single worker.
+    Multiprocess(config, target=server.run, sockets=[config.bind_socket()]).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,34 @@
-from app.config import brands_collection, models_collection
 from app.models import BrandCreate
+from app.repositories import DuplicateError, get_storage
+from app.services.cache import cache
+from app.services.search_index import search_index
 from app.utils.sequence import get_next_sequence
 
 
+def _brand_id_to_int(id_value):
+    """
+    Normalize a brand `_id` to an integer.
+
+    Brands created by this service use integer IDs, but documents inserted by other
+    means may carry an ObjectId. Those are read as hexadecimal; anything else maps to 0.
+    """
+    if not isinstance(id_value, int):
+        try:
+            id_value = int(str(id_value), 16)
+        except Exception:
+            id_value = 0
+    return id_value
+
+
 async def get_all_brands():
     """
     Retrieve all brands from the database along with their average model prices.
 
-    This function fetches all brand documents from the `brands_collection` and calculates
-    the average price of their associated models from the `models_collection`. The result
-    is a list of dictionaries containing the brand's ID, name, and average price.
+    Every brand document carries a running `price_sum` and `price_count` of its priced
+    models, maintained by the model write paths (see `record_price_change`). The listing
+    is therefore a plain read of the brands repository and the average is derived from
+    those two fields, without touching the models. The result is cached in memory until
+    the next write to the brands.
 
     Returns:
         list: A list of dictionaries, where each dictionary contains:
@@ -18,29 +37,89 @@ async def get_all_brands():
             - average_price (float): The average price of the brand's models, rounded to 2 decimal places.
               If no models have prices, defaults to 0.
     """
-    brands = []
-    async for brand in brands_collection.find():
-        models_cursor = models_collection.find({"brand_id": brand["_id"]})
-        prices = [
-            m.get("average_price")
-            async for m in models_cursor
-            if m.get("average_price") is not None
-        ]
-        average_price = round(sum(prices) / len(prices), 2) if prices else 0
-
-        id_value = brand["_id"]
-        if not isinstance(id_value, int):
-            try:
-                id_value = int(str(id_value), 16)
-            except Exception:
-                id_value = 0
+    return await cache.get_or_load(
+        "brands", "all", _load_all_brands, collection_scoped=True
+    )
+
 
+async def _load_all_brands():
+    brands = []
+    for brand in await get_storage().brands.list_all():
+        price_count = brand.get("price_count", 0)
+        average_price = (
+            round(brand.get("price_sum", 0) / price_count, 2) if price_count else 0
+        )
         brands.append(
-            {"id": id_value, "name": brand["name"], "average_price": average_price}
+            {
+                "id": _brand_id_to_int(brand["_id"]),
+                "name": brand["name"],
+                "average_price": average_price,
+            }
         )
     return brands
 
 
+async def record_price_change(brand_id: int, old_price=None, new_price=None):
+    """
+    Apply a model price change to the running price totals of its brand.
+
+    A `None` price means the model has no price, so it does not count towards the
+    brand average. The totals are updated with a single atomic increment.
+
+    Args:
+        brand_id (int): The ID of the brand that owns the model.
+        old_price (Optional[float]): The previous price of the model, None for new models.
+        new_price (Optional[float]): The new price of the model.
+    """
+    sum_delta = (new_price or 0) - (old_price or 0)
+    count_delta = (new_price is not None) - (old_price is not None)
+    if not sum_delta and not count_delta:
+        return
+    await get_storage().brands.increment_totals(brand_id, sum_delta, count_delta)
+    cache.invalidate("brands", brand_id)
+
+
+async def apply_brand_price_deltas(deltas: dict):
+    """
+    Apply the price changes of many models to the running price totals of their brands.
+
+    Args:
+        deltas (dict): Maps each brand ID to a `(sum_delta, count_delta)` pair, as
+            accumulated with the same rules as `record_price_change`.
+
+    The totals of all brands are updated with a single bulk write.
+    """
+    updates = {
+        brand_id: (sum_delta, count_delta)
+        for brand_id, (sum_delta, count_delta) in deltas.items()
+        if sum_delta or count_delta
+    }
+    if not updates:
+        return
+    await get_storage().brands.increment_totals_many(updates)
+    for brand_id in deltas:
+        cache.invalidate("brands", brand_id)
+
+
+async def recompute_brand_price_totals():
+    """
+    Recompute the running price totals of every brand from the models collection.
+
+    This is the repair path for any drift between the brand totals and the models,
+    e.g. after writes made outside the services or an interrupted request. The totals
+    are computed with one aggregation and written back with one bulk write.
+
+    Returns:
+        int: The number of brand documents whose totals were corrected.
+    """
+    storage = get_storage()
+    repaired = await storage.brands.set_totals(
+        await storage.models.price_totals_by_brand()
+    )
+    cache.invalidate("brands")
+    return repaired
+
+
 async def create_brand(brand: BrandCreate):
     """
     Creates a new brand in the database.
@@ -55,14 +134,18 @@ async def create_brand(brand: BrandCreate):
 
     Notes:
         - If a brand with the same name already exists in the database, the function will return None and an error message.
+          Uniqueness is enforced by the unique index on the brand name, so the brand is
+          inserted directly in a single round trip and concurrent requests cannot create duplicates.
         - The function generates a new unique ID for the brand using the `get_next_sequence` function.
     """
-    if await brands_collection.find_one({"name": brand.name}):
-        return None, "La marca ya existe"
-
     next_id = await get_next_sequence("brands")
-    new_brand = {"_id": next_id, "name": brand.name}
-    result = await brands_collection.insert_one(new_brand)
+    new_brand = {"_id": next_id, "name": brand.name, "price_sum": 0, "price_count": 0}
+    try:
+        await get_storage().brands.insert(new_brand)
+    except DuplicateError:
+        return None, "La marca ya existe"
+    cache.invalidate("brands", next_id)
+    search_index.add_brand(next_id, brand.name)
     new_brand["id"] = next_id
     return new_brand, None
 
@@ -71,6 +154,9 @@ async def get_brand_by_id(brand_id: str):
     """
     Retrieve a brand document from the database by its ID.
 
+    Brands are cached in memory by ID until they are written to; the returned document
+    is shared with other callers and must not be mutated.
+
     Args:
         brand_id (str): The ID of the brand as a string. It will be converted to an integer.
 
@@ -81,5 +167,9 @@ async def get_brand_by_id(brand_id: str):
         numeric_brand_id = int(brand_id)
     except ValueError:
         return None
-    brand = await brands_collection.find_one({"_id": numeric_brand_id})
+    brand = await cache.get_or_load(
+        "brands",
+        numeric_brand_id,
+        lambda: get_storage().brands.get(numeric_brand_id),
+    )
     return brand
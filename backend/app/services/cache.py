@@ -0,0 +1,225 @@
+import time
+import uuid
+from collections import OrderedDict
+
+from app.config import CACHE_ENABLED, CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS
+from app.database import from_primary
+from app.services.singleflight import single_flight
+
+MISSING = object()
+KEY_VERSION_SLOTS = 4096
+
+
+class CatalogCache:
+    """
+    In-process LRU cache with TTL expiry and versioned invalidation.
+
+    Entries are addressed by `(collection, key)`. Every write to a collection bumps the
+    collection version, and writes to a single document also bump the version of its
+    key. An entry remembers the version it was computed against:
+
+    - key-scoped entries (e.g. a brand by ID) depend only on their key version, so they
+      survive writes to other documents of the collection;
+    - collection-scoped entries (e.g. a listing) depend on the collection version and
+      are invalidated by any write to the collection.
+
+    Key versions are kept in a fixed number of hashed slots, so memory stays bounded no
+    matter how many documents are written; two keys sharing a slot only cause a spurious
+    miss. `get_or_load` captures the versions before reading from the database, so a
+    read that races with a write is never cached as fresh.
+
+    Stale entries are dropped lazily when read. The least recently used entry is evicted
+    once `max_entries` is exceeded, and entries older than `ttl` seconds expire.
+
+    The versions only follow the writes other processes make while `shared_versions` is
+    set, i.e. while a change stream feeds them. Otherwise the ETags also carry the
+    current `ttl` period, so they are renewed at least as often as the entries expire and
+    a client is never told that data older than that is still fresh.
+
+    With a `single_flight`, concurrent misses of the same entry share one load, even with
+    the cache disabled. The versions captured are part of the key of the load, so a
+    caller arriving after a write never receives the result of a load started before it.
+
+    Args:
+        max_entries (int): The size bound of the cache.
+        ttl (float): The time to live of the entries, in seconds.
+        enabled (bool): Whether values are cached.
+        single_flight (SingleFlight, optional): Coalesces the concurrent loads.
+
+    Attributes:
+        epoch (str): Random per-process identifier, part of the ETags.
+        shared_versions (bool): Whether the versions follow the writes of every process.
+        hits (int): Number of lookups served from the cache.
+        misses (int): Number of lookups that were not cached, stale or expired.
+        evictions (int): Number of entries evicted to respect `max_entries`.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        ttl: float = CACHE_TTL_SECONDS,
+        enabled: bool = CACHE_ENABLED,
+        single_flight=None,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.enabled = enabled
+        self.single_flight = single_flight
+        self.epoch = uuid.uuid4().hex[:8]
+        self.shared_versions = True
+        self._entries = OrderedDict()
+        self._collection_versions = {}
+        self._key_versions = [0] * KEY_VERSION_SLOTS
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def version(self, collection: str) -> int:
+        """
+        Return the current version of a collection.
+        """
+        return self._collection_versions.get(collection, 0)
+
+    def etag(self, collection: str) -> str:
+        """
+        Return a weak ETag that changes whenever the collection is written to, and at
+        least every `ttl` seconds without `shared_versions`.
+        """
+        tag = f"{collection}-{self.epoch}-{self.version(collection)}"
+        if not self.shared_versions:
+            period = (
+                time.monotonic() // self.ttl if self.ttl > 0 else time.monotonic_ns()
+            )
+            tag += f"-{period:.0f}"
+        return f'W/"{tag}"'
+
+    def _slot(self, collection: str, key) -> int:
+        return hash((collection, key)) % KEY_VERSION_SLOTS
+
+    def _stamp(self, collection: str, key, collection_scoped: bool):
+        if collection_scoped:
+            return self.version(collection)
+        return self._key_versions[self._slot(collection, key)]
+
+    def get(self, collection: str, key):
+        """
+        Return the cached value of `(collection, key)`, or `MISSING`.
+        """
+        if not self.enabled:
+            return MISSING
+        entry = self._entries.get((collection, key))
+        if entry is not None:
+            expires_at, collection_scoped, stamp, value = entry
+            if expires_at > time.monotonic() and stamp == self._stamp(
+                collection, key, collection_scoped
+            ):
+                self._entries.move_to_end((collection, key))
+                self.hits += 1
+                return value
+            del self._entries[(collection, key)]
+        self.misses += 1
+        return MISSING
+
+    def set(
+        self, collection: str, key, value, collection_scoped: bool = False, stamp=None
+    ):
+        """
+        Cache `value` under `(collection, key)`.
+
+        Args:
+            collection (str): The collection the value was read from.
+            key: The key of the value within the collection.
+            value: The value to cache. It is shared with every reader and must not be mutated.
+            collection_scoped (bool): Whether any write to the collection invalidates the
+                value, instead of only writes to `key`.
+            stamp: The version observed before `value` was read. Defaults to the current one.
+        """
+        if not self.enabled:
+            return
+        if stamp is None:
+            stamp = self._stamp(collection, key, collection_scoped)
+        self._entries[(collection, key)] = (
+            time.monotonic() + self.ttl,
+            collection_scoped,
+            stamp,
+            value,
+        )
+        self._entries.move_to_end((collection, key))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_load(self, collection: str, key, loader, collection_scoped=False):
+        """
+        Return the cached value of `(collection, key)`, loading and caching it on a miss.
+
+        With the cache enabled the loads read from the primary (see `from_primary`), so
+        an entry refilled right after a write invalidated it always includes the write.
+
+        Args:
+            collection (str): The collection the value is read from.
+            key: The key of the value within the collection.
+            loader (Callable[[], Awaitable]): Reads the value from the database.
+            collection_scoped (bool): See `set`.
+
+        Returns:
+            The cached or freshly loaded value, shared with the concurrent callers that
+            missed the same entry. `None` results are not cached.
+        """
+        value = self.get(collection, key)
+        if value is not MISSING:
+            return value
+        stamp = self._stamp(collection, key, collection_scoped)
+        if self.enabled:
+            loader = from_primary(loader)
+        if self.single_flight is None:
+            value = await loader()
+        else:
+            value = await self.single_flight.do(
+                (collection, key, collection_scoped, stamp), loader, collection
+            )
+        if value is not None:
+            self.set(collection, key, value, collection_scoped, stamp)
+        return value
+
+    def invalidate(self, collection: str, key=None):
+        """
+        Record a write to a collection, and to one of its keys if given.
+        """
+        self._collection_versions[collection] = self.version(collection) + 1
+        if key is not None:
+            self._key_versions[self._slot(collection, key)] += 1
+
+    def invalidate_all(self, collections=("brands", "models")):
+        """
+        Record a write to every key of the given collections and drop every entry, e.g.
+        when the writes made by other processes are unknown. Values being loaded are
+        not cached either.
+        """
+        for collection in collections:
+            self.invalidate(collection)
+        self._key_versions = [version + 1 for version in self._key_versions]
+        self._entries.clear()
+
+    def clear(self):
+        """
+        Drop every entry and reset the counters.
+        """
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self) -> dict:
+        """
+        Return the size of the cache and its hit, miss and eviction counters.
+        """
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+cache = CatalogCache(single_flight=single_flight)
@@ -0,0 +1,336 @@
+import asyncio
+import csv
+import io
+import json
+import os
+import time
+
+from app.config import SEED_BATCH_SIZE, STREAM_BATCH_SIZE
+from app.repositories import get_storage
+from app.services.seed_service import prepare_rows, resolve_brands, write_models
+
+FORMATS = ("ndjson", "csv")
+CSV_FIELDS = ("name", "average_price", "brand_name")
+IMPORT_CONCURRENCY_DEFAULT = 4
+PROGRESS_INTERVAL_SECONDS = 5
+TOTALS = (
+    "rows",
+    "brands_created",
+    "models_inserted",
+    "duplicates_skipped",
+    "invalid_rows",
+)
+
+
+def detect_format(path: str) -> str:
+    """
+    Return the format of a catalog file from its extension: `csv` or `ndjson`.
+    """
+    return "csv" if path.lower().endswith(".csv") else "ndjson"
+
+
+def _parse_price(value: str):
+    if value == "":
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        # Left as is, so `ModelCreate` rejects the row.
+        return value
+
+
+def parse_line(line: bytes, file_format: str, header=None):
+    """
+    Parse one line of a catalog file into a row shaped like the entries of `models.json`.
+
+    Returns:
+        dict or None: The row, or None for a blank line.
+
+    Raises:
+        ValueError: If the line is not valid JSON, UTF-8, or an object.
+    """
+    text = line.decode("utf-8").strip()
+    if not text:
+        return None
+    if file_format == "csv":
+        values = next(csv.reader([text]))
+        row = dict(zip(header, values))
+        row["average_price"] = _parse_price(row.get("average_price", ""))
+        return row
+    row = json.loads(text)
+    if not isinstance(row, dict):
+        raise ValueError("la línea no es un objeto JSON")
+    return row
+
+
+def load_checkpoint(path: str):
+    """
+    Return the saved state of an interrupted import, or None if there is none.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(path: str, state: dict):
+    """
+    Write the state of an import atomically, so a crash never leaves a partial file.
+    """
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+
+def _rate(rows: int, elapsed: float) -> float:
+    return rows / elapsed if elapsed > 0 else 0.0
+
+
+async def import_catalog(
+    path: str,
+    file_format: str = None,
+    batch_size: int = SEED_BATCH_SIZE,
+    concurrency: int = IMPORT_CONCURRENCY_DEFAULT,
+    checkpoint_path: str = None,
+    restart: bool = False,
+    report=print,
+):
+    """
+    Stream a catalog file into the storage in bulk batches, resumably.
+
+    The file has one row per line, shaped like the entries of `models.json`: NDJSON
+    objects, or CSV with a `name,average_price,brand_name` header. It is read
+    incrementally and cut into batches of `batch_size` rows, so memory is bounded by
+    the batches in flight whatever the size of the file:
+
+    1. Each batch is validated with `ModelCreate` (`prepare_rows`) and its new brands
+       are created, in file order, so concurrent batches never create the same brand.
+    2. Its models are written by `write_models` in a background task. Up to
+       `concurrency` batches are written at once; reading waits for a free slot.
+    3. When every batch up to some line is written, the byte offset of that line and
+       the running totals are saved to the checkpoint file.
+
+    If the import is interrupted, running it again resumes after the checkpoint.
+    Batches written after it are read again and their models already stored are
+    skipped as duplicates, so no model is inserted twice. The checkpoint is deleted
+    once the whole file is imported. A CSV row must fit on one line.
+
+    Args:
+        path (str): The catalog file.
+        file_format (str, optional): `ndjson` or `csv`. Defaults to `detect_format`.
+        batch_size (int): The number of rows per batch and bulk insert.
+        concurrency (int): The maximum number of batches written at once.
+        checkpoint_path (str, optional): Defaults to the path of the file plus
+            `.checkpoint`.
+        restart (bool): Ignore an existing checkpoint and start from the beginning.
+        report (Callable[[str], None]): Receives the progress messages.
+
+    Returns:
+        dict: The totals of the whole import (`rows`, `brands_created`,
+        `models_inserted`, `duplicates_skipped` and `invalid_rows`), plus the
+        `elapsed_seconds` and `rows_per_second` of this run.
+
+    Raises:
+        ValueError: If the checkpoint belongs to another file, or to another version
+            of it.
+    """
+    file_format = file_format or detect_format(path)
+    checkpoint_path = checkpoint_path or f"{path}.checkpoint"
+    source = {
+        "source": os.path.abspath(path),
+        "format": file_format,
+        "size": os.path.getsize(path),
+    }
+    state = None if restart else load_checkpoint(checkpoint_path)
+    if state is not None:
+        if {key: state.get(key) for key in source} != source:
+            raise ValueError(
+                f"El punto de control {checkpoint_path} no corresponde a {path}; "
+                "use --restart para ignorarlo."
+            )
+        report(f"Reanudando la importación desde el byte {state['offset']}.")
+    else:
+        state = {**source, "offset": 0, "totals": dict.fromkeys(TOTALS, 0)}
+    totals = state["totals"]
+    rows_before = totals["rows"]
+
+    await get_storage().ensure_indexes()
+    brand_ids = {}
+    slots = asyncio.Semaphore(concurrency)
+    running = set()
+    finished = {}
+    failures = []
+    progress = {"next": 0, "reported_at": time.perf_counter()}
+    started = time.perf_counter()
+
+    def advance():
+        # Only the offset before which every batch is written is safe to resume from.
+        moved = False
+        while progress["next"] in finished:
+            end, counts = finished.pop(progress["next"])
+            for key, value in counts.items():
+                totals[key] += value
+            state["offset"] = end
+            progress["next"] += 1
+            moved = True
+        if moved:
+            save_checkpoint(checkpoint_path, state)
+            now = time.perf_counter()
+            if now - progress["reported_at"] >= PROGRESS_INTERVAL_SECONDS:
+                progress["reported_at"] = now
+                rows = totals["rows"] - rows_before
+                report(
+                    f"{totals['rows']} filas procesadas "
+                    f"({_rate(rows, now - started):.0f} filas/s)."
+                )
+
+    async def write(number, valid, end, counts):
+        try:
+            inserted, skipped = await write_models(valid, brand_ids, batch_size)
+            counts["models_inserted"] = inserted
+            counts["duplicates_skipped"] += skipped
+            finished[number] = (end, counts)
+            advance()
+        except Exception as e:
+            failures.append(e)
+        finally:
+            slots.release()
+
+    async def dispatch(number, rows, end, invalid):
+        await slots.acquire()
+        if failures:
+            slots.release()
+            return False
+        valid, duplicates, rejected = prepare_rows(rows)
+        missing = list(
+            dict.fromkeys(name for name, _ in valid if name not in brand_ids)
+        )
+        created_ids, created = await resolve_brands(missing)
+        brand_ids.update(created_ids)
+        counts = {
+            "rows": len(rows) + invalid,
+            "brands_created": created,
+            "duplicates_skipped": duplicates,
+            "invalid_rows": rejected + invalid,
+        }
+        task = asyncio.create_task(write(number, valid, end, counts))
+        running.add(task)
+        task.add_done_callback(running.discard)
+        return True
+
+    with open(path, "rb") as f:
+        header = None
+        if file_format == "csv":
+            header = next(csv.reader([f.readline().decode("utf-8-sig").strip()]))
+        offset = max(state["offset"], f.tell())
+        f.seek(offset)
+
+        number = 0
+        rows, invalid = [], 0
+        for line in f:
+            offset += len(line)
+            try:
+                row = parse_line(line, file_format, header)
+            except ValueError as e:
+                report(f"Línea inválida antes del byte {offset}: {e}")
+                invalid += 1
+                continue
+            if row is not None:
+                rows.append(row)
+            if len(rows) >= batch_size:
+                if not await dispatch(number, rows, offset, invalid):
+                    break
+                number += 1
+                rows, invalid = [], 0
+        else:
+            if rows or invalid:
+                await dispatch(number, rows, offset, invalid)
+
+    if running:
+        await asyncio.gather(*running)
+    if failures:
+        report(
+            f"La importación se interrumpió; se reanudará desde el byte "
+            f"{state['offset']}."
+        )
+        raise failures[0]
+
+    elapsed = time.perf_counter() - started
+    rows = totals["rows"] - rows_before
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return {
+        **totals,
+        "elapsed_seconds": elapsed,
+        "rows_per_second": _rate(rows, elapsed),
+    }
+
+
+async def export_catalog(
+    path: str, file_format: str = None, batch_size: int = STREAM_BATCH_SIZE
+):
+    """
+    Write every model of the catalog to a file, in the format read by `import_catalog`.
+
+    The models are read through a cursor that fetches `batch_size` documents per round
+    trip and written as they arrive, so memory stays flat. Only the brand names are
+    loaded up front. The file is written next to its destination and renamed into
+    place once complete, so an interrupted export never leaves a truncated file.
+
+    Args:
+        path (str): The destination file, or `-` for the standard output.
+        file_format (str, optional): `ndjson` or `csv`. Defaults to `detect_format`.
+        batch_size (int): The number of documents fetched per round trip.
+
+    Returns:
+        dict: The number of `rows` written, the `elapsed_seconds` and the
+        `rows_per_second`.
+    """
+    file_format = file_format or detect_format(path)
+    started = time.perf_counter()
+    storage = get_storage()
+    brand_names = {
+        brand["_id"]: brand["name"] for brand in await storage.brands.list_all()
+    }
+
+    if path == "-":
+        out = io.TextIOWrapper(os.fdopen(os.dup(1), "wb"), encoding="utf-8", newline="")
+        temporary = None
+    else:
+        temporary = f"{path}.tmp"
+        out = open(temporary, "w", encoding="utf-8", newline="")
+    rows = 0
+    try:
+        writer = csv.writer(out, lineterminator="\n")
+        if file_format == "csv":
+            writer.writerow(CSV_FIELDS)
+        async for model in storage.models.iter_by_price(batch_size=batch_size):
+            price = model.get("average_price")
+            brand_name = brand_names.get(model["brand_id"])
+            if file_format == "csv":
+                writer.writerow(
+                    [model["name"], "" if price is None else price, brand_name]
+                )
+            else:
+                row = {
+                    "name": model["name"],
+                    "average_price": price,
+                    "brand_name": brand_name,
+                }
+                out.write(json.dumps(row, ensure_ascii=False) + "\n")
+            rows += 1
+    finally:
+        out.close()
+    if temporary is not None:
+        os.replace(temporary, path)
+
+    elapsed = time.perf_counter() - started
+    return {
+        "rows": rows,
+        "elapsed_seconds": elapsed,
+        "rows_per_second": _rate(rows, elapsed),
+    }
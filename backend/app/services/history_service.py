@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta, timezone
+
+from app.config import (
+    PRICE_HISTORY_BUCKET,
+    PRICE_HISTORY_BUCKET_SIZE,
+    PRICE_HISTORY_ENABLED,
+)
+from app.repositories import get_storage
+
+
+def as_utc(value: datetime) -> datetime:
+    """
+    Return a datetime in UTC, reading naive datetimes (e.g. those of MongoDB) as UTC.
+    """
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def bucket_start(at: datetime, period: str = PRICE_HISTORY_BUCKET) -> datetime:
+    """
+    Return the start of the history bucket of a time: its day, or the Monday of its
+    week, at midnight UTC.
+    """
+    start = as_utc(at).replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == "week":
+        start -= timedelta(days=start.weekday())
+    return start
+
+
+def _now() -> datetime:
+    # MongoDB stores times with millisecond precision.
+    now = datetime.now(timezone.utc)
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+async def record_price_changes(changes: list):
+    """
+    Append price changes to the history of their models.
+
+    Each model keeps one bucket document per `PRICE_HISTORY_BUCKET` period, holding at
+    most `PRICE_HISTORY_BUCKET_SIZE` changes, so the history grows by one document per
+    busy model and period rather than one per change. All the changes are appended with
+    one write, after the prices themselves: the two writes are not atomic, and a change
+    whose price equals the previous one is not recorded.
+
+    Args:
+        changes (list): `(model_id, previous_price, new_price)` tuples, in the order the
+            updates were applied.
+    """
+    if not PRICE_HISTORY_ENABLED:
+        return
+    at = _now()
+    start = bucket_start(at)
+    rows = [
+        {
+            "model_id": model_id,
+            "start": start,
+            "at": at,
+            "price": price,
+            "previous": previous,
+        }
+        for model_id, previous, price in changes
+        if price != previous
+    ]
+    if rows:
+        await get_storage().price_history.append(rows, PRICE_HISTORY_BUCKET_SIZE)
+
+
+async def get_price_history(
+    model_id: int, since: datetime = None, until: datetime = None
+):
+    """
+    Retrieve the price changes of a model made in `[since, until)`, oldest first.
+
+    Only the buckets whose period overlaps the range are read, with one query on the
+    `(model_id, start)` index; the changes outside the range are dropped from the first
+    and last of them.
+
+    Args:
+        model_id (int): The ID of the model.
+        since (datetime, optional): The start of the range. None for the first change.
+        until (datetime, optional): The end of the range, excluded. None for no end.
+
+    Returns:
+        tuple: A tuple containing:
+            - list or None: The changes, each with the time `at` it was made, the new
+              `average_price` and the `previous_price`. None if the model does not exist.
+            - str or None: An error message if the model does not exist, or None otherwise.
+    """
+    since = as_utc(since) if since is not None else None
+    until = as_utc(until) if until is not None else None
+    buckets = await get_storage().price_history.buckets(
+        model_id, bucket_start(since) if since is not None else None, until
+    )
+    changes = []
+    for bucket in buckets:
+        for change in bucket["changes"]:
+            at = as_utc(change["at"])
+            if (since is None or at >= since) and (until is None or at < until):
+                changes.append(
+                    {
+                        "at": at,
+                        "average_price": change["price"],
+                        "previous_price": change["previous"],
+                    }
+                )
+    # A model without history in the range may not exist at all.
+    if not changes and not await get_storage().models.get_many([model_id]):
+        return None, "El modelo no existe"
+    changes.sort(key=lambda change: change["at"])
+    return changes, None
@@ -0,0 +1,293 @@
+"""
+Cross-process invalidation of the read cache and the price and search indexes.
+
+Each worker keeps its own `cache`, `price_index` and `search_index`, which its write
+paths keep current.
+`ChangeWatcher` follows the change stream of the `brands` and `models` collections, so
+the writes handled by every other worker (or made directly in MongoDB) reach them too:
+
+- every change invalidates the cache entries of its document and collection, moves
+  the model in the price index and adds new names to the search index;
+- the `_id` of the last processed event is kept as the resume token, so a stream that
+  fails is reopened after it and no change is missed. An event that cannot be applied
+  (e.g. a document missing a field) is logged, counted and skipped, so it is not
+  replayed forever. Reconnections back off
+  exponentially, with jitter, up to `CHANGE_STREAM_BACKOFF_MAX_SECONDS`;
+- when the changes in between cannot be replayed (no resume token yet, a token that fell
+  off the oplog, a dropped collection), the whole cache is invalidated and the price
+  and search indexes rebuilt;
+- when the deployment has no change streams (a standalone server), the watcher falls
+  back to invalidating the whole cache, and so its ETags, every `CACHE_TTL_SECONDS`,
+  and rebuilds the price and search indexes on the same interval.
+
+The events of the writes of the process itself come back through the stream too; they
+only invalidate the same entries a second time.
+"""
+
+import asyncio
+import random
+import time
+
+from app.config import (
+    CACHE_TTL_SECONDS,
+    CHANGE_STREAM_BACKOFF_MAX_SECONDS,
+    CHANGE_STREAM_BACKOFF_SECONDS,
+)
+from app.repositories import (
+    ChangeStreamHistoryLost,
+    ChangeStreamUnavailable,
+    get_storage,
+)
+from app.services.cache import cache
+from app.services.price_index import price_index
+from app.services.search_index import BRAND, MODEL, search_index
+from pymongo.errors import PyMongoError
+
+STARTING = "starting"
+STREAMING = "streaming"
+RECONNECTING = "reconnecting"
+TTL = "ttl"
+STOPPED = "stopped"
+
+RESYNC_OPERATIONS = ("drop", "rename", "dropDatabase", "invalidate")
+
+
+def _storage_source(resume_after, full_document: bool):
+    return get_storage().watch(resume_after, full_document=full_document)
+
+
+class ChangeWatcher:
+    """
+    Applies the changes of the catalog made by any process to the in-memory structures
+    of this one.
+
+    Args:
+        cache (CatalogCache): The read cache to invalidate.
+        price_index (PriceIndex): The price index to keep current, if it is built.
+        search_index (SearchIndex, optional): The search index to keep current, if it
+            is built.
+        source (Callable, optional): Opens the stream of changes, called with the resume
+            token and whether full documents are needed, like `Storage.watch`. Defaults
+            to the `watch` of the active storage.
+        backoff (float): Delay before the first reconnection, doubled on every
+            consecutive failure.
+        backoff_max (float): Longest delay between reconnections.
+        refresh_interval (float): Interval of the cache invalidations and index rebuilds
+            without change streams.
+
+    Attributes:
+        state (str): `starting`, `streaming`, `reconnecting`, `ttl` or `stopped`.
+        resume_token: The `_id` of the last event processed, None before the first one.
+        events (int): Number of change events applied.
+        skipped (int): Number of change events skipped because they failed to apply.
+        reconnects (int): Number of times the stream failed and was reopened.
+        resyncs (int): Number of full invalidations, when changes may have been missed.
+    """
+
+    def __init__(
+        self,
+        cache,
+        price_index,
+        search_index=None,
+        source=None,
+        backoff: float = CHANGE_STREAM_BACKOFF_SECONDS,
+        backoff_max: float = CHANGE_STREAM_BACKOFF_MAX_SECONDS,
+        refresh_interval: float = CACHE_TTL_SECONDS,
+    ):
+        self.cache = cache
+        self.price_index = price_index
+        self.search_index = search_index
+        self.source = source or _storage_source
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.refresh_interval = refresh_interval
+        self.state = STOPPED
+        self.resume_token = None
+        self.events = 0
+        self.skipped = 0
+        self.reconnects = 0
+        self.resyncs = 0
+        self._started = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        """
+        Follow the change stream in a background task.
+        """
+        self.state = STARTING
+        self._started = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        return self._task
+
+    async def wait_started(self):
+        """
+        Wait until the first stream is open, the first attempt to open it failed, or the
+        watcher fell back to the TTL.
+
+        Changes made after this returns are applied, so it is a warm-up step that runs
+        before the cache and indexes are filled. If the stream is not open yet, the
+        cache and indexes are resynced once it opens, so the warm-up does not wait for
+        it.
+        """
+        await self._started.wait()
+
+    async def stop(self):
+        """
+        Close the stream and stop the watcher, e.g. on shutdown.
+        """
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        self.state = STOPPED
+
+    async def _run(self):
+        failures = 0
+        resync_needed = False
+        while True:
+            try:
+                async with self.source(
+                    self.resume_token, self.price_index.enabled
+                ) as stream:
+                    self.state = STREAMING
+                    self._started.set()
+                    if failures:
+                        print("Flujo de cambios reabierto.")
+                    failures = 0
+                    if resync_needed:
+                        resync_needed = False
+                        await self.resync()
+                    async for change in stream:
+                        await self._apply_or_skip(change)
+                        if change.get("operationType") == "invalidate":
+                            # The token of an invalidate event cannot be resumed after.
+                            self.resume_token = None
+                            break
+                        self.resume_token = change["_id"]
+                continue
+            except ChangeStreamUnavailable as e:
+                print(
+                    f"Flujo de cambios no disponible ({e}); la caché se invalidará por "
+                    f"TTL cada {self.refresh_interval:g}s."
+                )
+                self.state = TTL
+                self._started.set()
+                await self._refresh_periodically()
+                return
+            except ChangeStreamHistoryLost as e:
+                print(f"No se pudo reanudar el flujo de cambios: {e}")
+                self.resume_token = None
+                resync_needed = True
+            except Exception as e:
+                print(f"Falló el flujo de cambios: {e}")
+                # Without a token, the changes made until it reopens cannot be replayed.
+                resync_needed = resync_needed or self.resume_token is None
+            self.state = RECONNECTING
+            self._started.set()
+            self.reconnects += 1
+            failures += 1
+            delay = min(self.backoff_max, self.backoff * 2 ** (failures - 1))
+            await asyncio.sleep(delay * random.uniform(0.5, 1))
+
+    async def _apply_or_skip(self, change: dict):
+        try:
+            await self.apply(change)
+        except PyMongoError:
+            # The storage failed, not the event: the stream is reopened before it.
+            raise
+        except Exception as e:
+            self.skipped += 1
+            print(f"Evento de cambio omitido {change.get('_id')}: {e!r}")
+
+    async def apply(self, change: dict):
+        """
+        Apply one change event to the cache and the indexes.
+        """
+        self.events += 1
+        operation = change["operationType"]
+        if operation in RESYNC_OPERATIONS:
+            await self.resync()
+            return
+        collection = change["ns"]["coll"]
+        key = change["documentKey"]["_id"]
+        self.cache.invalidate(collection, key)
+        self._apply_search(operation, collection, key, change.get("fullDocument"))
+        if collection == "models":
+            document = change.get("fullDocument")
+            if operation == "delete" or document is None:
+                self.price_index.remove(key)
+            else:
+                self.price_index.upsert(
+                    key,
+                    document["name"],
+                    document.get("average_price"),
+                    document.get("brand_id"),
+                )
+
+    def _apply_search(self, operation, collection, key, document):
+        # Names never change once created, so only new and deleted documents matter.
+        if self.search_index is None:
+            return
+        kind = BRAND if collection == "brands" else MODEL
+        if operation == "delete":
+            self.search_index.remove(kind, key)
+        elif operation == "insert" and document is not None:
+            if kind == BRAND:
+                self.search_index.add_brand(key, document["name"])
+            else:
+                self.search_index.add_model(key, document["name"], document["brand_id"])
+
+    async def resync(self):
+        """
+        Invalidate the whole cache and rebuild the price and search indexes, when the
+        changes made by other processes are unknown.
+        """
+        self.resyncs += 1
+        started = time.perf_counter()
+        self.cache.invalidate_all()
+        if self.price_index.ready:
+            await self.price_index.build()
+        if self.search_index is not None and self.search_index.ready:
+            await self.search_index.build()
+        print(
+            f"Caché invalidada e índices reconstruidos en "
+            f"{(time.perf_counter() - started) * 1000:.0f} ms."
+        )
+
+    async def _refresh_periodically(self):
+        # The writes of other processes are unknown: every tick invalidates the whole
+        # cache, which also moves the ETags on (they only follow the versions, not the
+        # TTL), and rebuilds the indexes.
+        indexes = [
+            index
+            for index in (self.price_index, self.search_index)
+            if index is not None and index.enabled
+        ]
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            self.cache.invalidate_all()
+            for index in indexes:
+                if not index.ready:
+                    continue
+                try:
+                    await index.build()
+                except Exception as e:
+                    print(f"Falló la reconstrucción de un índice: {e}")
+
+    def stats(self) -> dict:
+        """
+        Return the state of the watcher and its counters.
+        """
+        return {
+            "state": self.state,
+            "events": self.events,
+            "skipped": self.skipped,
+            "reconnects": self.reconnects,
+            "resyncs": self.resyncs,
+        }
+
+
+change_watcher = ChangeWatcher(cache, price_index, search_index)
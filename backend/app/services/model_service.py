@@ -1,16 +1,62 @@
-from app.config import brands_collection, models_collection
+from app.config import PAGE_SIZE_DEFAULT, STREAM_BATCH_SIZE
 from app.models import ModelCreate, ModelUpdate
-from app.utils.sequence import get_next_sequence
+from app.repositories import DuplicateError, get_storage
+from app.services.cache import cache
+from app.services.history_service import record_price_changes
+from app.services.price_index import price_index
+from app.services.search_index import search_index
+from app.services.write_queue import price_write_queue
+from app.utils.pagination import decode_cursor, encode_cursor
+from app.utils.sequence import get_next_sequence, reserve_sequence
+
+
+def _model_item(model):
+    return {
+        "id": model["_id"],
+        "name": model["name"],
+        "average_price": model.get("average_price"),
+    }
+
+
+def _brand_model_item(model):
+    avg_price = model.get("average_price")
+    if avg_price is None:
+        avg_price = 0
+    return {"id": model["_id"], "name": model["name"], "average_price": avg_price}
+
+
+async def _page(fetch, sort_keys, to_item, limit, after):
+    """
+    Fetch one keyset-paginated page with `fetch(limit, after)`, where `after` is the
+    decoded cursor, and build the cursor of the next page from `sort_keys`.
+
+    One extra document is fetched to know whether another page follows.
+    """
+    last = None
+    if after is not None:
+        last = decode_cursor(after, len(sort_keys))
+        if last is None:
+            return None, "Cursor inválido"
+
+    documents = await fetch(limit + 1, last)
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        next_cursor = encode_cursor([documents[-1].get(key) for key in sort_keys])
+    return {
+        "items": [to_item(document) for document in documents],
+        "next_cursor": next_cursor,
+    }, None
 
 
 async def get_models_by_brand(brand_id: int):
     """
     Retrieve a list of models associated with a specific brand.
 
-    This asynchronous function queries the `models_collection` database for models
+    This asynchronous function queries the models repository for models
     that match the given `brand_id`. It constructs a list of models, each containing
     the model's ID, name, and average price. If the average price is not available,
-    it defaults to 0.
+    it defaults to 0. The list is cached in memory until the next write to the models.
 
     Args:
         brand_id (int): The ID of the brand for which models are to be retrieved.
@@ -23,25 +69,60 @@ async def get_models_by_brand(brand_id: int):
             - "average_price" (float): The average price of the model, defaulting to 0
               if not available.
     """
-    models = []
-    async for model in models_collection.find({"brand_id": brand_id}):
-        avg_price = model.get("average_price")
-        if avg_price is None:
-            avg_price = 0
-        models.append(
-            {"id": model["_id"], "name": model["name"], "average_price": avg_price}
+
+    async def load():
+        models = []
+        async for model in get_storage().models.iter_by_brand(brand_id):
+            models.append(_brand_model_item(model))
+        return models
+
+    return await cache.get_or_load(
+        "models", ("brand", brand_id), load, collection_scoped=True
+    )
+
+
+async def get_models_by_brand_page(
+    brand_id: int,
+    limit: int = PAGE_SIZE_DEFAULT,
+    after: str = None,
+    descending: bool = False,
+):
+    """
+    Retrieve one page of the models associated with a specific brand.
+
+    The models are ordered by `_id` and paginated with a keyset cursor, so every page
+    costs the same as the first one.
+
+    Args:
+        brand_id (int): The ID of the brand for which models are to be retrieved.
+        limit (int): The maximum number of models in the page.
+        after (str, optional): The `next_cursor` of the previous page. None for the first page.
+        descending (bool): Whether to sort from the newest to the oldest model.
+
+    Returns:
+        tuple: A tuple containing:
+            - dict or None: The page, with the `items` (shaped like `get_models_by_brand` results)
+              and the `next_cursor` to request the following page (None on the last page).
+            - str or None: An error message if the cursor is invalid, or None if successful.
+    """
+
+    async def fetch(count, last):
+        return await get_storage().models.page_by_brand(
+            brand_id, count, last[0] if last else None, descending
         )
-    return models
+
+    return await _page(fetch, ["_id"], _brand_model_item, limit, after)
 
 
 async def create_model_for_brand(brand_id: str, model: ModelCreate):
     """
     Creates a new model for a given brand.
 
-    This function checks if the brand exists and if the model already exists for the brand.
-    If the brand does not exist, it returns an error message. If the model already exists
-    for the brand, it also returns an error message. Otherwise, it creates a new model
-    with a unique ID and inserts it into the database.
+    This function checks if the brand exists and then inserts the model with a new unique ID,
+    adding its price to the running price totals of the brand. If the brand does not exist,
+    it returns an error message. If the model already exists for the brand, the unique index
+    on `(brand_id, name)` rejects the insert and an error message is returned as well, so no
+    separate existence check is needed and concurrent requests cannot create duplicates.
 
     Args:
         brand_id (str): The ID of the brand to which the model belongs.
@@ -52,15 +133,12 @@ async def create_model_for_brand(brand_id: str, model: ModelCreate):
             - dict: The newly created model as a dictionary, or None if an error occurred.
             - str: An error message if the operation failed, or None if it succeeded.
     """
-    from app.services.brand_service import get_brand_by_id
+    from app.services.brand_service import get_brand_by_id, record_price_change
 
     brand = await get_brand_by_id(brand_id)
     if not brand:
         return None, "La marca no existe"
 
-    if await models_collection.find_one({"brand_id": brand_id, "name": model.name}):
-        return None, "El modelo ya existe para la marca"
-
     next_id = await get_next_sequence("models")
 
     new_model = {
@@ -69,7 +147,14 @@ async def create_model_for_brand(brand_id: str, model: ModelCreate):
         "name": model.name,
         "average_price": model.average_price,
     }
-    result = await models_collection.insert_one(new_model)
+    try:
+        await get_storage().models.insert(new_model)
+    except DuplicateError:
+        return None, "El modelo ya existe para la marca"
+    cache.invalidate("models", next_id)
+    price_index.upsert(next_id, model.name, model.average_price, brand_id)
+    search_index.add_model(next_id, model.name, brand_id)
+    await record_price_change(brand_id, new_price=model.average_price)
     new_model["id"] = next_id
     return new_model, None
 
@@ -78,6 +163,18 @@ async def update_model(model_id: str, data: ModelUpdate):
     """
     Updates the average price of a model in the database.
 
+    The price is replaced with a single atomic update (`find_one_and_update`), which
+    also returns the previous price so the running price totals of the brand can be
+    adjusted by the delta.
+
+    The change is then appended to the price history of the model, see
+    `record_price_changes`.
+
+    With `PRICE_WRITE_BEHIND_ENABLED`, the update is queued in `price_write_queue`
+    instead and written in bulk with the other updates of its batch; this call waits
+    until that batch is written. A later update of the same model in the same batch
+    wins, and its result is returned to both callers.
+
     Args:
         model_id (str): The ID of the model to update, provided as a string.
         data (ModelUpdate): An instance of ModelUpdate containing the new average price.
@@ -90,24 +187,170 @@ async def update_model(model_id: str, data: ModelUpdate):
     Raises:
         ValueError: If the model_id cannot be converted to an integer.
     """
+    from app.services.brand_service import record_price_change
+
     numeric_model_id = int(model_id)
-    model = await models_collection.find_one({"_id": numeric_model_id})
+    if price_write_queue.enabled:
+        return await price_write_queue.submit(numeric_model_id, data.average_price)
+    model = await get_storage().models.set_price(numeric_model_id, data.average_price)
     if not model:
         return None, "El modelo no existe"
-    await models_collection.update_one(
-        {"_id": numeric_model_id}, {"$set": {"average_price": data.average_price}}
+    cache.invalidate("models", numeric_model_id)
+    price_index.upsert(
+        numeric_model_id, model["name"], data.average_price, model["brand_id"]
+    )
+    await record_price_change(
+        model["brand_id"], model.get("average_price"), data.average_price
+    )
+    await record_price_changes(
+        [(numeric_model_id, model.get("average_price"), data.average_price)]
     )
     model["average_price"] = data.average_price
     model["id"] = numeric_model_id
     return model, None
 
 
+async def create_models_for_brand(brand_id: int, models: list):
+    """
+    Creates many models for a given brand with a fixed number of round trips.
+
+    The brand is checked once, the IDs of all models are reserved at once, the models
+    are written with one unordered bulk insert, and their prices are added to the
+    running price totals of the brand with one update. Each model gets the same outcome
+    it would get from `create_model_for_brand`: names repeated within the batch or
+    already used by the brand are rejected by the unique `(brand_id, name)` index.
+
+    Args:
+        brand_id (int): The ID of the brand to which the models belong.
+        models (list[ModelCreate]): The models to create.
+
+    Returns:
+        tuple: A tuple containing:
+            - list or None: One `(model, error)` tuple per input model, in order: the newly
+              created model as a dictionary and None, or None and an error message.
+              None if the brand does not exist.
+            - str or None: An error message if the brand does not exist, or None otherwise.
+    """
+    from app.services.brand_service import apply_brand_price_deltas, get_brand_by_id
+
+    brand = await get_brand_by_id(brand_id)
+    if not brand:
+        return None, "La marca no existe"
+
+    ids = await reserve_sequence("models", len(models))
+    new_models = [
+        {
+            "_id": model_id,
+            "brand_id": brand_id,
+            "name": model.name,
+            "average_price": model.average_price,
+        }
+        for model_id, model in zip(ids, models)
+    ]
+
+    errors = {}
+    if new_models:
+        failures = await get_storage().models.insert_many(new_models)
+        for index, error in failures.items():
+            errors[index] = (
+                "El modelo ya existe para la marca"
+                if isinstance(error, DuplicateError)
+                else str(error)
+            )
+        cache.invalidate("models")
+
+    results = []
+    price_sum, price_count = 0, 0
+    for index, new_model in enumerate(new_models):
+        if index in errors:
+            results.append((None, errors[index]))
+            continue
+        if new_model["average_price"] is not None:
+            price_sum += new_model["average_price"]
+            price_count += 1
+        price_index.upsert(
+            new_model["_id"], new_model["name"], new_model["average_price"], brand_id
+        )
+        search_index.add_model(new_model["_id"], new_model["name"], brand_id)
+        new_model["id"] = new_model["_id"]
+        results.append((new_model, None))
+    await apply_brand_price_deltas({brand_id: (price_sum, price_count)})
+    return results, None
+
+
+async def update_models(updates: list):
+    """
+    Updates the average price of many models with a single bulk write.
+
+    The current prices are read with one query, so the running price totals of the
+    brands can be adjusted by the deltas with one more bulk write. When a model appears
+    more than once in the batch, the updates are applied in order and the last one wins.
+    The read and the write are not atomic: a concurrent update of the same model can
+    skew the brand totals, which `recompute_brand_price_totals` repairs. Every update,
+    including those overwritten later in the batch, is appended to the price history
+    with one more write.
+
+    Args:
+        updates (list[ModelPriceUpdate]): The price updates, each with the model `id`.
+
+    Returns:
+        list: One `(model, error)` tuple per update, in order, shaped like the results of
+        `update_model`: the updated model and None, or None and an error message.
+    """
+    from app.services.brand_service import apply_brand_price_deltas
+
+    ids = list(dict.fromkeys(update.id for update in updates))
+    current = {
+        model["_id"]: model for model in await get_storage().models.get_many(ids)
+    }
+
+    results = []
+    deltas = {}
+    changes = []
+    for update in updates:
+        model = current.get(update.id)
+        if not model:
+            results.append((None, "El modelo no existe"))
+            continue
+        old_price = model.get("average_price")
+        changes.append((update.id, old_price, update.average_price))
+        totals = deltas.setdefault(model["brand_id"], [0, 0])
+        totals[0] += update.average_price - (old_price or 0)
+        totals[1] += old_price is None
+        model = {**model, "average_price": update.average_price, "id": update.id}
+        current[update.id] = model
+        results.append((model, None))
+
+    if deltas:
+        await get_storage().models.set_prices(
+            {
+                model_id: current[model_id]["average_price"]
+                for model_id in ids
+                if model_id in current
+            }
+        )
+        for model_id in ids:
+            cache.invalidate("models", model_id)
+            if model_id in current:
+                model = current[model_id]
+                price_index.upsert(
+                    model_id, model["name"], model["average_price"], model["brand_id"]
+                )
+        await apply_brand_price_deltas(deltas)
+        await record_price_changes(changes)
+    return results
+
+
 async def get_models_filtered(greater: float = None, lower: float = None):
     """
     Retrieve a list of models filtered by their average price.
 
     This function queries a collection of models and filters them based on the
-    specified `greater` and/or `lower` bounds for the `average_price` field.
+    specified `greater` and/or `lower` bounds for the `average_price` field. The list is
+    cached in memory per pair of bounds until the next write to the models.
+
+    When the in-memory price index is enabled and built, bounded queries are answered
+    from it with a binary search instead, sorted by `(average_price, id)`.
 
     Args:
         greater (float, optional): The lower bound for the average price.
@@ -124,21 +367,72 @@ async def get_models_filtered(greater: float = None, lower: float = None):
     Raises:
         None: This function does not explicitly raise any exceptions.
     """
-    query = {}
-    if greater is not None and lower is not None:
-        query["average_price"] = {"$gt": greater, "$lt": lower}
-    elif greater is not None:
-        query["average_price"] = {"$gt": greater}
-    elif lower is not None:
-        query["average_price"] = {"$lt": lower}
-
-    models = []
-    async for model in models_collection.find(query):
-        models.append(
-            {
-                "id": model["_id"],
-                "name": model["name"],
-                "average_price": model.get("average_price"),
-            }
+
+    if price_index.ready and (greater is not None or lower is not None):
+        return price_index.range(greater, lower)
+
+    async def load():
+        models = []
+        async for model in get_storage().models.iter_by_price(greater, lower):
+            models.append(_model_item(model))
+        return models
+
+    return await cache.get_or_load(
+        "models", ("filtered", greater, lower), load, collection_scoped=True
+    )
+
+
+async def iter_models_filtered(greater: float = None, lower: float = None):
+    """
+    Stream the models filtered by their average price, one at a time.
+
+    Unlike `get_models_filtered`, nothing is accumulated: each model is yielded as it
+    comes off the repository, which fetches `STREAM_BATCH_SIZE` documents per round trip.
+    Memory use therefore stays flat regardless of the size of the result.
+
+    Args:
+        greater (float, optional): Only include models with an average price greater than this value.
+        lower (float, optional): Only include models with an average price lower than this value.
+
+    Yields:
+        dict: A model shaped like the results of `get_models_filtered`.
+    """
+    models = get_storage().models.iter_by_price(greater, lower, STREAM_BATCH_SIZE)
+    async for model in models:
+        yield _model_item(model)
+
+
+async def get_models_filtered_page(
+    greater: float = None,
+    lower: float = None,
+    limit: int = PAGE_SIZE_DEFAULT,
+    after: str = None,
+    descending: bool = False,
+):
+    """
+    Retrieve one page of the models filtered by their average price.
+
+    The models are ordered by `(average_price, _id)` and paginated with a keyset cursor:
+    the `after` token carries the sort key of the last model of the previous page, so
+    every page is an index range scan of `limit + 1` documents regardless of its depth.
+
+    Args:
+        greater (float, optional): Only include models with an average price greater than this value.
+        lower (float, optional): Only include models with an average price lower than this value.
+        limit (int): The maximum number of models in the page.
+        after (str, optional): The `next_cursor` of the previous page. None for the first page.
+        descending (bool): Whether to sort from the highest to the lowest price.
+
+    Returns:
+        tuple: A tuple containing:
+            - dict or None: The page, with the `items` (shaped like `get_models_filtered` results)
+              and the `next_cursor` to request the following page (None on the last page).
+            - str or None: An error message if the cursor is invalid, or None if successful.
+    """
+
+    async def fetch(count, last):
+        return await get_storage().models.page_by_price(
+            greater, lower, count, last, descending
         )
-    return models
+
+    return await _page(fetch, ["average_price", "_id"], _model_item, limit, after)
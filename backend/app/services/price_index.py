@@ -0,0 +1,259 @@
+import asyncio
+import bisect
+import math
+
+from app.config import PRICE_INDEX_CHECK_SECONDS, PRICE_INDEX_ENABLED
+from app.repositories import get_storage
+from app.services.cache import cache
+
+
+class PriceIndex:
+    """
+    In-process index of the models sorted by `(average_price, id)`.
+
+    Range queries on the price are answered with two binary searches over a sorted
+    array, without touching the database. Models without a price are kept out of the
+    sorted array, matching MongoDB, where `$gt`/`$lt` never match null.
+
+    The index is built once from the database with `build` and kept current by the
+    model write paths through `upsert`. Until it is built, `ready` is False and callers
+    fall back to the database. The writes made while `build` reads the database are
+    buffered and replayed on top of the snapshot it loads, so neither the first build
+    nor a rebuild loses them. Each process keeps its own index; the writes handled by
+    other processes reach it through the change stream watcher of
+    `app.services.invalidation`.
+
+    Attributes:
+        enabled (bool): Whether the index should be built at startup.
+        ready (bool): Whether the index has been built and can answer queries.
+    """
+
+    def __init__(self, enabled: bool = PRICE_INDEX_ENABLED):
+        self.enabled = enabled
+        self.ready = False
+        self._keys = []
+        self._models = {}
+        # The writes made during each running `build`, as `(model_id, model or None)`.
+        self._buffers = []
+
+    def _insert(self, model_id: int, name: str, price, brand_id):
+        self._models[model_id] = (name, price, brand_id)
+        if price is not None:
+            bisect.insort(self._keys, (price, model_id))
+
+    def load(self, models):
+        """
+        Replace the contents of the index with the given model documents.
+        """
+        self._models = {}
+        keys = []
+        for model in models:
+            price = model.get("average_price")
+            self._models[model["_id"]] = (model["name"], price, model.get("brand_id"))
+            if price is not None:
+                keys.append((price, model["_id"]))
+        keys.sort()
+        self._keys = keys
+        self.ready = True
+
+    async def build(self):
+        """
+        Load every model from the storage into the index, then replay the writes made
+        while they were read.
+        """
+        buffer = []
+        self._buffers.append(buffer)
+        try:
+            models = [model async for model in get_storage().models.iter_by_price()]
+        finally:
+            self._buffers.remove(buffer)
+        self.load(models)
+        for model_id, model in buffer:
+            self._discard(model_id)
+            if model is not None:
+                self._insert(model_id, *model)
+
+    def _discard(self, model_id: int):
+        previous = self._models.pop(model_id, None)
+        if previous is not None and previous[1] is not None:
+            position = bisect.bisect_left(self._keys, (previous[1], model_id))
+            if position < len(self._keys) and self._keys[position] == (
+                previous[1],
+                model_id,
+            ):
+                del self._keys[position]
+
+    def upsert(self, model_id: int, name: str, price, brand_id):
+        """
+        Add a model to the index or move it to its new price. Until the index is built,
+        it is only recorded for the running `build`.
+        """
+        for buffer in self._buffers:
+            buffer.append((model_id, (name, price, brand_id)))
+        if not self.ready:
+            return
+        self._discard(model_id)
+        self._insert(model_id, name, price, brand_id)
+
+    def remove(self, model_id: int):
+        """
+        Drop a model from the index, e.g. after it was deleted. Until the index is built,
+        it is only recorded for the running `build`.
+        """
+        for buffer in self._buffers:
+            buffer.append((model_id, None))
+        if self.ready:
+            self._discard(model_id)
+
+    def _bounds(self, greater: float = None, lower: float = None):
+        start = 0
+        end = len(self._keys)
+        if greater is not None:
+            start = bisect.bisect_right(self._keys, (greater, math.inf))
+        if lower is not None:
+            end = bisect.bisect_left(self._keys, (lower, -math.inf))
+        return start, max(start, end)
+
+    def count(self, greater: float = None, lower: float = None) -> int:
+        """
+        Count the models with a price strictly between `greater` and `lower`.
+        """
+        start, end = self._bounds(greater, lower)
+        return end - start
+
+    def range(self, greater: float = None, lower: float = None) -> list:
+        """
+        Return the models with a price strictly between `greater` and `lower`.
+
+        Returns:
+            list: Models shaped like the results of `get_models_filtered`, sorted by
+            `(average_price, id)`.
+        """
+        start, end = self._bounds(greater, lower)
+        return [
+            {"id": model_id, "name": self._models[model_id][0], "average_price": price}
+            for price, model_id in self._keys[start:end]
+        ]
+
+    def prices(self, greater: float = None, lower: float = None) -> list:
+        """
+        Return the sorted prices strictly between `greater` and `lower`.
+        """
+        start, end = self._bounds(greater, lower)
+        return [price for price, _ in self._keys[start:end]]
+
+
+async def check_price_index(index, greater: float = None, lower: float = None) -> dict:
+    """
+    Compare a price range answered by the index with the same query on the storage.
+
+    Args:
+        index (PriceIndex): The index to check.
+        greater (float, optional): The exclusive lower bound of the range.
+        lower (float, optional): The exclusive upper bound of the range.
+
+    Returns:
+        dict: The IDs `missing` from the index, the `unexpected` IDs only the index
+        returns, and the IDs whose price or name differ (`mismatched`). All lists are
+        empty when the index is consistent.
+    """
+    expected = {
+        model["_id"]: (model["name"], model["average_price"])
+        async for model in get_storage().models.iter_by_price(greater, lower)
+        if model.get("average_price") is not None
+    }
+    actual = {
+        model["id"]: (model["name"], model["average_price"])
+        for model in index.range(greater, lower)
+    }
+    return {
+        "missing": sorted(expected.keys() - actual.keys()),
+        "unexpected": sorted(actual.keys() - expected.keys()),
+        "mismatched": sorted(
+            model_id
+            for model_id in expected.keys() & actual.keys()
+            if expected[model_id] != actual[model_id]
+        ),
+    }
+
+
+class PriceIndexCheck:
+    """
+    Compares the price index of the running process with the models collection every
+    `interval` seconds, so drift of the live index shows up in `/metrics`.
+
+    A write reaching the process while the collection is read (through its own write
+    paths or the change stream, both of which bump the `models` version of the cache)
+    makes the comparison inconclusive: it is counted as such and its report dropped,
+    instead of reporting the race as drift.
+
+    Args:
+        index (PriceIndex): The index to check.
+        interval (float): Seconds between checks, 0 to never run them.
+
+    Attributes:
+        checks (int): Number of conclusive checks.
+        inconclusive (int): Number of checks dropped because of concurrent writes.
+        report (dict or None): The report of the last conclusive check, like those of
+            `check_price_index`.
+    """
+
+    def __init__(self, index: PriceIndex, interval: float = PRICE_INDEX_CHECK_SECONDS):
+        self.index = index
+        self.interval = interval
+        self.checks = 0
+        self.inconclusive = 0
+        self.report = None
+        self._task = None
+
+    async def run(self):
+        """
+        Check the index once.
+
+        Returns:
+            dict or None: The report, or None if the check was inconclusive.
+        """
+        version = cache.version("models")
+        report = await check_price_index(self.index)
+        if cache.version("models") != version:
+            self.inconclusive += 1
+            return None
+        self.checks += 1
+        self.report = report
+        if any(report.values()):
+            print(f"Índice de precios inconsistente: {report}")
+        return report
+
+    def start(self):
+        """
+        Start checking periodically, if the index is enabled and `interval` is set.
+        """
+        if self.index.enabled and self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run_periodically())
+
+    async def stop(self):
+        """
+        Stop the periodic checks.
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run_periodically(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if not self.index.ready:
+                continue
+            try:
+                await self.run()
+            except Exception as e:
+                print(f"Falló la verificación del índice de precios: {e}")
+
+
+price_index = PriceIndex()
+price_index_check = PriceIndexCheck(price_index)
@@ -0,0 +1,110 @@
+import asyncio
+import time
+import traceback
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class Readiness:
+    """
+    Tracks the warm-up of the process: the steps that prepare the storage and the
+    in-memory structures before the process should receive traffic.
+
+    The steps run one after the other in a background task, so the server starts
+    accepting connections (and answering `/healthz`) right away, while `/readyz` stays
+    unavailable until every step has finished. A failed step stops the warm-up and marks
+    the process as unhealthy, so the orchestrator replaces it.
+
+    Attributes:
+        started_at (float): `time.perf_counter()` when the tracker was created; for the
+            global `readiness`, when the process imported the application.
+        steps (dict): The state of each step: its `status` and, once it ran, `seconds`.
+        error (str or None): The error of the failed step, if any.
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.steps = {}
+        self.error = None
+        self.ready_after = None
+        self._task = None
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_after is not None
+
+    @property
+    def failed(self) -> bool:
+        return self.error is not None
+
+    def uptime(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def start(self, steps: list):
+        """
+        Run the `(name, coroutine function)` steps in order in a background task.
+        """
+        self.steps = {name: {"status": PENDING} for name, _ in steps}
+        self.error = None
+        self.ready_after = None
+        self._task = asyncio.create_task(self._run(steps))
+        return self._task
+
+    async def _run(self, steps: list):
+        for name, step in steps:
+            self.steps[name]["status"] = RUNNING
+            started = time.perf_counter()
+            try:
+                await step()
+            except Exception as e:
+                self.steps[name].update(
+                    status=FAILED, seconds=round(time.perf_counter() - started, 3)
+                )
+                self.error = f"{name}: {e}"
+                print(f"Falló el calentamiento en el paso {name}: {e}")
+                traceback.print_exc()
+                return
+            seconds = time.perf_counter() - started
+            self.steps[name].update(status=DONE, seconds=round(seconds, 3))
+            print(f"Calentamiento: {name} completado en {seconds * 1000:.0f} ms.")
+        self.ready_after = self.uptime()
+        print(f"Proceso listo para recibir tráfico en {self.ready_after:.2f}s.")
+
+    async def stop(self):
+        """
+        Cancel the warm-up if it is still running, e.g. on shutdown.
+        """
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    def report(self) -> dict:
+        """
+        Return the status of the process and of every warm-up step.
+        """
+        if self.failed:
+            status = FAILED
+        elif self.ready:
+            status = "ready"
+        else:
+            status = "starting"
+        report = {
+            "status": status,
+            "uptime_seconds": round(self.uptime(), 3),
+            "steps": self.steps,
+        }
+        if self.ready:
+            report["ready_after_seconds"] = round(self.ready_after, 3)
+        if self.failed:
+            report["error"] = self.error
+        return report
+
+
+readiness = Readiness()
@@ -0,0 +1,385 @@
+import bisect
+import heapq
+import sys
+from collections import Counter
+
+from app.config import SEARCH_INDEX_ENABLED
+from app.repositories import get_storage
+from app.utils.text import normalize
+
+BRAND = "brand"
+MODEL = "model"
+KINDS = (BRAND, MODEL)
+
+SEARCH_LIMIT_DEFAULT = 10
+SEARCH_LIMIT_MAX = 100
+# Longest run of matching words ranked for the word prefix matches.
+PREFIX_SCAN_LIMIT = 1000
+# Shortest word of a query that is corrected when it is not in the index.
+FUZZY_MIN_LENGTH = 3
+
+
+def trigrams(text: str) -> set:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def deletions(word: str) -> set:
+    """
+    Return a word and every variant of it with one character deleted.
+
+    Two words share one of their variants when they differ by one inserted, deleted,
+    replaced or swapped character.
+    """
+    return {word} | {word[:i] + word[i + 1 :] for i in range(len(word))}
+
+
+def edit_distance(a: str, b: str) -> int:
+    """
+    Return the number of inserted, deleted, replaced or swapped adjacent characters
+    that turn `a` into `b` (optimal string alignment distance).
+    """
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(
+                previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost
+            )
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+    return current[-1]
+
+
+class SearchIndex:
+    """
+    In-process index of the brand and model names, for prefix, substring and fuzzy
+    search.
+
+    Every name is normalized with `normalize` and indexed in three structures:
+
+    - the sorted names, where the names starting with a query are a contiguous run found
+      with a binary search (exact and prefix matches);
+    - the sorted words after the first one of every name, which work as a compact trie
+      in the same way (word prefix matches);
+    - an inverted index from each trigram to the names containing it, in the order of
+      the names. A query of three or more characters only checks the names of its
+      rarest trigram (substring matches).
+
+    A query is matched in tiers: the whole name, a prefix of the name, a prefix of one
+    of its other words, then any other substring. Within a tier, brands come before
+    models, then names sort alphabetically. When fewer than `limit` names match, the
+    words of the query that no name uses are replaced by the closest indexed word (one
+    edit away, see `edit_distance`) and the corrected query is matched again, ranking
+    after the rest, so typos still find the name.
+
+    Each tier is only searched while fewer than `limit` results were found, and stops
+    once it has `limit` of them, so the cost of a query does not grow with the number
+    of names matching it. The word prefix and substring tiers follow the order of the
+    names at the last build; names added since come after.
+
+    The index is built once from the storage with `build` and kept current by the
+    services that create brands and models, and by the change stream watcher for the
+    writes of other processes. Until it is built, `ready` is False and the search falls
+    back to the storage. The names added or removed while `build` reads the storage are
+    buffered and replayed once it loads them, so they are never lost.
+
+    Attributes:
+        enabled (bool): Whether the index should be built at startup.
+        ready (bool): Whether the index has been built and can answer queries.
+    """
+
+    def __init__(self, enabled: bool = SEARCH_INDEX_ENABLED):
+        self.enabled = enabled
+        self.ready = False
+        # The writes made during each running `build`, as `(kind, id, name, brand_id)`
+        # with a None name for a removal.
+        self._buffers = []
+        self._reset()
+
+    def _reset(self):
+        # One entry per name, stored column-wise to keep the index compact.
+        self._kinds = []
+        self._ids = []
+        self._names = []
+        self._normalized = []
+        self._brand_ids = []
+        self._entries = {}
+        self._brand_names = {}
+        self._sorted_names = []
+        self._words = []
+        self._postings = {}
+        # Number of names using each word, and the words sharing each one-deletion
+        # variant, to correct the words of a query.
+        self._vocabulary = Counter()
+        self._variants = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _append(
+        self, kind: str, document_id: int, name: str, normalized: str, brand_id
+    ):
+        entry = len(self._ids)
+        self._kinds.append(kind)
+        self._ids.append(document_id)
+        self._names.append(name)
+        self._normalized.append(normalized)
+        self._brand_ids.append(brand_id)
+        self._entries[(kind, document_id)] = entry
+        if kind == BRAND:
+            self._brand_names[document_id] = name
+        for trigram in trigrams(normalized):
+            self._postings.setdefault(trigram, []).append(entry)
+        for word in set(normalized.split()):
+            if word not in self._vocabulary and len(word) >= FUZZY_MIN_LENGTH - 1:
+                for variant in deletions(word):
+                    self._variants.setdefault(variant, set()).add(word)
+            self._vocabulary[word] += 1
+        return entry
+
+    def _keys(self, entry: int, normalized: str):
+        kind = KINDS.index(self._kinds[entry])
+        name_key = (kind, normalized, entry)
+        words = normalized.split()[1:]
+        return name_key, [(kind, sys.intern(word), entry) for word in set(words)]
+
+    def load(self, brands, models):
+        """
+        Replace the contents of the index with the given brand and model documents.
+        """
+        self._reset()
+        documents = [
+            (KINDS.index(kind), normalize(document["name"]), document["_id"], document)
+            for kind, documents in ((BRAND, brands), (MODEL, models))
+            for document in documents
+        ]
+        documents.sort(key=lambda item: item[:3])
+        words = []
+        for kind, normalized, document_id, document in documents:
+            entry = self._append(
+                KINDS[kind],
+                document_id,
+                document["name"],
+                normalized,
+                document.get("brand_id"),
+            )
+            name_key, word_keys = self._keys(entry, normalized)
+            self._sorted_names.append(name_key)
+            words.extend(word_keys)
+        words.sort()
+        self._words = words
+        self.ready = True
+
+    async def build(self):
+        """
+        Load every brand and model name from the storage into the index.
+        """
+        storage = get_storage()
+        buffer = []
+        self._buffers.append(buffer)
+        try:
+            brands = await storage.brands.list_all()
+            models = [model async for model in storage.models.iter_by_price()]
+        finally:
+            self._buffers.remove(buffer)
+        self.load(brands, models)
+        for kind, document_id, name, brand_id in buffer:
+            if name is None:
+                self._drop(kind, document_id)
+            else:
+                self._index(kind, document_id, name, brand_id)
+
+    def _add(self, kind: str, document_id: int, name: str, brand_id=None):
+        for buffer in self._buffers:
+            buffer.append((kind, document_id, name, brand_id))
+        self._index(kind, document_id, name, brand_id)
+
+    def _index(self, kind: str, document_id: int, name: str, brand_id):
+        if not self.ready or (kind, document_id) in self._entries:
+            return
+        normalized = normalize(name)
+        entry = self._append(kind, document_id, name, normalized, brand_id)
+        name_key, word_keys = self._keys(entry, normalized)
+        bisect.insort(self._sorted_names, name_key)
+        for word_key in word_keys:
+            bisect.insort(self._words, word_key)
+
+    def add_brand(self, brand_id: int, name: str):
+        """
+        Add a brand to the index, unless it is indexed. Until the index is built, it is
+        only recorded for the running `build`.
+        """
+        self._add(BRAND, brand_id, name)
+
+    def add_model(self, model_id: int, name: str, brand_id: int):
+        """
+        Add a model to the index, unless it is indexed. Until the index is built, it is
+        only recorded for the running `build`.
+        """
+        self._add(MODEL, model_id, name, brand_id)
+
+    def remove(self, kind: str, document_id: int):
+        """
+        Drop a brand or model from the results, e.g. after it was deleted.
+        """
+        for buffer in self._buffers:
+            buffer.append((kind, document_id, None, None))
+        self._drop(kind, document_id)
+
+    def _drop(self, kind: str, document_id: int):
+        entry = self._entries.pop((kind, document_id), None)
+        if entry is not None:
+            # The sorted arrays and postings keep the entry; it is skipped when matched.
+            self._kinds[entry] = None
+
+    def _prefix_run(self, keys: list, kind: int, query: str, limit: int):
+        """
+        Yield up to `limit` entries of a sorted `(kind, text, entry)` array whose text
+        starts with `query`.
+        """
+        position = bisect.bisect_left(keys, (kind, query))
+        for _, text, entry in keys[position : position + limit]:
+            if not text.startswith(query):
+                return
+            yield entry
+
+    def _ranked(self, tier, entry: int) -> tuple:
+        return (tier, KINDS.index(self._kinds[entry]), self._normalized[entry], entry)
+
+    def _correct(self, word: str) -> str:
+        """
+        Return the indexed word closest to a word of a query, the most used one on ties,
+        or the word itself if it is indexed, short, or has no close word.
+        """
+        if len(word) < FUZZY_MIN_LENGTH or word in self._vocabulary:
+            return word
+        candidates = set()
+        for variant in deletions(word):
+            candidates.update(self._variants.get(variant, ()))
+        if not candidates:
+            return word
+        return min(
+            candidates,
+            key=lambda candidate: (
+                edit_distance(word, candidate),
+                -self._vocabulary[candidate],
+                candidate,
+            ),
+        )
+
+    def _match(self, query: str, limit: int, ranked=None, matched=None, fuzzy=False):
+        ranked = [] if ranked is None else ranked
+        matched = set() if matched is None else matched
+
+        def keep(tier, entry):
+            if entry not in matched and self._kinds[entry] is not None:
+                matched.add(entry)
+                # Fuzzy matches rank after every match of the query as typed.
+                ranked.append(self._ranked(tier + 4 if fuzzy else tier, entry))
+
+        for kind in range(len(KINDS)):
+            # Exact matches sort first within the prefix run of the name.
+            for entry in self._prefix_run(self._sorted_names, kind, query, limit):
+                keep(0 if self._normalized[entry] == query else 1, entry)
+        if len(ranked) >= limit:
+            return ranked
+
+        for kind in range(len(KINDS)):
+            # Entries are numbered in the order of their names when the index is built.
+            entries = self._prefix_run(self._words, kind, query, PREFIX_SCAN_LIMIT)
+            for entry in heapq.nsmallest(limit, entries):
+                keep(2, entry)
+        if len(ranked) >= limit or len(query) < 3:
+            return ranked
+
+        rarest = min(
+            (self._postings.get(trigram, ()) for trigram in trigrams(query)), key=len
+        )
+        found = 0
+        for entry in rarest:
+            if entry not in matched and query in self._normalized[entry]:
+                keep(3, entry)
+                found += 1
+                if found == limit:
+                    return ranked
+
+        if not fuzzy:
+            corrected = " ".join(self._correct(word) for word in query.split())
+            if corrected != query:
+                self._match(corrected, limit, ranked, matched, fuzzy=True)
+        return ranked
+
+    def search(self, query: str, limit: int = SEARCH_LIMIT_DEFAULT) -> list:
+        """
+        Return the best `limit` brands and models for a query, best first.
+
+        Returns:
+            list: Results shaped like `SearchResult`: the `type` ("brand" or "model"),
+            `id` and `name`, plus the `brand_id` and `brand_name` of models.
+        """
+        query = normalize(query)
+        if not query:
+            return []
+        ranked = heapq.nsmallest(limit, self._match(query, limit))
+        return [self._result(entry) for _, _, _, entry in ranked]
+
+    def _result(self, entry: int) -> dict:
+        brand_id = self._brand_ids[entry]
+        return {
+            "type": self._kinds[entry],
+            "id": self._ids[entry],
+            "name": self._names[entry],
+            "brand_id": brand_id,
+            "brand_name": self._brand_names.get(brand_id),
+        }
+
+    def set_brand_names(self, brand_names: dict):
+        """
+        Set the names of brands that are not indexed, given by ID, for the `brand_name`
+        of the results of their models.
+        """
+        self._brand_names.update(brand_names)
+
+
+async def search_catalog(query: str, limit: int = SEARCH_LIMIT_DEFAULT) -> list:
+    """
+    Search the brands and models by name.
+
+    The query is answered by the in-memory `search_index` once it is built. Until then,
+    or when it is disabled, the brands and models whose `normalize`d name contains the
+    normalized query are fetched from the storage (see `app.utils.text.name_pattern`),
+    along with the brands of those models in one more query, and ranked the same way,
+    without fuzzy matches.
+
+    Args:
+        query (str): The text to search for.
+        limit (int): The maximum number of results.
+
+    Returns:
+        list: The results described in `SearchIndex.search`.
+    """
+    if search_index.ready:
+        return search_index.search(query, limit)
+    normalized = normalize(query)
+    if not normalized:
+        return []
+    storage = get_storage()
+    brands = await storage.brands.search_names(normalized, limit)
+    models = await storage.models.search_names(normalized, limit)
+    fallback = SearchIndex(enabled=False)
+    fallback.load(brands, models)
+    missing = {model["brand_id"] for model in models} - {
+        brand["_id"] for brand in brands
+    }
+    if missing:
+        fallback.set_brand_names(
+            {
+                brand["_id"]: brand["name"]
+                for brand in await storage.brands.get_many(list(missing))
+            }
+        )
+    return fallback.search(normalized, limit)
+
+
+search_index = SearchIndex()
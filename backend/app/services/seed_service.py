@@ -0,0 +1,207 @@
+import time
+
+from app.config import SEED_BATCH_SIZE
+from app.models import ModelCreate
+from app.repositories import DuplicateError, get_storage
+from app.services.brand_service import apply_brand_price_deltas
+from app.services.cache import cache
+from app.services.price_index import price_index
+from app.services.search_index import search_index
+from app.utils.sequence import reserve_sequence
+from pydantic import ValidationError
+
+
+def prepare_rows(rows):
+    """
+    Validate and deduplicate raw catalog rows.
+
+    Prices less than or equal to 0 are clamped to 0, and only the first occurrence of
+    each `(brand_name, name)` pair is kept. Rows without a brand name, or whose model
+    fails `ModelCreate`, are counted as invalid.
+
+    Returns:
+        tuple: The valid rows as `(brand_name, ModelCreate)` pairs, the number of
+        duplicates skipped and the number of invalid rows.
+    """
+    seen = set()
+    valid = []
+    duplicates = 0
+    invalid = 0
+    for item in rows:
+        brand_name = item.get("brand_name")
+        model_name = item.get("name")
+        average_price = item.get("average_price")
+
+        if isinstance(average_price, (int, float)) and average_price <= 0:
+            average_price = 0
+
+        if (brand_name, model_name) in seen:
+            duplicates += 1
+            continue
+        if not isinstance(brand_name, str) or not brand_name.strip():
+            print(f"Modelo inválido {model_name}: falta la marca")
+            invalid += 1
+            continue
+        try:
+            model = ModelCreate(name=model_name, average_price=average_price)
+        except ValidationError as e:
+            print(f"Modelo inválido {model_name} para la marca {brand_name}: {e}")
+            invalid += 1
+            continue
+        seen.add((brand_name, model_name))
+        valid.append((brand_name, model))
+    return valid, duplicates, invalid
+
+
+async def resolve_brands(brand_names):
+    """
+    Map every brand name to its ID, creating the missing brands in one bulk insert.
+
+    Returns:
+        tuple: A dict of brand name to brand ID and the number of brands created.
+    """
+    brands = get_storage().brands
+    brand_ids = await brands.ids_by_name(brand_names)
+
+    missing = [name for name in brand_names if name not in brand_ids]
+    new_ids = await reserve_sequence("brands", len(missing))
+    new_brands = [
+        {"_id": brand_id, "name": name, "price_sum": 0, "price_count": 0}
+        for brand_id, name in zip(new_ids, missing)
+    ]
+    if new_brands:
+        errors = await brands.insert_many(new_brands)
+        if errors:
+            raise next(iter(errors.values()))
+    for brand in new_brands:
+        search_index.add_brand(brand["_id"], brand["name"])
+    brand_ids.update({brand["name"]: brand["_id"] for brand in new_brands})
+    return brand_ids, len(new_brands)
+
+
+async def _insert_batch(batch):
+    """
+    Insert a batch of models unordered.
+
+    Models rejected as duplicates (e.g. inserted since they were looked up, by a
+    concurrent batch or process) are skipped; other rejected models are reported.
+
+    Returns:
+        tuple: The documents that were written and the number of duplicates skipped.
+    """
+    errors = await get_storage().models.insert_many(batch)
+    duplicates = 0
+    for index, error in errors.items():
+        if isinstance(error, DuplicateError):
+            duplicates += 1
+            continue
+        model = batch[index]
+        print(
+            f"Error al crear el modelo {model['name']} para la marca "
+            f"{model['brand_id']}: {error}"
+        )
+    return [model for i, model in enumerate(batch) if i not in errors], duplicates
+
+
+async def write_models(valid, brand_ids: dict, batch_size: int = SEED_BATCH_SIZE):
+    """
+    Insert validated models of already resolved brands, skipping those that exist.
+
+    The models already stored are looked up once, by their `(brand_id, name)` pairs
+    only, so the cost does not grow with the size of the brands. The IDs of the new
+    models are reserved at once, the models are inserted with unordered bulk inserts of
+    `batch_size` documents and their prices are added to the running price totals of
+    their brands.
+
+    Args:
+        valid (list): `(brand_name, ModelCreate)` pairs, as returned by `prepare_rows`.
+        brand_ids (dict): The ID of every brand name of `valid`.
+        batch_size (int): The number of models written per bulk insert.
+
+    Returns:
+        tuple: The number of models inserted and of models skipped because they exist,
+        including those rejected by the storage as duplicates.
+    """
+    existing = await get_storage().models.existing_keys(
+        [(brand_ids[brand_name], model.name) for brand_name, model in valid]
+    )
+
+    duplicates = 0
+    new_models = []
+    for brand_name, model in valid:
+        brand_id = brand_ids[brand_name]
+        if (brand_id, model.name) in existing:
+            duplicates += 1
+            continue
+        new_models.append(
+            {
+                "brand_id": brand_id,
+                "name": model.name,
+                "average_price": model.average_price,
+            }
+        )
+
+    model_ids = await reserve_sequence("models", len(new_models))
+    for model_id, new_model in zip(model_ids, new_models):
+        new_model["_id"] = model_id
+
+    price_totals = {}
+    inserted = 0
+    for start in range(0, len(new_models), batch_size):
+        written, skipped = await _insert_batch(new_models[start : start + batch_size])
+        duplicates += skipped
+        for model in written:
+            inserted += 1
+            price_index.upsert(
+                model["_id"], model["name"], model["average_price"], model["brand_id"]
+            )
+            search_index.add_model(model["_id"], model["name"], model["brand_id"])
+            if model["average_price"] is not None:
+                totals = price_totals.setdefault(model["brand_id"], [0, 0])
+                totals[0] += model["average_price"]
+                totals[1] += 1
+
+    await apply_brand_price_deltas(price_totals)
+
+    cache.invalidate("brands")
+    cache.invalidate("models")
+    return inserted, duplicates
+
+
+async def bulk_populate(rows, batch_size: int = SEED_BATCH_SIZE):
+    """
+    Load catalog rows into the database with a fixed number of bulk operations.
+
+    Instead of resolving the brand, checking for the model, reserving an ID and
+    inserting one row at a time, the pipeline:
+
+    1. Validates and deduplicates all rows in memory (prices <= 0 are clamped to 0).
+    2. Resolves every brand in one query and creates the missing ones in one insert.
+    3. Looks up which of the models are already stored in one query, to skip them.
+    4. Reserves the IDs of all new models at once from the sequence allocator.
+    5. Inserts the models with unordered bulk inserts of `batch_size` documents.
+    6. Adds the inserted prices to the running price totals of each brand with
+       `apply_brand_price_deltas`.
+
+    Args:
+        rows (Iterable[dict]): Rows shaped like the entries of `models.json`, with
+            `brand_name`, `name` and `average_price` keys.
+        batch_size (int): The number of models written per bulk insert.
+
+    Returns:
+        dict: A summary with the number of `brands_created`, `models_inserted`,
+        `duplicates_skipped` and `invalid_rows`, plus the `elapsed_seconds`.
+    """
+    started = time.perf_counter()
+    valid, duplicates, invalid = prepare_rows(rows)
+
+    brand_names = list(dict.fromkeys(brand_name for brand_name, _ in valid))
+    brand_ids, brands_created = await resolve_brands(brand_names)
+    inserted, skipped = await write_models(valid, brand_ids, batch_size)
+    return {
+        "brands_created": brands_created,
+        "models_inserted": inserted,
+        "duplicates_skipped": duplicates + skipped,
+        "invalid_rows": invalid,
+        "elapsed_seconds": time.perf_counter() - started,
+    }
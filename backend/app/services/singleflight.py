@@ -0,0 +1,94 @@
+import asyncio
+
+from app.config import SINGLE_FLIGHT_ENABLED
+
+COUNTERS = ("calls", "loads", "coalesced", "errors")
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical loads into one.
+
+    The first caller of a key starts the load in its own task; every caller arriving
+    while it runs awaits that same task instead of loading again, so a burst of
+    identical requests costs one database read. Callers share the result, which must
+    not be mutated, and an exception raised by the load is raised to every one of them.
+
+    Each caller awaits the task through `asyncio.shield`: a caller that is cancelled,
+    e.g. because its client disconnected, stops waiting without cancelling the load of
+    the others. The task runs in the context of the first caller, so the database
+    commands it issues are counted towards that request.
+
+    Attributes:
+        enabled (bool): Whether loads are coalesced. When disabled every call loads,
+            but the counters are still kept.
+    """
+
+    def __init__(self, enabled: bool = SINGLE_FLIGHT_ENABLED):
+        self.enabled = enabled
+        self._flights = {}
+        self._counters = {}
+
+    def _count(self, label: str, name: str):
+        counters = self._counters.setdefault(label, dict.fromkeys(COUNTERS, 0))
+        counters[name] += 1
+
+    async def do(self, key, loader, label: str = ""):
+        """
+        Return the result of `loader`, shared with the concurrent calls with the same key.
+
+        Args:
+            key: Identifies the load, e.g. the function and its arguments. It must be
+                hashable.
+            loader (Callable[[], Awaitable]): Performs the load.
+            label (str): Groups the counters, e.g. by collection.
+
+        Returns:
+            The result of the load.
+        """
+        self._count(label, "calls")
+        if not self.enabled:
+            self._count(label, "loads")
+            try:
+                return await loader()
+            except Exception:
+                self._count(label, "errors")
+                raise
+
+        flight = self._flights.get(key)
+        if flight is None:
+            self._count(label, "loads")
+            flight = asyncio.ensure_future(loader())
+            self._flights[key] = flight
+            flight.add_done_callback(lambda done: self._land(key, label, done))
+        else:
+            self._count(label, "coalesced")
+        return await asyncio.shield(flight)
+
+    def _land(self, key, label: str, flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        # Retrieving the exception also marks it as handled when no caller is left.
+        if not flight.cancelled() and flight.exception() is not None:
+            self._count(label, "errors")
+
+    def in_flight(self) -> int:
+        """
+        Return the number of loads running.
+        """
+        return len(self._flights)
+
+    def stats(self) -> dict:
+        """
+        Return the `calls`, `loads`, `coalesced` calls and `errors` of every label.
+        """
+        return {label: dict(counters) for label, counters in self._counters.items()}
+
+    def clear(self):
+        """
+        Reset the counters.
+        """
+        self._counters.clear()
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,129 @@
+import bisect
+import math
+
+from app.repositories import get_storage
+from app.services.cache import cache
+from app.services.price_index import price_index
+
+PERCENTILES = (5, 25, 50, 75, 90, 95, 99)
+HISTOGRAM_BUCKETS_DEFAULT = 10
+HISTOGRAM_BUCKETS_MAX = 100
+
+
+def percentile(prices: list, fraction: float) -> float:
+    """
+    Return a percentile of sorted prices, interpolating linearly between the closest
+    ranks (the default method of NumPy).
+    """
+    position = (len(prices) - 1) * fraction
+    lower = math.floor(position)
+    upper = min(lower + 1, len(prices) - 1)
+    return prices[lower] + (prices[upper] - prices[lower]) * (position - lower)
+
+
+def histogram(prices: list, buckets: int) -> list:
+    """
+    Count sorted prices in `buckets` equal-width buckets spanning their range.
+
+    Every bucket includes its lower bound and excludes its upper bound, except the last
+    one, which includes the maximum price.
+    """
+    low, high = prices[0], prices[-1]
+    if low == high:
+        return [{"lower": low, "upper": high, "count": len(prices)}]
+    width = (high - low) / buckets
+    bounds = [low + width * i for i in range(buckets)] + [high]
+    counts = [
+        bisect.bisect_left(prices, bounds[i + 1])
+        - bisect.bisect_left(prices, bounds[i])
+        for i in range(buckets)
+    ]
+    counts[-1] += len(prices) - bisect.bisect_left(prices, high)
+    return [
+        {
+            "lower": round(bounds[i], 2),
+            "upper": round(bounds[i + 1], 2),
+            "count": counts[i],
+        }
+        for i in range(buckets)
+    ]
+
+
+def summarize_prices(prices: list, buckets: int = HISTOGRAM_BUCKETS_DEFAULT) -> dict:
+    """
+    Describe the distribution of a sorted list of prices.
+
+    Args:
+        prices (list): The prices, sorted in ascending order.
+        buckets (int): The number of buckets of the histogram.
+
+    Returns:
+        dict: The `count` of prices, their `min`, `max`, `mean` and population standard
+        deviation (`std`), the `percentiles` keyed as "p50", and the `histogram` buckets
+        as `{"lower", "upper", "count"}`. Without prices only `count` is non-empty.
+    """
+    if not prices:
+        return {
+            "count": 0,
+            "min": None,
+            "max": None,
+            "mean": None,
+            "std": None,
+            "percentiles": {},
+            "histogram": [],
+        }
+    count = len(prices)
+    mean = math.fsum(prices) / count
+    variance = math.fsum((price - mean) ** 2 for price in prices) / count
+    return {
+        "count": count,
+        "min": prices[0],
+        "max": prices[-1],
+        "mean": round(mean, 2),
+        "std": round(math.sqrt(variance), 2),
+        "percentiles": {
+            f"p{p}": round(percentile(prices, p / 100), 2) for p in PERCENTILES
+        },
+        "histogram": histogram(prices, buckets),
+    }
+
+
+async def get_price_stats(
+    greater: float = None,
+    lower: float = None,
+    brand_id: int = None,
+    buckets: int = HISTOGRAM_BUCKETS_DEFAULT,
+):
+    """
+    Retrieve the price distribution of the catalog, or of one brand.
+
+    The prices are those of the models priced strictly between `greater` and `lower`,
+    the window of `get_models_filtered`. For the whole catalog they are read from the
+    in-memory price index when it is built, already sorted; otherwise only the prices
+    are fetched from the storage. The result is cached per brand, window and number of
+    buckets until the next write to the models, so price changes, including those of
+    other processes, invalidate it.
+
+    Args:
+        greater (float, optional): Only include prices greater than this value.
+        lower (float, optional): Only include prices lower than this value.
+        brand_id (int, optional): Only include the models of this brand.
+        buckets (int): The number of buckets of the histogram.
+
+    Returns:
+        dict: The statistics described in `summarize_prices`.
+    """
+
+    async def load():
+        if brand_id is None and price_index.ready:
+            prices = price_index.prices(greater, lower)
+        else:
+            prices = await get_storage().models.prices(greater, lower, brand_id)
+        return summarize_prices(prices, buckets)
+
+    return await cache.get_or_load(
+        "models",
+        ("stats", brand_id, greater, lower, buckets),
+        load,
+        collection_scoped=True,
+    )
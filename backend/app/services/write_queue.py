@@ -0,0 +1,179 @@
+import asyncio
+import time
+
+import pymongo
+from app.config import (
+    PRICE_WRITE_BATCH_SIZE,
+    PRICE_WRITE_BEHIND_ENABLED,
+    PRICE_WRITE_FLUSH_SECONDS,
+)
+from app.models import ModelPriceUpdate
+from app.utils.metrics import (
+    price_write_batch_size,
+    price_write_flush_duration,
+    price_write_latency,
+)
+
+
+async def _update_models(updates: list) -> list:
+    from app.services.model_service import update_models
+
+    return await update_models(updates)
+
+
+class PriceWriteQueue:
+    """
+    Write-behind queue that groups the price updates of many requests into bulk writes.
+
+    Updates are queued per model ID: a model updated again before its flush keeps only
+    its last price (last write wins). The queue is flushed as one batch, written with
+    `update_models` (one read of the current prices, one `bulk_write` of the new ones
+    and one of the brand totals), as soon as `batch_size` models are queued or
+    `flush_interval` seconds after the first update of the batch, whichever comes first.
+
+    `submit` returns a future resolved once the batch holding the update is written, so
+    callers can wait for durability (group commit) or carry on. Flushes run one at a
+    time, in order, so a later batch never overwrites a newer price with an older one.
+
+    Args:
+        enabled (bool): Whether `update_model` queues its updates.
+        batch_size (int): Queued models that trigger a flush.
+        flush_interval (float): Longest time an update waits in the queue, in seconds.
+        writer (Callable, optional): Writes a list of `ModelPriceUpdate` and returns one
+            `(model, error)` tuple per update, like `update_models`, the default.
+
+    Attributes:
+        updates (int): Number of updates submitted.
+        coalesced (int): Number of updates replaced by a later one before their flush.
+        flushes (int): Number of batches written.
+        failures (int): Number of batches whose write raised an error.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = PRICE_WRITE_BEHIND_ENABLED,
+        batch_size: int = PRICE_WRITE_BATCH_SIZE,
+        flush_interval: float = PRICE_WRITE_FLUSH_SECONDS,
+        writer=None,
+    ):
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.writer = writer or _update_models
+        self.updates = 0
+        self.coalesced = 0
+        self.flushes = 0
+        self.failures = 0
+        # model ID -> [price, [(future, submitted_at), ...]]
+        self._pending = {}
+        self._timer = None
+        self._running = set()
+        self._lock = asyncio.Lock()
+
+    def pending(self) -> int:
+        """
+        Return the number of models waiting for a flush.
+        """
+        return len(self._pending)
+
+    def submit(self, model_id: int, price) -> asyncio.Future:
+        """
+        Queue the new price of a model.
+
+        Returns:
+            asyncio.Future: Resolved with the `(model, error)` result of `update_model`
+            once the update is written. A model updated several times in one batch
+            resolves every future with the result of the last price.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.updates += 1
+        entry = self._pending.get(model_id)
+        if entry is None:
+            self._pending[model_id] = [price, [(future, time.perf_counter())]]
+        else:
+            self.coalesced += 1
+            entry[0] = price
+            entry[1].append((future, time.perf_counter()))
+        if len(self._pending) >= self.batch_size:
+            self._flush_pending()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+        return future
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        self._timer = None
+        self._flush_pending()
+
+    def _flush_pending(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        task = asyncio.create_task(self._write(batch))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _write(self, batch: dict):
+        async with self._lock:
+            updates = [
+                ModelPriceUpdate(id=model_id, average_price=price)
+                for model_id, (price, _) in batch.items()
+            ]
+            started = time.perf_counter()
+            try:
+                # The batch holds the updates of many requests: it is not bound by the
+                # deadline of the one whose update started the flush.
+                with pymongo.timeout(None):
+                    results = await self.writer(updates)
+            except Exception as e:
+                self.failures += 1
+                print(f"Falló la escritura de {len(updates)} precios en cola: {e}")
+                for _, waiters in batch.values():
+                    for future, _ in waiters:
+                        if not future.done():
+                            future.set_exception(e)
+                return
+            finished = time.perf_counter()
+            self.flushes += 1
+            price_write_flush_duration.observe((), finished - started)
+            price_write_batch_size.observe((), len(updates))
+            for (_, waiters), result in zip(batch.values(), results):
+                for future, submitted_at in waiters:
+                    price_write_latency.observe((), finished - submitted_at)
+                    if not future.done():
+                        future.set_result(result)
+
+    async def flush(self):
+        """
+        Write every queued update now and wait until all the flushes are written.
+        """
+        self._flush_pending()
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+
+    async def drain(self):
+        """
+        Flush the queue on shutdown, so no accepted update is lost.
+        """
+        if self.pending() or self._running:
+            count = self.pending()
+            await self.flush()
+            print(f"Cola de precios vaciada ({count} modelos pendientes).")
+
+    def stats(self) -> dict:
+        """
+        Return the number of models pending and the counters of the queue.
+        """
+        return {
+            "pending": self.pending(),
+            "updates": self.updates,
+            "coalesced": self.coalesced,
+            "flushes": self.flushes,
+            "failures": self.failures,
+        }
+
+
+price_write_queue = PriceWriteQueue()
@@ -0,0 +1,277 @@
+"""
+Admission control, load shedding and request deadlines of the API routes.
+
+- `AdmissionControl` bounds the requests each route of a worker handles at once. The
+  requests over the limit wait in a bounded queue, in arrival order, and are answered
+  right away with a 503 and a `Retry-After` header once the queue is full or after
+  waiting `ADMISSION_QUEUE_TIMEOUT_SECONDS` for a slot. A slow route therefore sheds its
+  own excess instead of piling requests up in the event loop and slowing down the rest.
+- `AdmissionRoute` applies it, and gives the handler of every admitted request a
+  deadline of `REQUEST_DEADLINE_SECONDS` with `pymongo.timeout`: every MongoDB operation
+  issued while serving it (the brand and model services, the sequence blocks claimed by
+  `get_next_sequence`...) is sent with the remaining time as its `maxTimeMS`, and
+  waiting for a pooled connection or a server is bounded by it too. A request that runs
+  out of time is answered with a 504.
+- Streamed bodies are sent after the handler returns, outside of that deadline; they
+  iterate with `each_within_deadline`, which bounds every step on its own.
+
+The limits are per process: a deployment with `WEB_CONCURRENCY` workers handles up to
+that many times `ADMISSION_CONCURRENCY` requests of each route.
+"""
+
+import asyncio
+from collections import deque
+
+import pymongo
+from app.config import (
+    ADMISSION_CONCURRENCY,
+    ADMISSION_CONTROL_ENABLED,
+    ADMISSION_QUEUE_SIZE,
+    ADMISSION_QUEUE_TIMEOUT_SECONDS,
+    ADMISSION_RETRY_AFTER_SECONDS,
+    ADMISSION_ROUTE_LIMITS,
+    REQUEST_DEADLINE_SECONDS,
+)
+from app.utils.metrics import (
+    MetricsRoute,
+    requests_queued,
+    requests_shed,
+    requests_timed_out,
+)
+from fastapi.responses import JSONResponse
+from pymongo.errors import PyMongoError
+
+QUEUE_FULL = "queue_full"
+QUEUE_TIMEOUT = "queue_timeout"
+
+
+def parse_route_limits(value: str) -> dict:
+    """
+    Parse per-route limits written as comma-separated `METHOD /path=concurrency[:queue]`
+    entries, e.g. `GET /models=8:16,PUT /models/{model_id}=4`. The path is the template
+    of the route; without a queue size the default one is kept.
+
+    Returns:
+        dict: `(concurrency, queue_size or None)` by `(method, path)`.
+
+    Raises:
+        ValueError: If an entry is malformed or its concurrency is not positive.
+    """
+    limits = {}
+    for entry in filter(None, (part.strip() for part in value.split(","))):
+        try:
+            route, sizes = entry.rsplit("=", 1)
+            method, path = route.split()
+            concurrency, _, queue_size = sizes.partition(":")
+            concurrency = int(concurrency)
+            queue_size = int(queue_size) if queue_size else None
+            if concurrency < 1 or (queue_size is not None and queue_size < 0):
+                raise ValueError
+        except ValueError:
+            raise ValueError(f"Límite de ruta inválido: {entry!r}") from None
+        limits[(method.upper(), path)] = (concurrency, queue_size)
+    return limits
+
+
+class RouteGate:
+    """
+    Concurrency limit of one route, with a bounded queue of waiting requests.
+
+    A slot freed while requests are waiting is handed to the oldest of them, so a
+    request arriving later never overtakes the queue.
+
+    Args:
+        limit (int): Requests handled at once.
+        queue_size (int): Requests allowed to wait for a slot.
+    """
+
+    def __init__(self, limit: int, queue_size: int):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.active = 0
+        self._waiters = deque()
+
+    def waiting(self) -> int:
+        """
+        Return the number of requests waiting for a slot.
+        """
+        return len(self._waiters)
+
+    async def acquire(self, timeout: float):
+        """
+        Take a slot, waiting at most `timeout` seconds for one.
+
+        Returns:
+            str or None: None once a slot is taken, to be given back with `release`.
+            Otherwise the reason the request has to be shed: `QUEUE_FULL` or
+            `QUEUE_TIMEOUT`.
+        """
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return None
+        if len(self._waiters) >= self.queue_size:
+            return QUEUE_FULL
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            # The slot may have been handed over just as the wait ran out.
+            return QUEUE_TIMEOUT if waiter.cancelled() else None
+        except asyncio.CancelledError:
+            if not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        return None
+
+    def release(self):
+        """
+        Give a slot back, handing it to the oldest waiting request if there is one.
+        """
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+class AdmissionControl:
+    """
+    The concurrency limits of the routes of the process, one `RouteGate` per route.
+
+    Args:
+        concurrency (int): Requests each route handles at once.
+        queue_size (int): Requests each route keeps waiting for a slot.
+        queue_timeout (float): Longest time a request waits for a slot, in seconds.
+        route_limits (dict, optional): `(concurrency, queue_size or None)` overrides by
+            `(method, path)`, see `parse_route_limits`.
+        enabled (bool): Whether the limits are applied.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = ADMISSION_CONCURRENCY,
+        queue_size: int = ADMISSION_QUEUE_SIZE,
+        queue_timeout: float = ADMISSION_QUEUE_TIMEOUT_SECONDS,
+        route_limits: dict = None,
+        enabled: bool = ADMISSION_CONTROL_ENABLED,
+    ):
+        self.concurrency = max(1, concurrency)
+        self.queue_size = max(0, queue_size)
+        self.queue_timeout = queue_timeout
+        self.route_limits = route_limits or {}
+        self.enabled = enabled
+        self._gates = {}
+
+    def gate(self, method: str, path: str) -> RouteGate:
+        """
+        Return the gate of a route, creating it on first use.
+        """
+        gate = self._gates.get((method, path))
+        if gate is None:
+            concurrency, queue_size = self.route_limits.get(
+                (method, path), (self.concurrency, None)
+            )
+            gate = self._gates[(method, path)] = RouteGate(
+                concurrency, self.queue_size if queue_size is None else queue_size
+            )
+        return gate
+
+    async def admit(self, method: str, path: str):
+        """
+        Wait for a slot of a route.
+
+        Returns:
+            tuple: A tuple containing:
+                - RouteGate or None: The gate to `release` once the request is handled.
+                  None if the request has to be shed, or if the control is disabled.
+                - str or None: The reason the request has to be shed, or None.
+        """
+        if not self.enabled:
+            return None, None
+        gate = self.gate(method, path)
+        labels = (method, path)
+        requests_queued.add(labels, 1)
+        try:
+            reason = await gate.acquire(self.queue_timeout)
+        finally:
+            requests_queued.add(labels, -1)
+        if reason is not None:
+            requests_shed.add((method, path, reason))
+            return None, reason
+        return gate, None
+
+
+admission = AdmissionControl(route_limits=parse_route_limits(ADMISSION_ROUTE_LIMITS))
+
+
+def _overloaded() -> JSONResponse:
+    return JSONResponse(
+        {"detail": "El servicio está saturado, intente de nuevo más tarde"},
+        status_code=503,
+        headers={"Retry-After": str(ADMISSION_RETRY_AFTER_SECONDS)},
+    )
+
+
+def _timed_out() -> JSONResponse:
+    return JSONResponse(
+        {"detail": "La solicitud excedió su tiempo límite"}, status_code=504
+    )
+
+
+async def each_within_deadline(iterator):
+    """
+    Iterate over the source of a streamed body, giving every step (e.g. a cursor round
+    trip) its own `REQUEST_DEADLINE_SECONDS` instead of one for the whole stream, so a
+    long export is not cut while each of its reads stays bounded.
+    """
+    iterator = aiter(iterator)
+    while True:
+        with pymongo.timeout(REQUEST_DEADLINE_SECONDS or None):
+            try:
+                item = await anext(iterator)
+            except StopAsyncIteration:
+                return
+        yield item
+
+
+class AdmissionRoute(MetricsRoute):
+    """
+    API route that admits its requests through `admission` and runs their handler within
+    the request deadline, on top of the metrics of `MetricsRoute`.
+
+    The deadline starts once the request is admitted (the wait for a slot has its own
+    bound) and ends when the handler returns its response, so a streamed body is not
+    covered by it (see `each_within_deadline`). A MongoDB timeout raised by the handler
+    becomes a 504.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def handle_within_deadline(request):
+            try:
+                with pymongo.timeout(REQUEST_DEADLINE_SECONDS or None):
+                    return await handler(request)
+            except PyMongoError as e:
+                if not e.timeout:
+                    raise
+                requests_timed_out.add((request.method, self.path))
+                return _timed_out()
+
+        return handle_within_deadline
+
+    async def handle(self, scope, receive, send):
+        gate, reason = await admission.admit(scope["method"], self.path)
+        if reason is not None:
+            await _overloaded()(scope, receive, send)
+            return
+        try:
+            await super().handle(scope, receive, send)
+        finally:
+            if gate is not None:
+                gate.release()
@@ -0,0 +1,59 @@
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+
+def _error_message(error: dict) -> str:
+    if error["type"] == "value_error":
+        return str(error["ctx"]["error"])
+    field = ".".join(str(part) for part in error["loc"][1:])
+    return f"{field}: {error['msg']}" if field else error["msg"]
+
+
+def validate_batch(adapter: TypeAdapter, model: type[BaseModel], items: list) -> list:
+    """
+    Validate the items of a batch request, reporting errors per item.
+
+    The whole list is validated in one pass with `adapter` (a `TypeAdapter(list[model])`).
+    Only when that fails are the errors grouped by item, and the remaining items
+    validated on their own, so one bad item does not reject the whole batch.
+
+    Args:
+        adapter (TypeAdapter): The adapter of the list type.
+        model (type[BaseModel]): The model of a single item.
+        items (list): The raw items of the request body.
+
+    Returns:
+        list: One `(value, error)` tuple per item: the validated model and None, or None
+        and the validation error message. Messages raised by the field validators are
+        returned as is, so they match the errors of the single-item endpoints.
+    """
+    try:
+        return [(value, None) for value in adapter.validate_python(items)]
+    except ValidationError as e:
+        errors = {}
+        for error in e.errors():
+            errors.setdefault(error["loc"][0], _error_message(error))
+
+    results = []
+    for index, item in enumerate(items):
+        if index in errors:
+            results.append((None, errors[index]))
+        else:
+            results.append((model.model_validate(item), None))
+    return results
+
+
+def batch_results(outcomes) -> list:
+    """
+    Shape the `(value, error)` outcome of every batch item as a response entry.
+
+    Returns:
+        list: `{"index": i, "model": value}` or `{"index": i, "error": error}` per item.
+    """
+    return [
+        (
+            {"index": index, "model": value}
+            if error is None
+            else {"index": index, "error": error}
+        )
+        for index, (value, error) in enumerate(outcomes)
+    ]
@@ -0,0 +1,22 @@
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Check whether an `If-None-Match` header matches an ETag.
+
+    Comparison is weak, as required for `If-None-Match`: the `W/` prefix is ignored.
+
+    Args:
+        if_none_match (str): The raw header value, possibly a comma-separated list or `*`.
+        etag (str): The current ETag of the resource.
+
+    Returns:
+        bool: Whether the client already holds the current representation.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    current = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == current
+        for candidate in if_none_match.split(",")
+    )
@@ -0,0 +1,80 @@
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+INDEXES = {
+    "brands": [
+        IndexModel([("name", ASCENDING)], name="name_unique", unique=True),
+    ],
+    "models": [
+        IndexModel(
+            [("brand_id", ASCENDING), ("name", ASCENDING)],
+            name="brand_id_name_unique",
+            unique=True,
+        ),
+        IndexModel([("brand_id", ASCENDING), ("_id", ASCENDING)], name="brand_id_id"),
+        IndexModel(
+            [("average_price", ASCENDING), ("_id", ASCENDING)], name="average_price_id"
+        ),
+    ],
+    "price_history": [
+        IndexModel(
+            [("model_id", ASCENDING), ("start", ASCENDING)], name="model_id_start"
+        ),
+    ],
+}
+
+
+def _index_mismatches(declared, existing):
+    """
+    Compare the declared indexes of a collection with its `index_information()`.
+
+    Returns:
+        list: A description of every declared index that is missing or differs.
+    """
+    mismatches = []
+    for index in declared:
+        spec = index.document
+        info = existing.get(spec["name"])
+        if info is None:
+            mismatches.append(f"{spec['name']}: no existe")
+        elif list(info["key"]) != list(spec["key"].items()):
+            mismatches.append(f"{spec['name']}: llaves {info['key']}")
+        elif bool(info.get("unique")) != bool(spec.get("unique")):
+            mismatches.append(f"{spec['name']}: unique={bool(info.get('unique'))}")
+    return mismatches
+
+
+async def ensure_indexes(collections: dict):
+    """
+    Create the indexes declared in `INDEXES` and verify that they exist as declared.
+
+    Index creation is idempotent, so this runs on every startup. The unique indexes
+    back the create paths of the services: a brand name is unique, and a model name is
+    unique within its brand, so inserts can rely on `DuplicateKeyError` instead of a
+    prior existence check. The `average_price_id` index serves the price range filters
+    and, with `brand_id_id`, the keyset pagination of the model listings.
+    `model_id_start` serves the time range reads of the price history buckets.
+
+    Args:
+        collections (dict): The `brands`, `models` and `price_history` collections to
+            index.
+
+    Raises:
+        RuntimeError: If an index cannot be created (e.g. duplicated data prevents a
+            unique index, or an index with the same keys and other options exists) or
+            does not match its declaration after creation.
+    """
+    for name, collection in collections.items():
+        declared = INDEXES[name]
+        try:
+            await collection.create_indexes(declared)
+        except OperationFailure as e:
+            raise RuntimeError(
+                f"No se pudieron crear los índices de {name}: {e.details or e}"
+            ) from e
+        mismatches = _index_mismatches(declared, await collection.index_information())
+        if mismatches:
+            raise RuntimeError(
+                f"Índices de {name} inconsistentes: {', '.join(mismatches)}"
+            )
+        print(f"Índices de {name} verificados.")
@@ -0,0 +1,354 @@
+"""
+Request and database metrics, exported in the Prometheus text format.
+
+- `MetricsMiddleware` times every HTTP request, labelled by method, route template and
+  status, and counts the MongoDB commands each request issued.
+- `MetricsRoute` keeps the number of requests in flight per route.
+- The `http_requests_queued`, `http_requests_shed_total` and
+  `http_requests_timed_out_total` series follow the admission control and the request
+  deadlines (see `app.utils.admission`).
+- `CommandTimer` is a pymongo `CommandListener` that times every command by collection,
+  command name and the route that issued it.
+- The `catalog_price_write_*` histograms time the flushes of the price write queue
+  (see `PriceWriteQueue`).
+
+All of them only do a few dict updates and clock reads per event, so they can stay on in
+production. The route of the request being served travels in a context variable, which
+Motor copies into the threads that run the commands.
+"""
+
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+
+from fastapi.routing import APIRoute
+from pymongo import monitoring
+
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+COMMAND_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000)
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class Histogram:
+    """
+    A Prometheus histogram with one series per combination of label values.
+    """
+
+    def __init__(self, name: str, help_text: str, labels: tuple, buckets: tuple):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_values: tuple, value: float):
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0, 0.0]
+            if position < len(self.buckets):
+                series[0][position] += 1
+            series[1] += 1
+            series[2] += value
+
+    def render(self) -> list:
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            series = [
+                (labels, list(counts), count, total)
+                for labels, (counts, count, total) in self._series.items()
+            ]
+        for label_values, counts, count, total in sorted(series):
+            labels = _labels(self.labels, label_values)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(
+                    f"{self.name}_bucket{_labels(self.labels, label_values, le=bound)} "
+                    f"{cumulative}"
+                )
+            lines.append(
+                f"{self.name}_bucket{_labels(self.labels, label_values, le='+Inf')} "
+                f"{count}"
+            )
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Counter:
+    """
+    A Prometheus counter or gauge with one series per combination of label values.
+    """
+
+    def __init__(self, name: str, help_text: str, labels: tuple, kind="counter"):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.kind = kind
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def add(self, label_values: tuple, amount: float = 1):
+        with self._lock:
+            self._series[label_values] = self._series.get(label_values, 0) + amount
+
+    def render(self) -> list:
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        with self._lock:
+            series = sorted(self._series.items())
+        for label_values, value in series:
+            lines.append(f"{self.name}{_labels(self.labels, label_values)} {value}")
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple, values: tuple, le=None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if le is not None:
+        pairs.append(f'le="{le}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Time to serve an HTTP request, including the response body.",
+    ("method", "route", "status"),
+    LATENCY_BUCKETS,
+)
+requests_in_flight = Counter(
+    "http_requests_in_flight",
+    "HTTP requests being handled by each route.",
+    ("method", "route"),
+    kind="gauge",
+)
+requests_queued = Counter(
+    "http_requests_queued",
+    "HTTP requests waiting for a slot of their route.",
+    ("method", "route"),
+    kind="gauge",
+)
+requests_shed = Counter(
+    "http_requests_shed_total",
+    "HTTP requests rejected with a 503 by the admission control, by reason.",
+    ("method", "route", "reason"),
+)
+requests_timed_out = Counter(
+    "http_requests_timed_out_total",
+    "HTTP requests whose MongoDB operations ran past the request deadline.",
+    ("method", "route"),
+)
+commands_per_request = Histogram(
+    "mongo_commands_per_request",
+    "MongoDB commands issued while serving one HTTP request.",
+    ("method", "route"),
+    COMMAND_COUNT_BUCKETS,
+)
+command_duration = Histogram(
+    "mongo_command_duration_seconds",
+    "Duration of the MongoDB commands, by the route that issued them.",
+    ("collection", "command", "route"),
+    LATENCY_BUCKETS,
+)
+command_failures = Counter(
+    "mongo_command_failures_total",
+    "MongoDB commands that failed, by the route that issued them.",
+    ("collection", "command", "route"),
+)
+price_write_flush_duration = Histogram(
+    "catalog_price_write_flush_seconds",
+    "Time to write one batch of queued price updates.",
+    (),
+    LATENCY_BUCKETS,
+)
+price_write_batch_size = Histogram(
+    "catalog_price_write_batch_size",
+    "Models written per flush of the price write queue.",
+    (),
+    BATCH_SIZE_BUCKETS,
+)
+price_write_latency = Histogram(
+    "catalog_price_write_latency_seconds",
+    "Time from queueing a price update until its flush is written.",
+    (),
+    LATENCY_BUCKETS,
+)
+
+REGISTRY = [
+    request_duration,
+    requests_in_flight,
+    requests_queued,
+    requests_shed,
+    requests_timed_out,
+    commands_per_request,
+    command_duration,
+    command_failures,
+    price_write_flush_duration,
+    price_write_batch_size,
+    price_write_latency,
+]
+
+
+class RequestMetrics:
+    """
+    The state of the request being served, shared through `current_request`.
+    """
+
+    __slots__ = ("method", "route", "commands")
+
+    def __init__(self, method: str):
+        self.method = method
+        self.route = UNMATCHED_ROUTE
+        self.commands = 0
+
+
+current_request = ContextVar("current_request", default=None)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that records the latency and the MongoDB command count of every
+    HTTP request. The route is the path template of the matched route (e.g.
+    `/brands/{brand_id}/models`), so the series do not grow with the IDs requested.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = RequestMetrics(scope["method"])
+        token = current_request.set(request)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_request.reset(token)
+            route = scope.get("route")
+            if route is not None:
+                request.route = route.path
+            request_duration.observe((request.method, request.route, status), elapsed)
+            commands_per_request.observe(
+                (request.method, request.route), request.commands
+            )
+
+
+class MetricsRoute(APIRoute):
+    """
+    API route that counts its requests in flight and names the route of the request
+    for the metrics recorded while it is handled.
+    """
+
+    async def handle(self, scope, receive, send):
+        request = current_request.get()
+        if request is None:
+            await super().handle(scope, receive, send)
+            return
+        request.route = self.path
+        labels = (request.method, self.path)
+        requests_in_flight.add(labels, 1)
+        try:
+            await super().handle(scope, receive, send)
+        finally:
+            requests_in_flight.add(labels, -1)
+
+
+class CommandTimer(monitoring.CommandListener):
+    """
+    pymongo listener that records the duration of every command and counts it towards
+    the request that issued it. Commands issued outside of a request (e.g. at startup)
+    are labelled with an empty route.
+    """
+
+    def __init__(self):
+        self._pending = {}
+
+    def started(self, event):
+        request = current_request.get()
+        if request is not None:
+            request.commands += 1
+        command = event.command
+        collection = command.get(event.command_name)
+        if event.command_name == "getMore":
+            collection = command.get("collection")
+        if not isinstance(collection, str):
+            collection = ""
+        route = request.route if request is not None else ""
+        self._pending[(event.connection_id, event.request_id)] = (collection, route)
+
+    def _finish(self, event):
+        collection, route = self._pending.pop(
+            (event.connection_id, event.request_id), ("", "")
+        )
+        return (collection, event.command_name, route)
+
+    def succeeded(self, event):
+        command_duration.observe(self._finish(event), event.duration_micros / 1e6)
+
+    def failed(self, event):
+        labels = self._finish(event)
+        command_duration.observe(labels, event.duration_micros / 1e6)
+        command_failures.add(labels)
+
+
+command_timer = CommandTimer()
+
+
+def render_metrics(extra: list = ()) -> str:
+    """
+    Render every metric of the registry, followed by `extra` lines, in the Prometheus
+    text exposition format.
+    """
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    lines.extend(extra)
+    return "\n".join(lines) + "\n"
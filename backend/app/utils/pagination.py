@@ -0,0 +1,83 @@
+import base64
+import binascii
+import json
+
+
+def encode_cursor(values: list) -> str:
+    """
+    Encode the sort key of the last item of a page as an opaque cursor.
+
+    Args:
+        values (list): The values of the sort fields of the last item, in sort order.
+
+    Returns:
+        str: A URL-safe token to pass back as `after` to fetch the next page.
+    """
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(token: str, size: int):
+    """
+    Decode a cursor produced by `encode_cursor`.
+
+    The cursors end with the integer `_id` of the last item, preceded by the values of
+    the other sort fields, which are prices: numbers or null. Anything else is rejected,
+    so a forged cursor can neither inject query operators nor compare unlike types.
+
+    Args:
+        token (str): The opaque cursor.
+        size (int): The number of sort fields the cursor must carry.
+
+    Returns:
+        list or None: The sort key values, or None if the token is not a valid cursor.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError):
+        return None
+    if not isinstance(values, list) or len(values) != size:
+        return None
+    if not _is_int(values[-1]):
+        return None
+    if not all(value is None or _is_number(value) for value in values[:-1]):
+        return None
+    return values
+
+
+def _is_int(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_number(value) -> bool:
+    return _is_int(value) or isinstance(value, float)
+
+
+def keyset_filter(field: str, value, last_id: int, descending: bool = False) -> dict:
+    """
+    Build the filter that selects the documents after `(value, last_id)`.
+
+    The documents are assumed to be sorted by `(field, _id)`, both ascending or both
+    descending. MongoDB sorts null (or missing) values before any number, and range
+    operators never match null, so null values get explicit clauses.
+
+    Args:
+        field (str): The primary sort field.
+        value: The value of `field` in the last document of the previous page.
+        last_id (int): The `_id` of the last document of the previous page.
+        descending (bool): Whether the sort is descending.
+
+    Returns:
+        dict: A MongoDB filter matching only the documents of the following pages.
+    """
+    op = "$lt" if descending else "$gt"
+    same_value = {field: value, "_id": {op: last_id}}
+    if value is None:
+        if descending:
+            return same_value
+        return {"$or": [same_value, {field: {"$ne": None}}]}
+    clauses = [{field: {op: value}}, same_value]
+    if descending:
+        clauses.append({field: None})
+    return {"$or": clauses}
@@ -1,21 +1,110 @@
-from app.config import database
-from pymongo import ReturnDocument
+import asyncio
+
+from app.config import SEQUENCE_BLOCK_SIZE
+from app.repositories import get_storage
+
+
+class SequenceAllocator:
+    """
+    Hands out sequence numbers from blocks reserved in the counters of the storage (hi/lo).
+
+    Instead of incrementing the counter once per ID, the allocator reserves a
+    block of `block_size` numbers with a single atomic increment and serves them from
+    memory until the block is exhausted. Every process reserves disjoint blocks, so IDs
+    stay unique across workers; the trade-off is that IDs are not strictly increasing
+    across processes and the unused part of a block is skipped when a process exits.
+
+    The counter document keeps the same shape used by earlier versions
+    (`{"_id": name, "seq": <last reserved number>}`), so existing sequences continue
+    where they left off.
+
+    Attributes:
+        name (str): The name of the sequence (the `_id` of its counter document).
+        block_size (int): The amount of numbers reserved per round trip.
+        repository (SequenceRepository, optional): The counters to claim blocks from.
+            Defaults to those of the active storage.
+    """
+
+    def __init__(
+        self, name: str, block_size: int = SEQUENCE_BLOCK_SIZE, repository=None
+    ):
+        self.name = name
+        self.block_size = max(1, block_size)
+        self.repository = repository
+        self._next = 0
+        self._end = 0
+        self._lock = asyncio.Lock()
+
+    async def _claim(self, count: int) -> range:
+        repository = self.repository or get_storage().sequences
+        last = await repository.claim(self.name, count)
+        return range(last - count + 1, last + 1)
+
+    async def reserve(self, count: int) -> list:
+        """
+        Reserve `count` sequence numbers.
+
+        Numbers left in the current block are used first; the rest is claimed with a
+        single increment rounded up to a whole number of blocks, and the surplus stays
+        available for later calls.
+
+        Args:
+            count (int): The amount of sequence numbers to reserve.
+
+        Returns:
+            list: The reserved numbers, in ascending order. Empty if `count` is 0.
+        """
+        async with self._lock:
+            taken = min(count, self._end - self._next)
+            ids = list(range(self._next, self._next + max(taken, 0)))
+            self._next += len(ids)
+            missing = count - len(ids)
+            if missing > 0:
+                blocks = -(-missing // self.block_size)
+                block = await self._claim(blocks * self.block_size)
+                ids.extend(block[:missing])
+                self._next = block.start + missing
+                self._end = block.stop
+            return ids
+
+    async def next(self) -> int:
+        """
+        Return the next sequence number.
+        """
+        return (await self.reserve(1))[0]
+
+
+_allocators = {}
+
+
+def get_allocator(name: str) -> SequenceAllocator:
+    """
+    Return the process-wide allocator of the `name` sequence, creating it on first use.
+
+    The allocator is bound to the counters of the active storage; it is replaced when
+    another storage becomes active, so blocks are never served across backends.
+    """
+    sequences = get_storage().sequences
+    allocator = _allocators.get(name)
+    if allocator is None or allocator.repository is not sequences:
+        allocator = _allocators[name] = SequenceAllocator(name, repository=sequences)
+    return allocator
 
 
 async def get_next_sequence(name: str) -> int:
     """
-    Asynchronously retrieves and increments the sequence number for a given name.
+    Asynchronously retrieves the next sequence number for a given name.
 
-    This function interacts with a MongoDB collection to find and update a document
-    with the specified name. If the document does not exist, it creates one with an
-    initial sequence value. The sequence number is incremented atomically to ensure
-    consistency in concurrent environments.
+    Numbers are served by the process-wide `SequenceAllocator` of the sequence, which
+    reserves them from the counters of the storage in blocks of `SEQUENCE_BLOCK_SIZE`. If the
+    counter document does not exist, it is created with an initial sequence value. The
+    blocks are reserved atomically to ensure uniqueness across concurrent workers.
 
     Args:
         name (str): The name of the sequence to retrieve and increment.
 
     Returns:
-        int: The updated sequence number after the increment.
+        int: The next sequence number.
 
     Raises:
         KeyError: If the "seq" field is not found in the retrieved document.
@@ -26,10 +115,29 @@ async def get_next_sequence(name: str) -> int:
         >>> print(next_seq)
         6
     """
-    counter = await database.counters.find_one_and_update(
-        {"_id": name},
-        {"$inc": {"seq": 1}},
-        return_document=ReturnDocument.AFTER,
-        upsert=True,
-    )
-    return counter["seq"]
+    return await get_allocator(name).next()
+
+
+async def reserve_sequence(name: str, count: int) -> list:
+    """
+    Reserves `count` sequence numbers for a given name in as few round trips as possible.
+
+    Bulk inserts use this to obtain all of their IDs at once; see
+    `SequenceAllocator.reserve`.
+
+    Args:
+        name (str): The name of the sequence to reserve numbers from.
+        count (int): The amount of sequence numbers to reserve.
+
+    Returns:
+        list: The reserved sequence numbers, in ascending order. Empty if `count` is 0.
+
+    Example:
+        >>> # Assuming an existing MongoDB collection with a document {"_id": "order", "seq": 5}
+        >>> ids = await reserve_sequence("order", 3)
+        >>> print(ids)
+        [6, 7, 8]
+    """
+    if count <= 0:
+        return []
+    return await get_allocator(name).reserve(count)
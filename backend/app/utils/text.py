@@ -0,0 +1,54 @@
+"""
+Folding of the brand and model names for search.
+
+`normalize` folds a name or a query: names match a query when their folded forms
+contain the folded query. `name_pattern` turns a folded query into a regular expression
+for MongoDB that matches the same names, so the storage can filter them.
+"""
+
+import re
+import unicodedata
+
+WORD = re.compile(r"\w+")
+# A run of characters `normalize` drops between two words (PCRE syntax, for MongoDB).
+SEPARATOR = r"[^\p{L}\p{N}_]+"
+
+
+def normalize(text: str) -> str:
+    """
+    Fold a name or a query for matching: lowercase, without accents, and with its words
+    separated by single spaces.
+    """
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(WORD.findall(text))
+
+
+def _accented_letters() -> dict:
+    # The Latin letters that `normalize` folds to each single character.
+    letters = {}
+    for code in range(0xC0, 0x250):
+        folded = normalize(chr(code))
+        if len(folded) == 1 and folded != chr(code):
+            letters[folded] = letters.get(folded, "") + chr(code)
+    return letters
+
+
+ACCENTED_LETTERS = _accented_letters()
+
+
+def name_pattern(query: str) -> str:
+    """
+    Return a regular expression, to apply ignoring case, matching the names whose
+    `normalize`d form contains a normalized query: every letter also matches its
+    accented Latin variants and every space any run of separators.
+    """
+    parts = []
+    for char in query:
+        if char == " ":
+            parts.append(SEPARATOR)
+        elif char in ACCENTED_LETTERS:
+            parts.append(f"[{char}{ACCENTED_LETTERS[char]}]")
+        else:
+            parts.append(re.escape(char))
+    return "".join(parts)
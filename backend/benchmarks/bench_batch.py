@@ -0,0 +1,112 @@
+"""
+Benchmark for the batch endpoints against the equivalent loop of single requests.
+
+Drives the FastAPI app in-process through an ASGI client, backed by a scratch database,
+and times creating N models with `POST /brands/{id}/models` one by one versus one
+`POST /brands/{id}/models:batch`, then updating their prices with `PUT /models/{id}`
+one by one versus one `PUT /models:batch`.
+
+Usage:
+    MONGO_DETAILS=mongodb://localhost:27017 python -m benchmarks.bench_batch \
+        --sizes 100 500 1000
+
+The scratch database (`nexu-bench` by default) is dropped when the run finishes.
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+from app.main import app
+from app.repositories import get_storage
+from app.services.cache import cache
+from benchmarks.mongo import bench_database, reset
+
+
+async def timed(coro):
+    started = time.perf_counter()
+    await coro
+    return (time.perf_counter() - started) * 1000
+
+
+async def create_brand(client, name):
+    response = await client.post("/brands", json={"name": name})
+    response.raise_for_status()
+    return response.json()["id"]
+
+
+async def single_creates(client, brand_id, models):
+    ids = []
+    for model in models:
+        response = await client.post(f"/brands/{brand_id}/models", json=model)
+        response.raise_for_status()
+        ids.append(response.json()["id"])
+    return ids
+
+
+async def batch_create(client, brand_id, models):
+    response = await client.post(f"/brands/{brand_id}/models:batch", json=models)
+    response.raise_for_status()
+    return [item["model"]["id"] for item in response.json()]
+
+
+async def single_updates(client, ids, price):
+    for model_id in ids:
+        response = await client.put(
+            f"/models/{model_id}", json={"average_price": price}
+        )
+        response.raise_for_status()
+
+
+async def batch_update(client, ids, price):
+    response = await client.put(
+        "/models:batch",
+        json=[{"id": model_id, "average_price": price} for model_id in ids],
+    )
+    response.raise_for_status()
+
+
+async def main(sizes, database_name: str):
+    mongo_client, database = bench_database(database_name)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        print(
+            f"{'models':>8} {'create loop ms':>15} {'create batch ms':>16} "
+            f"{'update loop ms':>15} {'update batch ms':>16}"
+        )
+        for size in sizes:
+            await reset(database)
+            cache.clear()
+            await get_storage().ensure_indexes()
+            models = [
+                {"name": f"Modelo {i}", "average_price": 100_000 + i}
+                for i in range(size)
+            ]
+            loop_brand = await create_brand(client, "Loop")
+            batch_brand = await create_brand(client, "Batch")
+
+            ids = []
+            create_loop = await timed(single_creates(client, loop_brand, models))
+            create_batch = await timed(batch_create(client, batch_brand, models))
+            async for model in database.models.find({"brand_id": loop_brand}):
+                ids.append(model["_id"])
+            update_loop = await timed(single_updates(client, ids, 250_000))
+            update_batch = await timed(batch_update(client, ids, 300_000))
+            print(
+                f"{size:>8} {create_loop:>15.1f} {create_batch:>16.1f} "
+                f"{update_loop:>15.1f} {update_batch:>16.1f}"
+            )
+
+    await mongo_client.drop_database(database_name)
+    mongo_client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 500, 1000])
+    parser.add_argument("--database", default="nexu-bench")
+    args = parser.parse_args()
+    asyncio.run(main(args.sizes, args.database))
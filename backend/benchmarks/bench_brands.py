@@ -0,0 +1,145 @@
+"""
+Benchmark for `GET /brands`: per-brand N+1 queries, a single aggregation, and the
+running per-brand price totals.
+
+Seeds a scratch database with synthetic catalogs of growing size and times the legacy
+implementation (one `find` per brand, averaged in Python), a single `$lookup`/`$group`
+aggregation, and `brand_service.get_all_brands`, which reads the totals maintained on
+the brand documents. The read cache is disabled, so every repeat reads the database.
+
+Usage:
+    MONGO_DETAILS=mongodb://localhost:27017 python -m benchmarks.bench_brands \
+        --sizes 677 10000 100000 250000 --repeat 5
+
+The scratch database (`nexu-bench` by default) is dropped and recreated for every size.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from app.services import brand_service
+from app.services.cache import cache
+from benchmarks.catalog import generate_rows
+from benchmarks.mongo import bench_database, reset
+
+
+async def legacy_get_all_brands(brands_collection, models_collection):
+    brands = []
+    async for brand in brands_collection.find():
+        models_cursor = models_collection.find({"brand_id": brand["_id"]})
+        prices = [
+            m.get("average_price")
+            async for m in models_cursor
+            if m.get("average_price") is not None
+        ]
+        average_price = round(sum(prices) / len(prices), 2) if prices else 0
+        brands.append(
+            {"id": brand["_id"], "name": brand["name"], "average_price": average_price}
+        )
+    return brands
+
+
+AGGREGATE_PIPELINE = [
+    {
+        "$lookup": {
+            "from": "models",
+            "localField": "_id",
+            "foreignField": "brand_id",
+            "pipeline": [
+                {
+                    "$group": {
+                        "_id": "$brand_id",
+                        "average_price": {"$avg": "$average_price"},
+                    }
+                }
+            ],
+            "as": "prices",
+        }
+    },
+    {"$project": {"name": 1, "average_price": {"$first": "$prices.average_price"}}},
+]
+
+
+async def aggregate_get_all_brands(brands_collection):
+    brands = []
+    async for brand in brands_collection.aggregate(AGGREGATE_PIPELINE):
+        average_price = brand.get("average_price")
+        brands.append(
+            {
+                "id": brand["_id"],
+                "name": brand["name"],
+                "average_price": (
+                    round(average_price, 2) if average_price is not None else 0
+                ),
+            }
+        )
+    return brands
+
+
+async def seed(database, size: int):
+    await reset(database)
+
+    brand_ids = {}
+    models = []
+    for model_id, row in enumerate(generate_rows(size), start=1):
+        brand_id = brand_ids.setdefault(row["brand_name"], len(brand_ids) + 1)
+        models.append(
+            {
+                "_id": model_id,
+                "brand_id": brand_id,
+                "name": row["name"],
+                "average_price": row["average_price"],
+            }
+        )
+    await database.brands.insert_many(
+        [{"_id": brand_id, "name": name} for name, brand_id in brand_ids.items()]
+    )
+    for start in range(0, len(models), 10_000):
+        await database.models.insert_many(models[start : start + 10_000])
+    await database.models.create_index([("brand_id", 1), ("name", 1)])
+    await brand_service.recompute_brand_price_totals()
+
+
+async def timed(fn, repeat: int):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = await fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return result, statistics.median(samples)
+
+
+async def main(sizes, repeat: int, database_name: str):
+    client, database = bench_database(database_name)
+    # Every repeat would otherwise be served by the read cache instead of the database.
+    cache.enabled = False
+
+    print(f"{'models':>10} {'legacy ms':>12} {'aggregate ms':>14} {'totals ms':>12}")
+    for size in sizes:
+        await seed(database, size)
+        legacy, legacy_ms = await timed(
+            lambda: legacy_get_all_brands(database.brands, database.models), repeat
+        )
+        aggregated, aggregate_ms = await timed(
+            lambda: aggregate_get_all_brands(database.brands), repeat
+        )
+        precomputed, totals_ms = await timed(brand_service.get_all_brands, repeat)
+        assert legacy == aggregated == precomputed, "Brand listings differ"
+        print(f"{size:>10} {legacy_ms:>12.1f} {aggregate_ms:>14.1f} {totals_ms:>12.1f}")
+
+    await client.drop_database(database_name)
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[677, 10_000, 100_000, 250_000]
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--database", default="nexu-bench")
+    args = parser.parse_args()
+    asyncio.run(main(args.sizes, args.repeat, args.database))
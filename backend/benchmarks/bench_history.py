@@ -0,0 +1,165 @@
+"""
+Benchmark of the price history: time buckets against one document per change.
+
+Generates `--changes-per-day` price changes per model and day over `--days` days, and
+writes them twice into a scratch database: into the `price_history` buckets through the
+repository, as `update_model` does, and into a `price_changes` collection holding one
+`{model_id, at, price, previous}` document per change, indexed by `(model_id, at)`.
+It then reports the documents, data size, storage size and index size of both
+collections, and times the same range queries (`--window-days` long, at random offsets)
+answered by `get_price_history` and by a `find` on the per-change collection.
+
+Usage:
+    MONGO_DETAILS=mongodb://localhost:27017 python -m benchmarks.bench_history \
+        --models 1000 --days 30 --changes-per-day 20 --queries 500
+
+The scratch database (`nexu-bench` by default) is dropped when the run finishes.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.config import PRICE_HISTORY_BUCKET_SIZE
+from app.repositories import get_storage
+from app.services.history_service import bucket_start, get_price_history
+from benchmarks.bench_search import summarize_us
+from benchmarks.mongo import bench_database, reset
+from pymongo import ASCENDING, IndexModel
+
+START = datetime(2026, 1, 5, tzinfo=timezone.utc)
+WRITE_BATCH = 10_000
+
+
+def generate_changes(models: int, days: int, per_day: int, seed: int):
+    """
+    Yield the price changes of every model, in time order.
+    """
+    rng = random.Random(seed)
+    prices = {model_id: rng.randrange(100_000, 900_000) for model_id in range(models)}
+    for day in range(days):
+        for second in sorted(rng.randrange(86_400) for _ in range(models * per_day)):
+            model_id = rng.randrange(models)
+            at = START + timedelta(days=day, seconds=second)
+            previous, prices[model_id] = prices[model_id], rng.randrange(
+                100_000, 900_000
+            )
+            yield model_id, at, prices[model_id], previous
+
+
+async def write(database, changes) -> tuple:
+    history = get_storage().price_history
+    naive = database.price_changes
+    await naive.create_indexes(
+        [IndexModel([("model_id", ASCENDING), ("at", ASCENDING)], name="model_id_at")]
+    )
+    bucketed_seconds = naive_seconds = 0.0
+    for offset in range(0, len(changes), WRITE_BATCH):
+        batch = changes[offset : offset + WRITE_BATCH]
+        started = time.perf_counter()
+        await history.append(
+            [
+                {
+                    "model_id": model_id,
+                    "start": bucket_start(at),
+                    "at": at,
+                    "price": price,
+                    "previous": previous,
+                }
+                for model_id, at, price, previous in batch
+            ],
+            PRICE_HISTORY_BUCKET_SIZE,
+        )
+        bucketed_seconds += time.perf_counter() - started
+        started = time.perf_counter()
+        await naive.insert_many(
+            [
+                {"model_id": model_id, "at": at, "price": price, "previous": previous}
+                for model_id, at, price, previous in batch
+            ],
+            ordered=False,
+        )
+        naive_seconds += time.perf_counter() - started
+    return bucketed_seconds, naive_seconds
+
+
+async def collection_stats(database, name: str) -> dict:
+    stats = await database.command("collStats", name)
+    return {
+        "documents": stats["count"],
+        "data MiB": stats["size"] / 2**20,
+        "storage MiB": stats["storageSize"] / 2**20,
+        "index MiB": stats["totalIndexSize"] / 2**20,
+    }
+
+
+async def main(args):
+    client, database = bench_database(args.database)
+    await reset(database)
+    await database.drop_collection("price_changes")
+    await get_storage().ensure_indexes()
+
+    changes = list(
+        generate_changes(args.models, args.days, args.changes_per_day, args.seed)
+    )
+    bucketed_seconds, naive_seconds = await write(database, changes)
+    print(
+        f"{len(changes)} cambios escritos: buckets {bucketed_seconds:.2f}s, "
+        f"un documento por cambio {naive_seconds:.2f}s"
+    )
+
+    print(
+        f"{'layout':>14} {'documents':>10} {'data MiB':>9} {'storage MiB':>12} "
+        f"{'index MiB':>10}"
+    )
+    for layout, name in (("buckets", "price_history"), ("per change", "price_changes")):
+        stats = await collection_stats(database, name)
+        print(
+            f"{layout:>14} {stats['documents']:>10} {stats['data MiB']:>9.1f} "
+            f"{stats['storage MiB']:>12.1f} {stats['index MiB']:>10.1f}"
+        )
+
+    rng = random.Random(args.seed)
+    window = timedelta(days=args.window_days)
+    span = max(1, int((timedelta(days=args.days) - window).total_seconds()))
+    queries = []
+    for _ in range(args.queries):
+        since = START + timedelta(seconds=rng.randrange(span))
+        queries.append((rng.randrange(args.models), since, since + window))
+
+    samples = {"buckets": [], "per change": []}
+    for model_id, since, until in queries:
+        started = time.perf_counter()
+        await get_price_history(model_id, since, until)
+        samples["buckets"].append(time.perf_counter() - started)
+        started = time.perf_counter()
+        await database.price_changes.find(
+            {"model_id": model_id, "at": {"$gte": since, "$lt": until}}
+        ).sort("at", ASCENDING).to_list(None)
+        samples["per change"].append(time.perf_counter() - started)
+
+    print(f"\n{args.window_days}-day ranges, {args.queries} queries")
+    print(f"{'layout':>14} {'p50 us':>9} {'p95 us':>9} {'p99 us':>9}")
+    for layout, values in samples.items():
+        summary = summarize_us(values)
+        print(
+            f"{layout:>14} {summary['p50']:>9.0f} {summary['p95']:>9.0f} "
+            f"{summary['p99']:>9.0f}"
+        )
+
+    await client.drop_database(args.database)
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--models", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--changes-per-day", type=int, default=20)
+    parser.add_argument("--window-days", type=int, default=7)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--database", default="nexu-bench")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,375 @@
+"""
+Load and latency benchmark of the API under mixed read/write traffic.
+
+Seeds a synthetic catalog into the in-memory storage backend, then drives the FastAPI app
+in-process through an ASGI client with a fixed, seeded sequence of requests for every
+scenario and concurrency level. Each run reports the throughput and the p50/p95/p99
+latency, overall and per operation:
+
+- `brands`: `GET /brands`
+- `brand_models`: `GET /brands/{id}/models`
+- `models_filtered`: `GET /models?greater=&lower=` over a random price window
+- `update_price`: `PUT /models/{id}`
+
+The `burst` scenario sends the listings of a few hot price windows, the way a traffic
+spike does, with enough price updates to keep invalidating the cache. Each run also
+reports the `storage_reads` issued by `get_all_brands` and `get_models_filtered` and the
+calls that were coalesced into another load (see `SingleFlight`). The in-memory backend
+answers without yielding to the event loop, so concurrent requests only overlap on a
+read with `--read-latency-ms`, which delays those reads like a MongoDB round trip would;
+compare with `--no-single-flight` to see the reads saved. `--write-behind` sends the
+price updates through the group-commit `PriceWriteQueue`:
+
+    python -m benchmarks.bench_load --scenarios burst --concurrency 64 --read-latency-ms 2
+    python -m benchmarks.bench_load --scenarios burst --concurrency 64 --read-latency-ms 2 \
+        --no-single-flight
+
+The results are written as JSON with stable key order, so the files of two commits can be
+diffed directly or compared with `--baseline`.
+
+Usage:
+    python -m benchmarks.bench_load --sizes 1000 100000 1000000 --brand-skew 1.1 \
+        --concurrency 1 16 64 --requests 5000 --output results.json
+    python -m benchmarks.bench_load --sizes 100000 --baseline results.json
+
+The in-memory backend needs no database, so the numbers measure the application itself
+(routing, validation, services, cache, serialization). Requests share one event loop with
+the app; the concurrency level is the number of requests in flight at once.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+
+import httpx
+from app.main import app
+from app.repositories import MemoryStorage, get_storage, use_storage
+from app.services.cache import cache
+from app.services.seed_service import bulk_populate
+from app.services.singleflight import single_flight
+from app.services.write_queue import price_write_queue
+from app.utils import sequence
+from benchmarks.catalog import generate_rows
+
+SCENARIOS = {
+    "read_heavy": {
+        "brands": 30,
+        "brand_models": 35,
+        "models_filtered": 30,
+        "update_price": 5,
+    },
+    "mixed": {
+        "brands": 25,
+        "brand_models": 25,
+        "models_filtered": 25,
+        "update_price": 25,
+    },
+    "write_heavy": {
+        "brands": 10,
+        "brand_models": 10,
+        "models_filtered": 10,
+        "update_price": 70,
+    },
+    "burst": {
+        "brands": 45,
+        "models_filtered": 45,
+        "update_price": 10,
+    },
+}
+
+PRICE_WINDOW = 50_000
+HOT_WINDOWS = 4
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """
+    Return the nearest-rank percentile of an ascending list.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(fraction * len(sorted_values) + 0.5))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies: list) -> dict:
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 0.50), 3),
+        "p95_ms": round(percentile(values, 0.95), 3),
+        "p99_ms": round(percentile(values, 0.99), 3),
+    }
+
+
+def plan_requests(scenario: str, count: int, catalog: dict, seed: int) -> list:
+    """
+    Draw the `(operation, method, url, body)` requests of a run from the scenario mix.
+    """
+    rng = random.Random(seed)
+    operations = list(SCENARIOS[scenario])
+    weights = list(SCENARIOS[scenario].values())
+    windows = None
+    if scenario == "burst":
+        windows = [
+            rng.randrange(100_000, catalog["max_price"]) for _ in range(HOT_WINDOWS)
+        ]
+    requests = []
+    for operation in rng.choices(operations, weights, k=count):
+        if operation == "brands":
+            requests.append((operation, "GET", "/brands", None))
+        elif operation == "brand_models":
+            brand_id = rng.choice(catalog["brand_ids"])
+            requests.append((operation, "GET", f"/brands/{brand_id}/models", None))
+        elif operation == "models_filtered":
+            if windows:
+                greater = rng.choice(windows)
+            else:
+                greater = rng.randrange(100_000, catalog["max_price"])
+            url = f"/models?greater={greater}&lower={greater + PRICE_WINDOW}"
+            requests.append((operation, "GET", url, None))
+        else:
+            model_id = rng.randint(1, catalog["models"])
+            price = rng.randrange(100_000, catalog["max_price"])
+            body = {"average_price": price}
+            requests.append((operation, "PUT", f"/models/{model_id}", body))
+    return requests
+
+
+async def collect(client, requests: list, concurrency: int) -> tuple:
+    """
+    Send the planned requests with `concurrency` of them in flight at any time.
+
+    Returns:
+        tuple: The latencies in milliseconds by operation, the number of error
+        responses and the elapsed seconds.
+    """
+    latencies = {}
+    errors = 0
+    pending = iter(requests)
+
+    async def worker():
+        nonlocal errors
+        for operation, method, url, body in pending:
+            started = time.perf_counter()
+            response = await client.request(method, url, json=body)
+            elapsed = (time.perf_counter() - started) * 1000
+            latencies.setdefault(operation, []).append(elapsed)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def report(latencies: dict, errors: int, elapsed: float) -> dict:
+    every = [value for values in latencies.values() for value in values]
+    return {
+        "requests": len(every),
+        "errors": errors,
+        "throughput_rps": round(len(every) / elapsed, 1),
+        "latency": summarize(every),
+        "operations": {
+            operation: summarize(values)
+            for operation, values in sorted(latencies.items())
+        },
+    }
+
+
+async def run(client, requests: list, concurrency: int) -> dict:
+    return report(*await collect(client, requests, concurrency))
+
+
+def count_storage_reads(storage, latency: float) -> dict:
+    """
+    Count the reads of the brand listing and of the models by price of a storage, and
+    delay each of them by `latency` seconds.
+    """
+    reads = {"brands": 0, "models": 0}
+    list_all = storage.brands.list_all
+    iter_by_price = storage.models.iter_by_price
+
+    async def counted_list_all():
+        reads["brands"] += 1
+        if latency:
+            await asyncio.sleep(latency)
+        return await list_all()
+
+    async def counted_iter_by_price(*args, **kwargs):
+        reads["models"] += 1
+        if latency:
+            await asyncio.sleep(latency)
+        async for model in iter_by_price(*args, **kwargs):
+            yield model
+
+    storage.brands.list_all = counted_list_all
+    storage.models.iter_by_price = counted_iter_by_price
+    return reads
+
+
+def describe_catalog(rows: list, summary: dict, brand_ids: list) -> dict:
+    """
+    Return what `plan_requests` needs to know about a seeded catalog.
+    """
+    return {
+        "models": summary["models_inserted"],
+        "brand_ids": brand_ids,
+        "max_price": max(row["average_price"] or 0 for row in rows) + 1,
+    }
+
+
+async def seed_catalog(size: int, brand_skew: float, seed: int) -> dict:
+    """
+    Load a fresh synthetic catalog into a new in-memory storage backend.
+    """
+    use_storage(MemoryStorage())
+    sequence._allocators.clear()
+    cache.clear()
+    rows = list(generate_rows(size, seed=seed, brand_skew=brand_skew))
+    with contextlib.redirect_stdout(io.StringIO()):
+        summary = await bulk_populate(rows)
+    brand_ids = [brand["_id"] for brand in await get_storage().brands.list_all()]
+    return describe_catalog(rows, summary, brand_ids)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results: dict, baseline: dict):
+    """
+    Print the change of throughput and p95/p99 against the runs of a baseline file.
+    """
+    previous = {
+        (run["size"], run["scenario"], run["concurrency"]): run
+        for run in baseline["runs"]
+    }
+    print(f"\nComparación con {baseline['commit']}:")
+    for run in results["runs"]:
+        old = previous.get((run["size"], run["scenario"], run["concurrency"]))
+        if old is None:
+            continue
+        changes = [
+            f"rps {_change(old['throughput_rps'], run['throughput_rps'])}",
+            f"p95 {_change(old['latency']['p95_ms'], run['latency']['p95_ms'])}",
+            f"p99 {_change(old['latency']['p99_ms'], run['latency']['p99_ms'])}",
+        ]
+        print(
+            f"{run['size']:>8} {run['scenario']:>12} {run['concurrency']:>5}  "
+            + "  ".join(changes)
+        )
+
+
+def _change(old: float, new: float) -> str:
+    if not old:
+        return "n/a"
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+async def main(args):
+    results = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "settings": {
+            "brand_skew": args.brand_skew,
+            "cache": cache.enabled and not args.no_cache,
+            "read_latency_ms": args.read_latency_ms,
+            "requests": args.requests,
+            "seed": args.seed,
+            "single_flight": not args.no_single_flight,
+            "write_behind": args.write_behind,
+        },
+        "runs": [],
+    }
+    cache.enabled = cache.enabled and not args.no_cache
+    single_flight.enabled = not args.no_single_flight
+    price_write_queue.enabled = args.write_behind
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        print(
+            f"{'models':>8} {'scenario':>12} {'conc':>5} {'rps':>9} "
+            f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6} "
+            f"{'reads':>7} {'coalesced':>9}"
+        )
+        for size in args.sizes:
+            for scenario in args.scenarios:
+                for concurrency in args.concurrency:
+                    # Every run starts from the same catalog, so the writes of one run
+                    # do not change the data seen by the next.
+                    catalog = await seed_catalog(size, args.brand_skew, args.seed)
+                    requests = plan_requests(
+                        scenario, args.requests, catalog, args.seed
+                    )
+                    reads = count_storage_reads(
+                        get_storage(), args.read_latency_ms / 1000
+                    )
+                    single_flight.clear()
+                    outcome = await run(client, requests, concurrency)
+                    coalesced = sum(
+                        counters["coalesced"]
+                        for counters in single_flight.stats().values()
+                    )
+                    results["runs"].append(
+                        {
+                            "size": size,
+                            "scenario": scenario,
+                            "concurrency": concurrency,
+                            **outcome,
+                            "storage_reads": reads,
+                            "coalesced": coalesced,
+                        }
+                    )
+                    latency = outcome["latency"]
+                    print(
+                        f"{size:>8} {scenario:>12} {concurrency:>5} "
+                        f"{outcome['throughput_rps']:>9.1f} {latency['p50_ms']:>8.2f} "
+                        f"{latency['p95_ms']:>8.2f} {latency['p99_ms']:>8.2f} "
+                        f"{outcome['errors']:>6} {sum(reads.values()):>7} "
+                        f"{coalesced:>9}"
+                    )
+
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--brand-skew", type=float, default=0.0)
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=sorted(SCENARIOS), default=sorted(SCENARIOS)
+    )
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--no-single-flight", action="store_true")
+    parser.add_argument("--read-latency-ms", type=float, default=0.0)
+    parser.add_argument("--write-behind", action="store_true")
+    parser.add_argument("--output")
+    parser.add_argument("--baseline")
+    asyncio.run(main(parser.parse_args()))
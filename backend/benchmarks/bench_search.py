@@ -0,0 +1,141 @@
+"""
+Benchmark of `GET /search`: the in-memory search index against a name query on the
+storage.
+
+Seeds catalogs of growing size, builds the `SearchIndex` from them and times the same
+queries answered by the index and by the `search_names` query of the storage, which is
+what `search_catalog` falls back to without the index: a case-insensitive `$regex` on
+the brand and model names on MongoDB, or a scan of the names with the in-memory backend.
+
+The queries are drawn from the catalog: two-letter prefixes, whole words, substrings
+from the middle of a name, names with two letters swapped (fuzzy) and brand prefixes.
+
+Usage:
+    MONGO_DETAILS=mongodb://localhost:27017 python -m benchmarks.bench_search \
+        --sizes 10000 100000 300000 --queries 500
+
+    python -m benchmarks.bench_search --backend memory --sizes 100000 300000
+
+With MongoDB, the scratch database (`nexu-bench` by default) is dropped and recreated
+for every size.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import random
+import time
+
+from app.repositories import MemoryStorage, get_storage, use_storage
+from app.services.search_index import SearchIndex, normalize
+from app.services.seed_service import bulk_populate
+from app.utils import sequence
+from benchmarks.bench_load import percentile
+from benchmarks.catalog import generate_rows
+from benchmarks.mongo import bench_database, reset
+
+
+def plan_queries(rows: list, count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    queries = []
+    kinds = ("prefix", "word", "substring", "typo", "brand")
+    for i in range(count):
+        kind = kinds[i % len(kinds)]
+        row = rng.choice(rows)
+        name = normalize(row["name"])
+        if kind == "prefix":
+            query = name[:2]
+        elif kind == "word":
+            query = rng.choice(name.split())
+        elif kind == "substring" and len(name) > 4:
+            start = rng.randrange(len(name) - 3)
+            query = name[start : start + 4]
+        elif kind == "typo" and len(name) > 4:
+            position = rng.randrange(1, len(name) - 1)
+            query = (
+                name[: position - 1]
+                + name[position]
+                + name[position - 1]
+                + name[position + 1 :]
+            )
+        else:
+            query = normalize(row["brand_name"])[:3]
+        queries.append(query)
+    return queries
+
+
+async def seed(backend: str, database, size: int) -> list:
+    if backend == "memory":
+        use_storage(MemoryStorage())
+        sequence._allocators.clear()
+    else:
+        await reset(database)
+    rows = list(generate_rows(size))
+    with contextlib.redirect_stdout(io.StringIO()):
+        await bulk_populate(rows)
+    return rows
+
+
+def summarize_us(samples: list) -> dict:
+    values = sorted(samples)
+    return {
+        "p50": percentile(values, 0.50) * 1e6,
+        "p95": percentile(values, 0.95) * 1e6,
+        "p99": percentile(values, 0.99) * 1e6,
+    }
+
+
+async def main(args):
+    client = database = None
+    if args.backend == "mongo":
+        client, database = bench_database(args.database)
+
+    print(
+        f"{'models':>8} {'build s':>8} {'index p50 us':>13} {'p95 us':>8} "
+        f"{'p99 us':>8} {'storage p50 us':>15} {'p95 us':>9} {'p99 us':>9}"
+    )
+    for size in args.sizes:
+        rows = await seed(args.backend, database, size)
+        index = SearchIndex(enabled=True)
+        started = time.perf_counter()
+        await index.build()
+        build_seconds = time.perf_counter() - started
+        queries = plan_queries(rows, args.queries, args.seed)
+
+        index_samples = []
+        for query in queries:
+            started = time.perf_counter()
+            index.search(query, args.limit)
+            index_samples.append(time.perf_counter() - started)
+
+        storage = get_storage()
+        storage_samples = []
+        for query in queries:
+            started = time.perf_counter()
+            await storage.brands.search_names(query, args.limit)
+            await storage.models.search_names(query, args.limit)
+            storage_samples.append(time.perf_counter() - started)
+
+        indexed = summarize_us(index_samples)
+        scanned = summarize_us(storage_samples)
+        print(
+            f"{size:>8} {build_seconds:>8.2f} {indexed['p50']:>13.1f} "
+            f"{indexed['p95']:>8.1f} {indexed['p99']:>8.1f} {scanned['p50']:>15.1f} "
+            f"{scanned['p95']:>9.1f} {scanned['p99']:>9.1f}"
+        )
+
+    if client is not None:
+        await client.drop_database(args.database)
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", choices=("mongo", "memory"), default="mongo")
+    parser.add_argument("--database", default="nexu-bench")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,99 @@
+"""
+Benchmark for the initial catalog load: row-by-row inserts versus the bulk pipeline.
+
+Writes a synthetic catalog file (1M rows by default) scaled up from `models.json`, loads
+it into a scratch database with `seed_service.bulk_populate`, and compares the rows per
+second against the original row-by-row loader on a prefix of the same file.
+
+Usage:
+    MONGO_DETAILS=mongodb://localhost:27017 python -m benchmarks.bench_seed \
+        --rows 1000000 --legacy-rows 5000 --batch-size 1000
+
+The scratch database (`nexu-bench` by default) is dropped when the run finishes.
+"""
+
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from app.models import BrandCreate, ModelCreate
+from app.services import brand_service, model_service
+from app.services.seed_service import bulk_populate
+from benchmarks.catalog import generate_rows
+from benchmarks.mongo import bench_database, reset
+
+
+async def legacy_populate(database, rows):
+    """
+    The original `startup_db_population` loop: several round trips per row.
+    """
+    for item in rows:
+        average_price = item.get("average_price")
+        if average_price is not None and average_price <= 0:
+            average_price = 0
+
+        brand = await database.brands.find_one({"name": item["brand_name"]})
+        if not brand:
+            brand, _ = await brand_service.create_brand(
+                BrandCreate(name=item["brand_name"])
+            )
+        brand_id = brand["_id"]
+        if await database.models.find_one({"brand_id": brand_id, "name": item["name"]}):
+            continue
+        await model_service.create_model_for_brand(
+            brand_id, ModelCreate(name=item["name"], average_price=average_price)
+        )
+
+
+def write_catalog(path: Path, rows: int):
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(list(generate_rows(rows)), f)
+
+
+async def main(rows: int, legacy_rows: int, batch_size: int, database_name: str):
+    client, database = bench_database(database_name)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "models.json"
+        write_catalog(path, rows)
+        print(f"Archivo sintético: {rows} filas, {path.stat().st_size / 2**20:.1f} MiB")
+
+        started = time.perf_counter()
+        with path.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+        parse_seconds = time.perf_counter() - started
+
+    if legacy_rows:
+        await reset(database)
+        started = time.perf_counter()
+        await legacy_populate(database, data[:legacy_rows])
+        legacy_seconds = time.perf_counter() - started
+        print(
+            f"row-by-row: {legacy_rows} filas en {legacy_seconds:.2f}s "
+            f"({legacy_rows / legacy_seconds:,.0f} filas/s)"
+        )
+
+    await reset(database)
+    summary = await bulk_populate(data, batch_size=batch_size)
+    bulk_seconds = summary["elapsed_seconds"]
+    print(f"json.load: {parse_seconds:.2f}s")
+    print(
+        f"bulk (batch {batch_size}): {rows} filas en {bulk_seconds:.2f}s "
+        f"({rows / bulk_seconds:,.0f} filas/s), "
+        f"{summary['models_inserted']} modelos insertados"
+    )
+
+    await client.drop_database(database_name)
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--legacy-rows", type=int, default=5_000)
+    parser.add_argument("--batch-size", type=int, default=1_000)
+    parser.add_argument("--database", default="nexu-bench")
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.legacy_rows, args.batch_size, args.database))
@@ -0,0 +1,132 @@
+"""
+Micro-benchmark of the response serialization of the list endpoints.
+
+Serves the same list of N brands or models from small FastAPI apps in-process, through an
+ASGI client, with three serialization paths:
+
+- `response_model`: the service dicts are returned and FastAPI validates them against
+  `list[BrandResponse]` / `list[ModelResponse]`, then encodes the result.
+- `untyped`: the previous `response_model=list` of the model endpoints, which goes
+  through `jsonable_encoder`.
+- `trusted_json`: the dicts are written with the `TypeAdapter` of `app.models`, as the
+  list endpoints do now.
+
+For each path it reports the wall and CPU time per request and the bytes per second of
+response body.
+
+Usage:
+    python -m benchmarks.bench_serialization --items 10000 --requests 50
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+from app.models import (
+    BrandResponse,
+    BrandResponseList,
+    ModelResponse,
+    ModelResponseList,
+)
+from app.utils.responses import trusted_json
+from fastapi import FastAPI
+
+
+def build_items(count: int) -> dict:
+    return {
+        "brands": [
+            {"id": i, "name": f"Brand {i}", "average_price": round(100000 + i * 1.5, 2)}
+            for i in range(1, count + 1)
+        ],
+        "models": [
+            {
+                "id": i,
+                "name": f"Model {i}",
+                "average_price": float(100000 + i) if i % 10 else None,
+            }
+            for i in range(1, count + 1)
+        ],
+    }
+
+
+def build_app(path: str, items: dict) -> FastAPI:
+    app = FastAPI()
+    brands, models = items["brands"], items["models"]
+    if path == "response_model":
+
+        @app.get("/brands", response_model=list[BrandResponse])
+        async def list_brands():
+            return brands
+
+        @app.get("/models", response_model=list[ModelResponse])
+        async def list_models():
+            return models
+
+    elif path == "untyped":
+
+        @app.get("/brands", response_model=list)
+        async def list_brands():
+            return brands
+
+        @app.get("/models", response_model=list)
+        async def list_models():
+            return models
+
+    else:
+
+        @app.get("/brands")
+        async def list_brands():
+            return trusted_json(BrandResponseList, brands)
+
+        @app.get("/models")
+        async def list_models():
+            return trusted_json(ModelResponseList, models)
+
+    return app
+
+
+async def measure(app: FastAPI, url: str, requests: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        (await client.get(url)).raise_for_status()
+        size = 0
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        for _ in range(requests):
+            response = await client.get(url)
+            size += len(response.content)
+        cpu = time.process_time() - cpu
+        wall = time.perf_counter() - wall
+    return {
+        "wall_ms": wall / requests * 1000,
+        "cpu_ms": cpu / requests * 1000,
+        "mb_per_second": size / wall / 1e6,
+    }
+
+
+async def main(args):
+    items = build_items(args.items)
+    print(
+        f"{args.items} elementos por respuesta, {args.requests} solicitudes por caso\n"
+        f"{'endpoint':>8} {'path':>15} {'wall ms':>9} {'cpu ms':>9} {'MB/s':>8}"
+    )
+    for url in ("/brands", "/models"):
+        baseline = None
+        for path in ("response_model", "untyped", "trusted_json"):
+            result = await measure(build_app(path, items), url, args.requests)
+            baseline = baseline or result["cpu_ms"]
+            print(
+                f"{url:>8} {path:>15} {result['wall_ms']:>9.2f} "
+                f"{result['cpu_ms']:>9.2f} {result['mb_per_second']:>8.1f}"
+                f"  ({baseline / result['cpu_ms']:.1f}x)"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
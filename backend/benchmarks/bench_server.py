@@ -0,0 +1,220 @@
+"""
+Throughput of the production server (`app.server`) per number of worker processes.
+
+Seeds a synthetic catalog into a scratch database, then for every `--workers` value
+starts `python -m app.server` over it, waits until the workers report ready and drives
+the server over HTTP with the scenarios of `bench_load`. The load is generated by
+`--client-processes` processes, so the client does not become the bottleneck before
+the server does; run it on a separate machine (`--url`) for the most faithful numbers.
+
+Usage:
+    MONGO_DETAILS=mongodb://localhost:27017 python -m benchmarks.bench_server \
+        --workers 1 2 4 8 --size 100000 --concurrency 64 256 --output server.json
+
+The scratch database (`nexu-bench` by default) is dropped when the run finishes. The
+results have the shape of `bench_load`, with a `workers` field on every run.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import signal
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import httpx
+from app.repositories import get_storage
+from app.server import available_cpus
+from app.services.seed_service import bulk_populate
+from benchmarks.bench_load import (
+    SCENARIOS,
+    collect,
+    describe_catalog,
+    git_commit,
+    plan_requests,
+    report,
+)
+from benchmarks.catalog import generate_rows
+from benchmarks.mongo import bench_database, reset
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def seed(database, size: int, brand_skew: float, seed_value: int) -> dict:
+    await reset(database)
+    rows = list(generate_rows(size, seed=seed_value, brand_skew=brand_skew))
+    with contextlib.redirect_stdout(io.StringIO()):
+        summary = await bulk_populate(rows)
+    brand_ids = [brand["_id"] for brand in await get_storage().brands.list_all()]
+    return describe_catalog(rows, summary, brand_ids)
+
+
+def start_server(workers: int, port: int, database_name: str):
+    env = dict(
+        os.environ,
+        MONGO_DB_NAME=database_name,
+        STORAGE_BACKEND="mongo",
+        WEB_CONCURRENCY=str(workers),
+        SERVER_PORT=str(port),
+        SERVER_MAX_REQUESTS="0",
+    )
+    return subprocess.Popen(
+        [sys.executable, "-m", "app.server"],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def stop_server(process):
+    process.send_signal(signal.SIGINT)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def wait_until_ready(url: str, workers: int, timeout: float = 120):
+    """
+    Poll `/readyz` until enough consecutive answers are 200 to cover every worker.
+    """
+    deadline = time.monotonic() + timeout
+    streak = 0
+    while streak < workers * 4:
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"El servidor no estuvo listo en {timeout:.0f}s")
+        try:
+            # A new connection per probe, so the probes spread over the workers.
+            ok = httpx.get(f"{url}/readyz", timeout=2).status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        streak = streak + 1 if ok else 0
+        if not ok:
+            time.sleep(0.2)
+
+
+def drive(url: str, requests: list, concurrency: int) -> tuple:
+    """
+    Load generator process: send `requests` to `url` and return the raw results.
+    """
+
+    async def main():
+        limits = httpx.Limits(max_connections=concurrency)
+        async with httpx.AsyncClient(base_url=url, limits=limits) as client:
+            return await collect(client, requests, concurrency)
+
+    return asyncio.run(main())
+
+
+def run_distributed(pool, processes: int, url, requests, concurrency) -> dict:
+    shares = [requests[i::processes] for i in range(processes)]
+    per_process = max(1, concurrency // processes)
+    results = list(
+        pool.map(
+            drive, [url] * processes, shares, [per_process] * processes, chunksize=1
+        )
+    )
+    latencies = {}
+    for process_latencies, _, _ in results:
+        for operation, values in process_latencies.items():
+            latencies.setdefault(operation, []).extend(values)
+    errors = sum(errors for _, errors, _ in results)
+    elapsed = max(elapsed for _, _, elapsed in results)
+    return report(latencies, errors, elapsed)
+
+
+async def main(args):
+    client, database = bench_database(args.database)
+    catalog = await seed(database, args.size, args.brand_skew, args.seed)
+    results = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "settings": {
+            "brand_skew": args.brand_skew,
+            "client_processes": args.client_processes,
+            "cpus": available_cpus(),
+            "requests": args.requests,
+            "seed": args.seed,
+            "size": args.size,
+        },
+        "runs": [],
+    }
+    print(
+        f"{'workers':>7} {'scenario':>12} {'conc':>5} {'rps':>9} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6}"
+    )
+    with ProcessPoolExecutor(args.client_processes) as pool:
+        for workers in args.workers:
+            process = None
+            url = args.url
+            if url is None:
+                process = start_server(workers, args.port, args.database)
+                url = f"http://127.0.0.1:{args.port}"
+            try:
+                wait_until_ready(url, workers)
+                for scenario in args.scenarios:
+                    for concurrency in args.concurrency:
+                        requests = plan_requests(
+                            scenario, args.requests, catalog, args.seed
+                        )
+                        outcome = run_distributed(
+                            pool, args.client_processes, url, requests, concurrency
+                        )
+                        results["runs"].append(
+                            {
+                                "workers": workers,
+                                "scenario": scenario,
+                                "concurrency": concurrency,
+                                **outcome,
+                            }
+                        )
+                        latency = outcome["latency"]
+                        print(
+                            f"{workers:>7} {scenario:>12} {concurrency:>5} "
+                            f"{outcome['throughput_rps']:>9.1f} "
+                            f"{latency['p50_ms']:>8.2f} {latency['p95_ms']:>8.2f} "
+                            f"{latency['p99_ms']:>8.2f} {outcome['errors']:>6}"
+                        )
+            finally:
+                if process is not None:
+                    stop_server(process)
+
+    await client.drop_database(args.database)
+    client.close()
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--brand-skew", type=float, default=0.0)
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=sorted(SCENARIOS), default=sorted(SCENARIOS)
+    )
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[64])
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--client-processes", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument(
+        "--url",
+        help="Drive an already running server (started with the same --database) "
+        "instead of starting one per --workers value.",
+    )
+    parser.add_argument("--database", default="nexu-bench")
+    parser.add_argument("--output")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,86 @@
+"""
+Synthetic catalog generation for the benchmarks.
+
+The catalogs are produced by scaling up the rows of `models.json`: every copy of the
+original file keeps the brand names and renames the models with a numeric suffix, so the
+number of brands stays fixed while the number of models per brand grows. With a brand
+skew, the rows are spread over the brands following a Zipf-like distribution instead, so
+a few brands own most of the models.
+"""
+
+import bisect
+import itertools
+import json
+import random
+from pathlib import Path
+
+MODELS_FILE = Path(__file__).resolve().parent.parent / "models.json"
+
+
+def load_seed_rows():
+    """
+    Load the rows of the bundled `models.json` file.
+
+    Returns:
+        list: The raw rows, each with `name`, `average_price` and `brand_name`.
+    """
+    with MODELS_FILE.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def generate_rows(size: int, seed: int = 0, brand_skew: float = 0.0):
+    """
+    Yield `size` synthetic catalog rows derived from `models.json`.
+
+    Args:
+        size (int): The number of rows to generate.
+        seed (int): Seed for the price jitter and the brand draws, so runs are reproducible.
+        brand_skew (float): Zipf exponent of the number of models per brand. 0 keeps the
+            proportions of `models.json`; with 1, the k-th brand gets about 1/k of the
+            models of the first one.
+
+    Yields:
+        dict: A row with the same shape as the entries in `models.json`.
+    """
+    rng = random.Random(seed)
+    base_rows = load_seed_rows()
+    if brand_skew > 0:
+        yield from _skewed_rows(size, rng, base_rows, brand_skew)
+        return
+    for i in range(size):
+        row = base_rows[i % len(base_rows)]
+        copy = i // len(base_rows)
+        price = row["average_price"]
+        if copy and price:
+            price = round(price * rng.uniform(0.8, 1.2))
+        yield {
+            "name": row["name"] if copy == 0 else f"{row['name']} {copy}",
+            "average_price": price,
+            "brand_name": row["brand_name"],
+        }
+
+
+def _skewed_rows(size: int, rng: random.Random, base_rows: list, brand_skew: float):
+    by_brand = {}
+    for row in base_rows:
+        by_brand.setdefault(row["brand_name"], []).append(row)
+    brands = list(by_brand)
+    weights = itertools.accumulate(
+        1 / (rank**brand_skew) for rank in range(1, len(brands) + 1)
+    )
+    cumulative = list(weights)
+    drawn = {}
+    for i in range(size):
+        brand = brands[bisect.bisect(cumulative, rng.random() * cumulative[-1])]
+        rows = by_brand[brand]
+        count = drawn.get(brand, 0)
+        drawn[brand] = count + 1
+        row = rows[count % len(rows)]
+        price = row["average_price"]
+        if price:
+            price = round(price * rng.uniform(0.8, 1.2))
+        yield {
+            "name": f"{row['name']} {count // len(rows) + 1}",
+            "average_price": price,
+            "brand_name": brand,
+        }
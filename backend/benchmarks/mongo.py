@@ -0,0 +1,37 @@
+"""
+Scratch database wiring for the benchmarks.
+
+The services go through the active storage backend, so the benchmarks make a MongoDB
+backend over a scratch database the active one before running anything.
+"""
+
+import os
+
+import motor.motor_asyncio
+from app.repositories import use_storage
+from app.repositories.mongo import MongoStorage
+from app.utils import sequence
+
+
+def bench_database(database_name: str):
+    """
+    Connect to `MONGO_DETAILS` and point the services at `database_name`.
+
+    Returns:
+        tuple: The `AsyncIOMotorClient` and the scratch `AsyncIOMotorDatabase`.
+    """
+    client = motor.motor_asyncio.AsyncIOMotorClient(
+        os.getenv("MONGO_DETAILS", "mongodb://localhost:27017")
+    )
+    database = client[database_name]
+    use_storage(MongoStorage.from_database(database))
+    return client, database
+
+
+async def reset(database):
+    """
+    Drop the collections used by the application and the ID blocks reserved from them.
+    """
+    for name in ("brands", "models", "price_history", "counters"):
+        await database.drop_collection(name)
+    sequence._allocators.clear()
@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.database import create_client
+from app.repositories import MemoryStorage, MongoStorage, use_storage
+from app.services.cache import cache
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def mongo_storage():
+    # The client never connects: the tests replace the collection methods they use.
+    client = create_client()
+    storage = MongoStorage.from_database(client["nexu-test"], client=client)
+    previous = use_storage(storage)
+    yield storage
+    use_storage(previous)
+    client.close()
+
+
+@pytest.fixture
+def memory_storage():
+    storage = MemoryStorage()
+    previous = use_storage(storage)
+    yield storage
+    use_storage(previous)
@@ -0,0 +1,185 @@
+import asyncio
+import json
+import os
+import sys
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from pymongo import _csot
+from pymongo.errors import ExecutionTimeout
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.main import app
+from app.repositories import get_storage
+from app.services import brand_service
+from app.utils import admission as admission_module
+from app.utils import metrics
+from app.utils.admission import QUEUE_FULL, AdmissionControl, parse_route_limits
+
+
+@pytest.fixture(autouse=True)
+def clear_metrics():
+    for metric in metrics.REGISTRY:
+        metric.clear()
+    yield
+
+
+def use_admission(monkeypatch, **kwargs):
+    control = AdmissionControl(**kwargs)
+    monkeypatch.setattr(admission_module, "admission", control)
+    return control
+
+
+def hold_brands(monkeypatch):
+    """
+    Make `GET /brands` wait until the returned event is set.
+    """
+    release = asyncio.Event()
+
+    async def slow_get_all_brands():
+        await release.wait()
+        return []
+
+    monkeypatch.setattr(brand_service, "get_all_brands", slow_get_all_brands)
+    return release
+
+
+def test_parse_route_limits():
+    assert parse_route_limits("") == {}
+    assert parse_route_limits("get /models=8:16, PUT /models/{model_id}=4") == {
+        ("GET", "/models"): (8, 16),
+        ("PUT", "/models/{model_id}"): (4, None),
+    }
+    for value in ("GET /models", "/models=4", "GET /models=0", "GET /models=4:x"):
+        with pytest.raises(ValueError):
+            parse_route_limits(value)
+
+
+@pytest.mark.asyncio
+async def test_requests_over_the_queue_are_shed(monkeypatch, memory_storage):
+    control = use_admission(monkeypatch, concurrency=1, queue_size=1, queue_timeout=5)
+    release = hold_brands(monkeypatch)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        first = asyncio.create_task(client.get("/brands"))
+        second = asyncio.create_task(client.get("/brands"))
+        while control.gate("GET", "/brands").waiting() < 1:
+            await asyncio.sleep(0.001)
+
+        shed = await client.get("/brands")
+        assert shed.status_code == 503
+        assert shed.headers["Retry-After"] == "1"
+        # Other routes keep their own slots.
+        assert (await client.get("/models")).status_code == 200
+
+        release.set()
+        assert [r.status_code for r in await asyncio.gather(first, second)] == [
+            200,
+            200,
+        ]
+
+    gate = control.gate("GET", "/brands")
+    assert (gate.active, gate.waiting()) == (0, 0)
+    rendered = metrics.render_metrics()
+    assert (
+        f'http_requests_shed_total{{method="GET",route="/brands",reason="{QUEUE_FULL}"}} 1'
+        in rendered
+    )
+    assert 'http_requests_queued{method="GET",route="/brands"} 0' in rendered
+
+
+@pytest.mark.asyncio
+async def test_queued_requests_give_up_after_the_queue_timeout(
+    monkeypatch, memory_storage
+):
+    use_admission(monkeypatch, concurrency=1, queue_size=4, queue_timeout=0.05)
+    release = hold_brands(monkeypatch)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        first = asyncio.create_task(client.get("/brands"))
+        await asyncio.sleep(0.01)
+        assert (await client.get("/brands")).status_code == 503
+        release.set()
+        assert (await first).status_code == 200
+
+    assert "queue_timeout" in metrics.render_metrics()
+
+
+def test_mongo_operations_run_within_the_request_deadline(monkeypatch):
+    monkeypatch.setattr(admission_module, "REQUEST_DEADLINE_SECONDS", 2)
+    remaining = []
+
+    async def fake_claim(query, update, **kwargs):
+        remaining.append(_csot.remaining())
+        return {"_id": query["_id"], "seq": 50}
+
+    async def fake_insert_one(document):
+        remaining.append(_csot.remaining())
+        if document["name"] == "Slow":
+            raise ExecutionTimeout("operation exceeded time limit", 50)
+
+    storage = get_storage()
+    monkeypatch.setattr(storage.sequences.collection, "find_one_and_update", fake_claim)
+    monkeypatch.setattr(storage.brands.collection, "insert_one", fake_insert_one)
+
+    client = TestClient(app)
+    assert client.post("/brands", json={"name": "Acura"}).status_code == 201
+    # The sequence block claimed by `get_next_sequence` and the insert of the brand.
+    assert len(remaining) == 2
+    assert all(0 < seconds <= 2 for seconds in remaining)
+
+    response = client.post("/brands", json={"name": "Slow"})
+    assert response.status_code == 504
+    assert (
+        'http_requests_timed_out_total{method="POST",route="/brands"} 1'
+        in metrics.render_metrics()
+    )
+    # Outside of a request no deadline applies.
+    assert _csot.remaining() is None
+
+
+def slow_models(monkeypatch, storage, delays):
+    """
+    Make the models stream wait `delays[i]` seconds before its i-th model and fail like
+    MongoDB when that wait outlives the deadline of the read.
+    """
+
+    async def iter_by_price(greater=None, lower=None, batch_size=None):
+        for model_id, delay in enumerate(delays, 1):
+            await asyncio.sleep(delay)
+            if _csot.remaining() is not None and _csot.remaining() <= 0:
+                raise ExecutionTimeout("operation exceeded time limit", 50)
+            yield {"_id": model_id, "name": "ILX", "average_price": 300000}
+
+    monkeypatch.setattr(storage.models, "iter_by_price", iter_by_price)
+
+
+def test_streams_give_every_read_its_own_deadline(monkeypatch, memory_storage):
+    monkeypatch.setattr(admission_module, "REQUEST_DEADLINE_SECONDS", 0.1)
+    client = TestClient(app)
+
+    # Longer than the deadline as a whole, but every read is within it.
+    slow_models(monkeypatch, memory_storage, [0.04] * 4)
+    response = client.get("/models", params={"stream": 1})
+    assert response.status_code == 200
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] == [
+        1,
+        2,
+        3,
+        4,
+    ]
+
+    # A read past its deadline ends the stream with an error line.
+    slow_models(monkeypatch, memory_storage, [0, 0.2, 0])
+    response = client.get("/models", params={"stream": 1})
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[0]["id"] == 1
+    assert list(lines[-1]) == ["error"]
+    assert len(lines) == 2
+    assert (
+        'http_requests_timed_out_total{method="GET",route="/models"} 1'
+        in metrics.render_metrics()
+    )
@@ -2,12 +2,16 @@ import os
 import sys
 
 import pytest
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from app.models import BrandCreate
+from app.repositories import get_storage
 from app.services.brand_service import (create_brand, get_all_brands,
-                                        get_brand_by_id)
+                                        get_brand_by_id, record_price_change,
+                                        recompute_brand_price_totals)
 
 
 class FakeCursor:
@@ -19,33 +23,83 @@ class FakeCursor:
             yield d
 
 
-async def fake_find_models(query):
-    if query.get("brand_id") == 1:
-        async for m in FakeCursor(
-            [{"average_price": 100000}, {"average_price": 200000}]
-        ):
-            yield m
-    else:
-        async for m in FakeCursor([]):
-            yield m
-
-
 @pytest.mark.asyncio
 async def test_get_all_brands(monkeypatch):
-    fake_brands = [{"_id": 1, "name": "Acura"}]
+    fake_brands = [
+        {"_id": 1, "name": "Acura", "price_sum": 300000, "price_count": 2},
+        {"_id": 2, "name": "Audi", "price_sum": 370370.367, "price_count": 3},
+        {"_id": 3, "name": "Bentley", "price_sum": 0, "price_count": 0},
+        {"_id": 4, "name": "BMW"},
+    ]
 
-    async def fake_find_brand(query=None):
-        for b in fake_brands:
-            yield b
+    def fake_find_brand(query=None, projection=None):
+        return FakeCursor(fake_brands)
 
-    from app.config import brands_collection, models_collection
+    brands_collection = get_storage().brands.collection
 
     monkeypatch.setattr(brands_collection, "find", fake_find_brand)
-    monkeypatch.setattr(models_collection, "find", fake_find_models)
 
     brands = await get_all_brands()
-    assert len(brands) == 1
-    assert brands[0]["average_price"] == 150000.00
+    assert len(brands) == 4
+    assert brands[0] == {"id": 1, "name": "Acura", "average_price": 150000.00}
+    assert brands[1]["average_price"] == 123456.79
+    assert brands[2]["average_price"] == 0
+    assert brands[3]["average_price"] == 0
+
+
+@pytest.mark.asyncio
+async def test_record_price_change(monkeypatch):
+    updates = []
+
+    async def fake_update_one(query, update):
+        updates.append((query, update))
+
+    brands_collection = get_storage().brands.collection
+
+    monkeypatch.setattr(brands_collection, "update_one", fake_update_one)
+
+    await record_price_change(1, new_price=300000)
+    await record_price_change(1, 300000, 350000)
+    await record_price_change(1, None, None)
+    await record_price_change(2, new_price=0)
+
+    assert updates == [
+        ({"_id": 1}, {"$inc": {"price_sum": 300000, "price_count": 1}}),
+        ({"_id": 1}, {"$inc": {"price_sum": 50000, "price_count": 0}}),
+        ({"_id": 2}, {"$inc": {"price_sum": 0, "price_count": 1}}),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_recompute_brand_price_totals(monkeypatch):
+    totals = [{"_id": 1, "price_sum": 300000, "price_count": 2}]
+    writes = []
+
+    class FakeBulkWriteResult:
+        modified_count = 2
+
+    async def fake_bulk_write(requests, ordered=True):
+        writes.extend(requests)
+        return FakeBulkWriteResult()
+
+    brands_collection = get_storage().brands.collection
+    models_collection = get_storage().models.collection
+
+    monkeypatch.setattr(
+        models_collection, "aggregate", lambda pipeline: FakeCursor(totals)
+    )
+    monkeypatch.setattr(
+        brands_collection,
+        "find",
+        lambda query, projection: FakeCursor([{"_id": 1}, {"_id": 2}]),
+    )
+    monkeypatch.setattr(brands_collection, "bulk_write", fake_bulk_write)
+
+    assert await recompute_brand_price_totals() == 2
+    assert writes == [
+        UpdateOne({"_id": 1}, {"$set": {"price_sum": 300000, "price_count": 2}}),
+        UpdateOne({"_id": 2}, {"$set": {"price_sum": 0, "price_count": 0}}),
+    ]
 
 
 @pytest.mark.asyncio
@@ -61,7 +115,7 @@ async def test_create_brand(monkeypatch):
     async def fake_insert_one(document):
         return FakeInsertResult()
 
-    from app.config import brands_collection
+    brands_collection = get_storage().brands.collection
 
     monkeypatch.setattr(brands_collection, "find_one", fake_find_one)
     monkeypatch.setattr(brands_collection, "insert_one", fake_insert_one)
@@ -79,6 +133,27 @@ async def test_create_brand(monkeypatch):
     assert brand["name"] == "Acura"
 
 
+@pytest.mark.asyncio
+async def test_create_brand_duplicate(monkeypatch):
+    async def fake_insert_one(document):
+        raise DuplicateKeyError("E11000 duplicate key error")
+
+    brands_collection = get_storage().brands.collection
+
+    monkeypatch.setattr(brands_collection, "insert_one", fake_insert_one)
+
+    from app.services import brand_service
+
+    async def fake_get_next_sequence(name: str) -> int:
+        return 2
+
+    monkeypatch.setattr(brand_service, "get_next_sequence", fake_get_next_sequence)
+
+    brand, error = await create_brand(BrandCreate(name="Acura"))
+    assert brand is None
+    assert error == "La marca ya existe"
+
+
 @pytest.mark.asyncio
 async def test_get_brand_by_id(monkeypatch):
     fake_brand = {"_id": 1, "name": "Acura", "id": 1}
@@ -88,7 +163,7 @@ async def test_get_brand_by_id(monkeypatch):
             return fake_brand
         return None
 
-    from app.config import brands_collection
+    brands_collection = get_storage().brands.collection
 
     monkeypatch.setattr(brands_collection, "find_one", fake_find_one)
 
@@ -96,3 +171,28 @@ async def test_get_brand_by_id(monkeypatch):
     assert brand is not None
     assert brand["id"] == 1
     assert brand["name"] == "Acura"
+
+
+@pytest.mark.asyncio
+async def test_get_brand_by_id_is_cached(monkeypatch):
+    calls = []
+
+    async def fake_find_one(query):
+        calls.append(query)
+        return {"_id": query["_id"], "name": "Acura"}
+
+    async def fake_update_one(query, update):
+        return None
+
+    brands_collection = get_storage().brands.collection
+
+    monkeypatch.setattr(brands_collection, "find_one", fake_find_one)
+    monkeypatch.setattr(brands_collection, "update_one", fake_update_one)
+
+    await get_brand_by_id("1")
+    await get_brand_by_id(1)
+    assert len(calls) == 1
+
+    await record_price_change(1, new_price=300000)
+    await get_brand_by_id(1)
+    assert len(calls) == 2
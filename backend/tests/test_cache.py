@@ -0,0 +1,107 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services import cache as cache_module
+from app.services.cache import MISSING, CatalogCache
+from app.utils.etag import etag_matches
+
+
+def test_lru_eviction():
+    cache = CatalogCache(max_entries=2, ttl=60, enabled=True)
+    cache.set("brands", 1, "Acura")
+    cache.set("brands", 2, "Audi")
+    assert cache.get("brands", 1) == "Acura"
+    cache.set("brands", 3, "BMW")
+
+    assert cache.get("brands", 2) is MISSING
+    assert cache.get("brands", 1) == "Acura"
+    assert cache.stats() == {"entries": 2, "hits": 2, "misses": 1, "evictions": 1}
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    cache = CatalogCache(max_entries=10, ttl=5, enabled=True)
+    cache.set("brands", 1, "Acura")
+    now[0] = 104.0
+    assert cache.get("brands", 1) == "Acura"
+    now[0] = 105.5
+    assert cache.get("brands", 1) is MISSING
+
+
+def test_key_and_collection_versioning():
+    cache = CatalogCache(max_entries=10, ttl=60, enabled=True)
+    cache.set("brands", 1, "Acura")
+    cache.set("brands", 2, "Audi")
+    cache.set("brands", "all", ["Acura", "Audi"], collection_scoped=True)
+    etag = cache.etag("brands")
+
+    cache.invalidate("brands", 2)
+
+    assert cache.get("brands", 1) == "Acura"
+    assert cache.get("brands", 2) is MISSING
+    assert cache.get("brands", "all") is MISSING
+    assert cache.etag("brands") != etag
+    assert cache.etag("models") == f'W/"models-{cache.epoch}-0"'
+
+
+def test_etags_expire_without_shared_versions(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    cache = CatalogCache(max_entries=10, ttl=5, enabled=True)
+    etag = cache.etag("brands")
+    now[0] = 112.0
+    assert cache.etag("brands") == etag
+
+    # Writes of other processes go unseen: the ETag changes with every TTL period.
+    cache.shared_versions = False
+    etag = cache.etag("brands")
+    assert etag == f'W/"brands-{cache.epoch}-0-22"'
+    now[0] = 114.0
+    assert cache.etag("brands") == etag
+    now[0] = 115.0
+    assert cache.etag("brands") != etag
+
+
+@pytest.mark.asyncio
+async def test_get_or_load_does_not_cache_racing_reads():
+    cache = CatalogCache(max_entries=10, ttl=60, enabled=True)
+    loads = []
+
+    async def loader():
+        loads.append(1)
+        await asyncio.sleep(0)
+        return ["stale"]
+
+    async def writer():
+        cache.invalidate("models")
+
+    value, _ = await asyncio.gather(
+        cache.get_or_load("models", "all", loader, collection_scoped=True), writer()
+    )
+    assert value == ["stale"]
+    assert cache.get("models", "all") is MISSING
+
+    await cache.get_or_load("models", "all", loader, collection_scoped=True)
+    assert await cache.get_or_load("models", "all", loader, True) == ["stale"]
+    assert len(loads) == 2
+
+
+def test_disabled_cache():
+    cache = CatalogCache(max_entries=10, ttl=60, enabled=False)
+    cache.set("brands", 1, "Acura")
+    assert cache.get("brands", 1) is MISSING
+
+
+def test_etag_matches():
+    etag = 'W/"brands-abc-3"'
+    assert etag_matches('W/"brands-abc-3"', etag)
+    assert etag_matches('"other", "brands-abc-3"', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('W/"brands-abc-2"', etag)
+    assert not etag_matches(None, etag)
@@ -0,0 +1,159 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.repositories import MemoryStorage, get_storage, use_storage
+from app.services import catalog_service
+from app.services.brand_service import get_all_brands
+from app.services.catalog_service import (
+    export_catalog,
+    import_catalog,
+    load_checkpoint,
+)
+
+ROWS = [
+    {"name": "ILX", "average_price": 303176, "brand_name": "Acura"},
+    {"name": "MDX", "average_price": 448193, "brand_name": "Acura"},
+    {"name": "A4", "average_price": None, "brand_name": "Audi"},
+    {"name": "ILX", "average_price": 350000, "brand_name": "Acura"},
+    {"name": "A6", "average_price": -5, "brand_name": "Audi"},
+    {"name": "Q5", "average_price": 500000, "brand_name": "Audi"},
+]
+
+
+def write_ndjson(path, rows):
+    path.write_text("".join(json.dumps(row) + "\n" for row in rows))
+
+
+async def stored_models(storage):
+    brands = {brand["_id"]: brand["name"] for brand in await storage.brands.list_all()}
+    return sorted(
+        [
+            (brands[model["brand_id"]], model["name"], model["average_price"])
+            async for model in storage.models.iter_by_price()
+        ]
+    )
+
+
+@pytest.mark.asyncio
+async def test_import_ndjson_in_batches(tmp_path, memory_storage):
+    path = tmp_path / "models.ndjson"
+    write_ndjson(path, ROWS[:3])
+    with open(path, "a") as f:
+        f.write("not json\n\n")
+        f.write(json.dumps({"name": "TLX", "average_price": 1000}) + "\n")
+        f.write("".join(json.dumps(row) + "\n" for row in ROWS[3:]))
+
+    summary = await import_catalog(str(path), batch_size=2, concurrency=2)
+
+    assert {key: summary[key] for key in catalog_service.TOTALS} == {
+        "rows": 8,
+        "brands_created": 2,
+        "models_inserted": 5,
+        "duplicates_skipped": 1,
+        "invalid_rows": 2,
+    }
+    assert await stored_models(memory_storage) == [
+        ("Acura", "ILX", 303176),
+        ("Acura", "MDX", 448193),
+        ("Audi", "A4", None),
+        ("Audi", "A6", 0),
+        ("Audi", "Q5", 500000),
+    ]
+    brands = await get_all_brands()
+    assert [brand["average_price"] for brand in brands] == [375684.5, 250000]
+    assert not os.path.exists(f"{path}.checkpoint")
+
+
+@pytest.mark.asyncio
+async def test_import_csv(tmp_path, memory_storage):
+    path = tmp_path / "models.csv"
+    path.write_text(
+        "brand_name,name,average_price\n"
+        'Acura,"ILX, Premium",303176\n'
+        "Audi,A4,\n"
+        "Audi,A6,cheap\n"
+    )
+
+    summary = await import_catalog(str(path))
+
+    assert summary["models_inserted"] == 2
+    assert summary["invalid_rows"] == 1
+    assert await stored_models(memory_storage) == [
+        ("Acura", "ILX, Premium", 303176),
+        ("Audi", "A4", None),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_import_resumes_from_the_checkpoint(
+    monkeypatch, tmp_path, memory_storage
+):
+    path = tmp_path / "models.ndjson"
+    rows = [
+        {"name": f"Model {i}", "average_price": 100000 + i, "brand_name": "Acura"}
+        for i in range(10)
+    ]
+    write_ndjson(path, rows)
+    write_models = catalog_service.write_models
+    calls = []
+
+    async def failing_write_models(valid, brand_ids, batch_size):
+        calls.append(len(valid))
+        if len(calls) == 3:
+            raise RuntimeError("database down")
+        return await write_models(valid, brand_ids, batch_size)
+
+    monkeypatch.setattr(catalog_service, "write_models", failing_write_models)
+    with pytest.raises(RuntimeError):
+        await import_catalog(str(path), batch_size=3, concurrency=1)
+
+    checkpoint = load_checkpoint(f"{path}.checkpoint")
+    assert checkpoint["offset"] == sum(len(json.dumps(row)) + 1 for row in rows[:6])
+    assert checkpoint["totals"]["models_inserted"] == 6
+
+    monkeypatch.setattr(catalog_service, "write_models", write_models)
+    summary = await import_catalog(str(path), batch_size=3)
+
+    assert summary["rows"] == 10
+    assert summary["models_inserted"] == 10
+    assert len(await stored_models(memory_storage)) == 10
+    assert not os.path.exists(f"{path}.checkpoint")
+
+
+@pytest.mark.asyncio
+async def test_import_refuses_a_checkpoint_of_another_file(tmp_path, memory_storage):
+    path = tmp_path / "models.ndjson"
+    write_ndjson(path, ROWS)
+    catalog_service.save_checkpoint(
+        f"{path}.checkpoint",
+        {"source": "other.ndjson", "format": "ndjson", "size": 1, "offset": 1},
+    )
+
+    with pytest.raises(ValueError):
+        await import_catalog(str(path))
+
+    summary = await import_catalog(str(path), restart=True)
+    assert summary["models_inserted"] == 5
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("file_format", ["ndjson", "csv"])
+async def test_export_round_trip(tmp_path, memory_storage, file_format):
+    source = tmp_path / "models.ndjson"
+    write_ndjson(source, ROWS)
+    await import_catalog(str(source))
+    before = await stored_models(memory_storage)
+
+    exported = tmp_path / f"export.{file_format}"
+    summary = await export_catalog(str(exported), batch_size=2)
+    assert summary["rows"] == 5
+    assert not os.path.exists(f"{exported}.tmp")
+
+    use_storage(MemoryStorage())
+    await import_catalog(str(exported))
+    assert await stored_models(get_storage()) == before
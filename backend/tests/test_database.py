@@ -0,0 +1,103 @@
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+from pymongo import ReadPreference
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import database
+from app.main import app
+from app.repositories import get_storage
+from app.services.cache import cache
+
+
+class FakeCursor:
+    def __init__(self, data):
+        self.data = data
+
+    async def __aiter__(self):
+        for d in self.data:
+            yield d
+
+
+def test_validate_settings(monkeypatch):
+    database.validate_settings()
+
+    monkeypatch.setattr(database, "MONGO_MIN_POOL_SIZE", 200)
+    monkeypatch.setattr(database, "MONGO_COMPRESSORS", "zstd,lz4")
+    monkeypatch.setattr(database, "MONGO_GET_READ_PREFERENCE", "closest")
+    with pytest.raises(RuntimeError) as e:
+        database.validate_settings()
+    message = str(e.value)
+    assert "MONGO_MIN_POOL_SIZE" in message
+    assert "lz4" in message
+    assert "closest" in message
+
+
+def test_create_client_applies_settings(monkeypatch):
+    monkeypatch.setattr(database, "MONGO_COMPRESSORS", " zlib, ")
+    client = database.create_client()
+    try:
+        options = client.delegate.options.pool_options
+        assert options.min_pool_size == database.MONGO_MIN_POOL_SIZE
+        assert options.max_pool_size == database.MONGO_MAX_POOL_SIZE
+        assert client.delegate.options._options["compressors"] == ["zlib"]
+    finally:
+        client.close()
+
+
+@pytest.mark.asyncio
+async def test_connect_fails_fast(monkeypatch):
+    class FakeAdmin:
+        async def command(self, name):
+            from pymongo.errors import ServerSelectionTimeoutError
+
+            raise ServerSelectionTimeoutError("localhost:27017: connection refused")
+
+    class FakeClient:
+        admin = FakeAdmin()
+        closed = False
+
+        def close(self):
+            self.closed = True
+
+    client = FakeClient()
+    monkeypatch.setattr(database, "create_client", lambda url: client)
+
+    with pytest.raises(RuntimeError, match="No se pudo conectar a MongoDB"):
+        await database.connect()
+    assert client.closed
+
+
+def test_get_requests_read_from_secondaries(monkeypatch, mongo_storage):
+    storage = type(mongo_storage).from_database(
+        mongo_storage.brands.collection.database,
+        read_preference=ReadPreference.SECONDARY_PREFERRED,
+    )
+    used = []
+
+    def fake_find(collection_name):
+        def find(query=None, projection=None):
+            used.append(collection_name)
+            return FakeCursor([{"_id": 1, "name": "Acura"}])
+
+        return find
+
+    monkeypatch.setattr(storage.brands.collection, "find", fake_find("primary"))
+    monkeypatch.setattr(storage.brands.read_collection, "find", fake_find("secondary"))
+    assert (
+        storage.brands.read_collection.read_preference
+        == ReadPreference.SECONDARY_PREFERRED
+    )
+    monkeypatch.setattr("app.repositories._storage", storage)
+
+    # The listing is cached: it is loaded from the primary so it includes the last
+    # write. Reads that are not cached go to the secondaries.
+    assert TestClient(app).get("/brands").status_code == 200
+    assert used == ["primary"]
+    monkeypatch.setattr(cache, "enabled", False)
+    assert TestClient(app).get("/brands").status_code == 200
+    assert used == ["primary", "secondary"]
+    assert get_storage().brands.reader is storage.brands.collection
@@ -0,0 +1,164 @@
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.main import app
+from app.models import ModelPriceUpdate, ModelUpdate
+from app.repositories import MemoryStorage, use_storage
+from app.services import history_service, model_service
+from app.services.history_service import bucket_start, get_price_history
+
+MONDAY = datetime(2026, 3, 2, tzinfo=timezone.utc)
+
+
+class Clock:
+    """
+    Stand-in for `history_service._now` that the test moves forward.
+    """
+
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+async def add_model(storage, price=300000):
+    await storage.brands.insert_many(
+        [{"_id": 1, "name": "Acura", "price_sum": price, "price_count": 1}]
+    )
+    await storage.models.insert_many(
+        [{"_id": 1, "name": "ILX", "average_price": price, "brand_id": 1}]
+    )
+
+
+def test_bucket_start():
+    at = datetime(2026, 3, 4, 15, 30, tzinfo=timezone.utc)
+    assert bucket_start(at, "day") == datetime(2026, 3, 4, tzinfo=timezone.utc)
+    assert bucket_start(at, "week") == MONDAY
+    # Naive times are UTC; other timezones are converted first.
+    assert bucket_start(datetime(2026, 3, 4, 23, 30), "day").day == 4
+    later = at.astimezone(timezone(timedelta(hours=-10)))
+    assert bucket_start(later, "day").day == 4
+
+
+@pytest.mark.asyncio
+async def test_changes_are_bucketed_per_day(monkeypatch, memory_storage):
+    await add_model(memory_storage)
+    clock = Clock(MONDAY + timedelta(hours=9))
+    monkeypatch.setattr(history_service, "_now", clock)
+    monkeypatch.setattr(history_service, "PRICE_HISTORY_BUCKET_SIZE", 2)
+
+    price = 300000
+    for day in range(3):
+        for hour in range(3):
+            clock.now = MONDAY + timedelta(days=day, hours=hour)
+            price += 10000
+            await model_service.update_model("1", ModelUpdate(average_price=price))
+    # An update to the same price is not a change.
+    await model_service.update_model("1", ModelUpdate(average_price=price))
+
+    buckets = await memory_storage.price_history.buckets(1)
+    assert [(bucket["start"].day, bucket["count"]) for bucket in buckets] == [
+        (2, 2),
+        (2, 1),
+        (3, 2),
+        (3, 1),
+        (4, 2),
+        (4, 1),
+    ]
+
+    changes, error = await get_price_history(
+        1, MONDAY + timedelta(hours=1), MONDAY + timedelta(days=1, hours=1)
+    )
+    assert error is None
+    assert [change["average_price"] for change in changes] == [320000, 330000, 340000]
+    assert changes[0]["previous_price"] == 310000
+    assert changes[0]["at"] == MONDAY + timedelta(hours=1)
+
+    # Only the buckets from the day of `since` on are read.
+    read = []
+    buckets_of = memory_storage.price_history.buckets
+
+    async def spy(model_id, since=None, until=None):
+        buckets = await buckets_of(model_id, since, until)
+        read.extend(buckets)
+        return buckets
+
+    monkeypatch.setattr(memory_storage.price_history, "buckets", spy)
+    changes, _ = await get_price_history(1, MONDAY + timedelta(days=2, hours=2))
+    assert [change["average_price"] for change in changes] == [390000]
+    assert {bucket["start"].day for bucket in read} == {4}
+
+
+@pytest.mark.asyncio
+async def test_batch_updates_record_every_change(monkeypatch, memory_storage):
+    await add_model(memory_storage)
+    monkeypatch.setattr(history_service, "_now", Clock(MONDAY))
+
+    await model_service.update_models(
+        [
+            ModelPriceUpdate(id=1, average_price=350000),
+            ModelPriceUpdate(id=2, average_price=350000),
+            ModelPriceUpdate(id=1, average_price=400000),
+        ]
+    )
+
+    changes, _ = await get_price_history(1)
+    assert [(c["previous_price"], c["average_price"]) for c in changes] == [
+        (300000, 350000),
+        (350000, 400000),
+    ]
+    assert await get_price_history(2) == (None, "El modelo no existe")
+
+
+@pytest.mark.asyncio
+async def test_history_survives_a_restart(monkeypatch, tmp_path, memory_storage):
+    path = str(tmp_path / "journal")
+    storage = MemoryStorage(path)
+    use_storage(storage)
+    await add_model(storage)
+    monkeypatch.setattr(history_service, "_now", Clock(MONDAY))
+    await model_service.update_model("1", ModelUpdate(average_price=350000))
+    await storage.close()
+
+    use_storage(MemoryStorage(path))
+    changes, _ = await get_price_history(1)
+    assert changes == [
+        {"at": MONDAY, "average_price": 350000, "previous_price": 300000}
+    ]
+
+
+def test_history_endpoint(monkeypatch, memory_storage):
+    client = TestClient(app)
+    acura = client.post("/brands", json={"name": "Acura"}).json()
+    model = client.post(
+        f"/brands/{acura['id']}/models", json={"name": "ILX", "average_price": 300000}
+    ).json()
+    monkeypatch.setattr(history_service, "_now", Clock(MONDAY))
+    client.put(f"/models/{model['id']}", json={"average_price": 350000})
+
+    response = client.get(f"/models/{model['id']}/history")
+    assert response.status_code == 200
+    assert response.json() == [
+        {
+            "at": "2026-03-02T00:00:00Z",
+            "average_price": 350000,
+            "previous_price": 300000,
+        }
+    ]
+
+    params = {"from": "2026-03-03T00:00:00", "to": "2026-03-04T00:00:00"}
+    response = client.get(f"/models/{model['id']}/history", params=params)
+    assert response.json() == []
+
+    params = {"from": "2026-03-04T00:00:00", "to": "2026-03-03T00:00:00"}
+    response = client.get(f"/models/{model['id']}/history", params=params)
+    assert response.status_code == 400
+
+    assert client.get("/models/999/history").status_code == 404
@@ -0,0 +1,67 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.repositories import get_storage
+from app.utils.indexes import INDEXES
+
+
+def index_information(declared):
+    return {
+        index.document["name"]: {
+            "key": list(index.document["key"].items()),
+            "unique": index.document.get("unique", False),
+        }
+        for index in declared
+    }
+
+
+@pytest.mark.asyncio
+async def test_ensure_indexes(monkeypatch):
+    created = {}
+
+    brands_collection = get_storage().brands.collection
+    models_collection = get_storage().models.collection
+    price_history_collection = get_storage().price_history.collection
+
+    for name, collection in (
+        ("brands", brands_collection),
+        ("models", models_collection),
+        ("price_history", price_history_collection),
+    ):
+
+        async def fake_create_indexes(indexes, name=name):
+            created[name] = [index.document["name"] for index in indexes]
+
+        async def fake_index_information(name=name):
+            return index_information(INDEXES[name])
+
+        monkeypatch.setattr(collection, "create_indexes", fake_create_indexes)
+        monkeypatch.setattr(collection, "index_information", fake_index_information)
+
+    await get_storage().ensure_indexes()
+    assert created == {
+        "brands": ["name_unique"],
+        "models": ["brand_id_name_unique", "brand_id_id", "average_price_id"],
+        "price_history": ["model_id_start"],
+    }
+
+
+@pytest.mark.asyncio
+async def test_ensure_indexes_detects_mismatch(monkeypatch):
+    async def fake_create_indexes(indexes):
+        return None
+
+    async def fake_index_information():
+        return {"name_unique": {"key": [("name", 1)]}}
+
+    brands_collection = get_storage().brands.collection
+
+    monkeypatch.setattr(brands_collection, "create_indexes", fake_create_indexes)
+    monkeypatch.setattr(brands_collection, "index_information", fake_index_information)
+
+    with pytest.raises(RuntimeError, match="name_unique"):
+        await get_storage().ensure_indexes()
@@ -0,0 +1,287 @@
+import asyncio
+import contextlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.repositories import ChangeStreamHistoryLost, ChangeStreamUnavailable
+from app.services.cache import MISSING, CatalogCache
+from app.services.invalidation import RECONNECTING, STREAMING, TTL, ChangeWatcher
+from app.services.price_index import PriceIndex
+from app.services.search_index import SearchIndex
+from pymongo.errors import AutoReconnect
+
+
+class FakeChangeStream:
+    """
+    Stand-in for `Storage.watch`: every call opens a stream over a new queue, which the
+    test fills with change events, or with exceptions to raise from the stream.
+    Exceptions queued in `open_errors` are raised when a stream is opened instead.
+    """
+
+    def __init__(self):
+        self.opened = []
+        self.open_errors = []
+        self.queue = None
+        self.streams = asyncio.Queue()
+
+    @contextlib.asynccontextmanager
+    async def __call__(self, resume_after, full_document):
+        self.opened.append(resume_after)
+        if self.open_errors:
+            raise self.open_errors.pop(0)
+        self.queue = asyncio.Queue()
+        await self.streams.put(self.queue)
+        yield self._changes(self.queue)
+
+    async def _changes(self, queue):
+        while True:
+            item = await queue.get()
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    async def next_stream(self):
+        return await asyncio.wait_for(self.streams.get(), 1)
+
+
+def change(token, operation, collection, key, document=None):
+    event = {
+        "_id": {"_data": token},
+        "operationType": operation,
+        "ns": {"db": "nexu-test", "coll": collection},
+        "documentKey": {"_id": key},
+    }
+    if document is not None:
+        event["fullDocument"] = document
+    return event
+
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def build_watcher(source, price_index=None):
+    cache = CatalogCache(max_entries=10, ttl=60, enabled=True)
+    watcher = ChangeWatcher(
+        cache,
+        price_index or PriceIndex(enabled=False),
+        source=source,
+        backoff=0.001,
+        backoff_max=0.001,
+        refresh_interval=0.001,
+    )
+    return cache, watcher
+
+
+@pytest.mark.asyncio
+async def test_changes_invalidate_the_cache_and_move_the_price_index():
+    source = FakeChangeStream()
+    index = PriceIndex(enabled=True)
+    index.load(
+        [
+            {"_id": 1, "name": "ILX", "average_price": 300000, "brand_id": 1},
+            {"_id": 2, "name": "MDX", "average_price": 500000, "brand_id": 1},
+        ]
+    )
+    cache, watcher = build_watcher(source, index)
+    cache.set("brands", 1, "Acura")
+    cache.set("brands", 2, "Audi")
+    cache.set("models", ("brand", 1), ["ILX", "MDX"], collection_scoped=True)
+
+    watcher.start()
+    await watcher.wait_started()
+    stream = await source.next_stream()
+    assert watcher.state == STREAMING
+
+    await stream.put(change("a", "update", "brands", 1))
+    await stream.put(
+        change(
+            "b",
+            "update",
+            "models",
+            1,
+            {"name": "ILX", "average_price": 600000, "brand_id": 1},
+        )
+    )
+    await stream.put(change("c", "delete", "models", 2))
+    await settle()
+
+    assert cache.get("brands", 1) is MISSING
+    assert cache.get("brands", 2) == "Audi"
+    assert cache.get("models", ("brand", 1)) is MISSING
+    assert index.range() == [{"id": 1, "name": "ILX", "average_price": 600000}]
+    assert watcher.resume_token == {"_data": "c"}
+    assert watcher.events == 3
+    await watcher.stop()
+
+
+@pytest.mark.asyncio
+async def test_changes_reach_a_price_index_being_built(monkeypatch, memory_storage):
+    index = PriceIndex(enabled=True)
+    _, watcher = build_watcher(FakeChangeStream(), index)
+    document = {"name": "ILX", "average_price": 600000, "brand_id": 1}
+
+    async def iter_by_price(greater=None, lower=None, batch_size=None):
+        # Another worker updates the model while the snapshot is read.
+        await watcher.apply(change("a", "update", "models", 1, document))
+        yield {"_id": 1, "name": "ILX", "average_price": 300000, "brand_id": 1}
+
+    monkeypatch.setattr(memory_storage.models, "iter_by_price", iter_by_price)
+    await index.build()
+
+    assert index.range() == [{"id": 1, "name": "ILX", "average_price": 600000}]
+
+
+@pytest.mark.asyncio
+async def test_reconnects_after_the_last_resume_token():
+    source = FakeChangeStream()
+    cache, watcher = build_watcher(source)
+    watcher.start()
+    stream = await source.next_stream()
+    await stream.put(change("a", "insert", "brands", 7))
+    await settle()
+    cache.set("brands", 1, "Acura")
+
+    await stream.put(AutoReconnect("primary stepped down"))
+    await source.next_stream()
+
+    assert source.opened == [None, {"_data": "a"}]
+    assert watcher.reconnects == 1
+    assert watcher.state == STREAMING
+    # The events after the token are replayed, so nothing has to be dropped.
+    assert watcher.resyncs == 0
+    assert cache.get("brands", 1) == "Acura"
+    await watcher.stop()
+
+
+@pytest.mark.asyncio
+async def test_lost_history_invalidates_everything():
+    source = FakeChangeStream()
+    index = PriceIndex(enabled=True)
+    index.load([{"_id": 1, "name": "ILX", "average_price": 1, "brand_id": 1}])
+    rebuilt = []
+
+    async def build():
+        rebuilt.append(True)
+
+    index.build = build
+    cache, watcher = build_watcher(source, index)
+    watcher.start()
+    stream = await source.next_stream()
+    await stream.put(change("a", "insert", "brands", 7))
+    await settle()
+    cache.set("brands", 1, "Acura")
+
+    source.open_errors = [ChangeStreamHistoryLost("resume token not found")]
+    await stream.put(AutoReconnect("connection reset"))
+    await source.next_stream()
+    await settle()
+
+    assert source.opened == [None, {"_data": "a"}, None]
+    assert watcher.reconnects == 2
+    assert watcher.resyncs == 1
+    assert rebuilt == [True]
+    assert cache.get("brands", 1) is MISSING
+    await watcher.stop()
+
+
+@pytest.mark.asyncio
+async def test_backoff_until_the_stream_opens():
+    source = FakeChangeStream()
+    source.open_errors = [AutoReconnect("no primary")] * 3
+    _, watcher = build_watcher(source)
+    watcher.start()
+    await source.next_stream()
+    await watcher.wait_started()
+    assert source.opened == [None] * 4
+    assert watcher.reconnects == 3
+    # The changes made before the stream opened are unknown.
+    assert watcher.resyncs == 1
+    await watcher.stop()
+
+
+@pytest.mark.asyncio
+async def test_warm_up_does_not_wait_for_an_unreachable_stream():
+    source = FakeChangeStream()
+    source.open_errors = [AutoReconnect("no primary")] * 1000
+    _, watcher = build_watcher(source)
+    watcher.backoff = watcher.backoff_max = 60
+    watcher.start()
+
+    await asyncio.wait_for(watcher.wait_started(), 1)
+    assert watcher.state == RECONNECTING
+    assert source.opened == [None]
+    await watcher.stop()
+
+
+@pytest.mark.asyncio
+async def test_events_that_fail_to_apply_are_skipped():
+    source = FakeChangeStream()
+    cache, watcher = build_watcher(source)
+    watcher.search_index = SearchIndex(enabled=True)
+    watcher.search_index.load([], [])
+    watcher.start()
+    stream = await source.next_stream()
+    cache.set("brands", 1, "Acura")
+
+    await stream.put(change("a", "insert", "models", 7, {"brand_id": 1}))
+    await stream.put(change("b", "update", "brands", 1))
+    await settle()
+
+    assert watcher.skipped == 1
+    assert watcher.resume_token == {"_data": "b"}
+    assert cache.get("brands", 1) is MISSING
+    # The stream was not reopened to replay the bad event.
+    assert source.opened == [None]
+    await watcher.stop()
+
+
+@pytest.mark.asyncio
+async def test_falls_back_to_ttl_without_change_streams():
+    source = FakeChangeStream()
+    source.open_errors = [ChangeStreamUnavailable("standalone server")]
+    index = PriceIndex(enabled=True)
+    index.load([])
+    rebuilt = []
+
+    async def build():
+        rebuilt.append(True)
+
+    index.build = build
+    cache, watcher = build_watcher(source, index)
+    etag = cache.etag("models")
+    watcher.start()
+    await asyncio.wait_for(watcher.wait_started(), 1)
+    for _ in range(100):
+        if len(rebuilt) >= 2:
+            break
+        await asyncio.sleep(0.005)
+
+    assert watcher.state == TTL
+    assert len(rebuilt) >= 2
+    # The writes of other workers are unknown, so the ETags move on every refresh.
+    assert cache.etag("models") != etag
+    await watcher.stop()
+
+
+@pytest.mark.asyncio
+async def test_memory_storage_has_no_change_stream(memory_storage):
+    with pytest.raises(ChangeStreamUnavailable):
+        async with memory_storage.watch():
+            pass
+
+
+def test_invalidate_all_drops_key_scoped_entries():
+    cache = CatalogCache(max_entries=10, ttl=60, enabled=True)
+    cache.set("brands", 1, "Acura")
+    cache.set("brands", "all", ["Acura"], collection_scoped=True)
+    version = cache.version("brands")
+    cache.invalidate_all()
+    assert cache.get("brands", 1) is MISSING
+    assert cache.get("brands", "all") is MISSING
+    assert cache.version("brands") == version + 1
@@ -0,0 +1,120 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.main import app
+from app.utils import metrics
+from app.utils.metrics import (
+    CommandTimer,
+    Histogram,
+    RequestMetrics,
+    current_request,
+)
+
+
+@pytest.fixture(autouse=True)
+def clear_metrics():
+    for metric in metrics.REGISTRY:
+        metric.clear()
+    yield
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("latency_seconds", "Latency.", ("route",), (0.1, 1.0))
+    histogram.observe(("/a",), 0.05)
+    histogram.observe(("/a",), 0.5)
+    histogram.observe(("/a",), 3)
+
+    assert histogram.render() == [
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{route="/a",le="0.1"} 1',
+        'latency_seconds_bucket{route="/a",le="1.0"} 2',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 3',
+        'latency_seconds_sum{route="/a"} 3.55',
+        'latency_seconds_count{route="/a"} 3',
+    ]
+
+
+def test_command_timer_tags_the_issuing_route():
+    timer = CommandTimer()
+    request = RequestMetrics("GET")
+    request.route = "/brands"
+    token = current_request.set(request)
+    try:
+        for request_id, name, command in [
+            (1, "find", {"find": "brands"}),
+            (2, "getMore", {"getMore": 10, "collection": "models"}),
+        ]:
+            timer.started(
+                SimpleNamespace(
+                    command_name=name,
+                    command=command,
+                    connection_id=("localhost", 27017),
+                    request_id=request_id,
+                )
+            )
+    finally:
+        current_request.reset(token)
+    timer.succeeded(
+        SimpleNamespace(
+            command_name="find",
+            connection_id=("localhost", 27017),
+            request_id=1,
+            duration_micros=2000,
+        )
+    )
+    timer.failed(
+        SimpleNamespace(
+            command_name="getMore",
+            connection_id=("localhost", 27017),
+            request_id=2,
+            duration_micros=500,
+        )
+    )
+
+    assert request.commands == 2
+    text = metrics.render_metrics()
+    assert (
+        'mongo_command_duration_seconds_count{collection="brands",command="find",'
+        'route="/brands"} 1' in text
+    )
+    assert (
+        'mongo_command_failures_total{collection="models",command="getMore",'
+        'route="/brands"} 1' in text
+    )
+
+
+def test_metrics_endpoint_reports_routes(memory_storage):
+    client = TestClient(app)
+    brand = client.post("/brands", json={"name": "Acura"}).json()
+    client.get(f"/brands/{brand['id']}/models")
+    client.get("/brands/999/models")
+    client.get("/missing")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    assert (
+        'http_request_duration_seconds_count{method="GET",'
+        'route="/brands/{brand_id}/models",status="200"} 1' in text
+    )
+    assert (
+        'http_request_duration_seconds_count{method="GET",'
+        'route="/brands/{brand_id}/models",status="404"} 1' in text
+    )
+    assert (
+        'http_request_duration_seconds_count{method="GET",'
+        'route="<unmatched>",status="404"} 1' in text
+    )
+    assert 'http_requests_in_flight{method="GET",route="/metrics"}' not in text
+    assert 'http_requests_in_flight{method="POST",route="/brands"} 0' in text
+    assert "catalog_cache_misses_total" in text
+    assert "catalog_single_flight_in_flight 0" in text
+    assert 'catalog_single_flight_loads_total{collection="models"}' in text
@@ -2,13 +2,25 @@ import os
 import sys
 
 import pytest
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from app.models import ModelCreate, ModelUpdate
+from app.config import PRICE_HISTORY_BUCKET_SIZE
+from app.models import (ModelCreate, ModelCreateList, ModelPriceUpdate,
+                        ModelUpdate)
+from app.repositories import get_storage
 from app.services.model_service import (create_model_for_brand,
+                                        create_models_for_brand,
                                         get_models_by_brand,
-                                        get_models_filtered, update_model)
+                                        get_models_by_brand_page,
+                                        get_models_filtered,
+                                        get_models_filtered_page,
+                                        iter_models_filtered, update_model,
+                                        update_models)
+from app.utils.batch import validate_batch
+from app.utils.pagination import encode_cursor
 
 
 async def fake_find_models(query):
@@ -25,7 +37,7 @@ async def fake_find_models(query):
 
 @pytest.mark.asyncio
 async def test_get_models_by_brand(monkeypatch):
-    from app.config import models_collection
+    models_collection = get_storage().models.collection
 
     monkeypatch.setattr(models_collection, "find", fake_find_models)
 
@@ -49,7 +61,7 @@ async def fake_find(query):
 
 @pytest.mark.asyncio
 async def test_get_models_filtered(monkeypatch):
-    from app.config import models_collection
+    models_collection = get_storage().models.collection
 
     monkeypatch.setattr(models_collection, "find", fake_find)
 
@@ -59,6 +71,125 @@ async def test_get_models_filtered(monkeypatch):
     assert model_c["average_price"] == 0
 
 
+@pytest.mark.asyncio
+async def test_iter_models_filtered(monkeypatch):
+    batch_sizes = []
+
+    class FakeStreamCursor:
+        def __init__(self, query):
+            self.query = query
+
+        def batch_size(self, size):
+            batch_sizes.append(size)
+            return self
+
+        async def __aiter__(self):
+            async for m in fake_find(self.query):
+                yield m
+
+    from app.config import STREAM_BATCH_SIZE
+
+    models_collection = get_storage().models.collection
+
+    monkeypatch.setattr(models_collection, "find", FakeStreamCursor)
+
+    models = [m async for m in iter_models_filtered(greater=100000)]
+    assert [m["name"] for m in models] == ["ModelA", "ModelB", "ModelC"]
+    assert batch_sizes == [STREAM_BATCH_SIZE]
+
+
+class FakeQuery:
+    def __init__(self, data):
+        self.data = data
+        self.sort_keys = None
+        self.limit_value = None
+
+    def sort(self, keys):
+        self.sort_keys = keys
+        return self
+
+    def limit(self, value):
+        self.limit_value = value
+        return self
+
+    async def __aiter__(self):
+        for d in self.data[: self.limit_value]:
+            yield d
+
+
+@pytest.mark.asyncio
+async def test_get_models_filtered_page(monkeypatch):
+    fake_models = [
+        {"_id": 3, "name": "ModelC", "average_price": 150000},
+        {"_id": 1, "name": "ModelA", "average_price": 250000},
+        {"_id": 2, "name": "ModelB", "average_price": 250000},
+    ]
+    queries = []
+
+    def fake_find(query):
+        queries.append(FakeQuery(fake_models))
+        queries[-1].query = query
+        return queries[-1]
+
+    models_collection = get_storage().models.collection
+
+    monkeypatch.setattr(models_collection, "find", fake_find)
+
+    page, error = await get_models_filtered_page(greater=100000, limit=2)
+    assert error is None
+    assert [m["id"] for m in page["items"]] == [3, 1]
+    assert queries[0].query == {"average_price": {"$gt": 100000}}
+    assert queries[0].sort_keys == [("average_price", 1), ("_id", 1)]
+    assert queries[0].limit_value == 3
+
+    page, error = await get_models_filtered_page(
+        greater=100000, limit=2, after=page["next_cursor"]
+    )
+    assert error is None
+    assert queries[1].query == {
+        "$and": [
+            {"average_price": {"$gt": 100000}},
+            {
+                "$or": [
+                    {"average_price": {"$gt": 250000}},
+                    {"average_price": 250000, "_id": {"$gt": 1}},
+                ]
+            },
+        ]
+    }
+
+    page, error = await get_models_filtered_page(limit=2, after="invalid")
+    assert page is None
+    assert error == "Cursor inválido"
+
+
+@pytest.mark.asyncio
+async def test_get_models_by_brand_page(monkeypatch):
+    fake_models = [
+        {"_id": 11, "name": "Model2", "average_price": None},
+        {"_id": 10, "name": "Model1", "average_price": 100000},
+    ]
+    queries = []
+
+    def fake_find(query):
+        queries.append(FakeQuery(fake_models))
+        queries[-1].query = query
+        return queries[-1]
+
+    models_collection = get_storage().models.collection
+
+    monkeypatch.setattr(models_collection, "find", fake_find)
+
+    page, error = await get_models_by_brand_page(
+        1, limit=5, after=encode_cursor([12]), descending=True
+    )
+    assert error is None
+    assert page["next_cursor"] is None
+    assert page["items"][0] == {"id": 11, "name": "Model2", "average_price": 0}
+    assert queries[0].query == {"$and": [{"brand_id": 1}, {"_id": {"$lt": 12}}]}
+    assert queries[0].sort_keys == [("_id", -1)]
+
+
 @pytest.mark.asyncio
 async def test_create_model_for_brand(monkeypatch):
     async def fake_get_brand_by_id(brand_id):
@@ -77,7 +208,12 @@ async def test_create_model_for_brand(monkeypatch):
     async def fake_insert_one(document):
         return FakeInsertResult()
 
-    from app.config import models_collection
+    price_changes = []
+
+    async def fake_record_price_change(brand_id, old_price=None, new_price=None):
+        price_changes.append((brand_id, old_price, new_price))
+
+    models_collection = get_storage().models.collection
 
     monkeypatch.setattr(models_collection, "find_one", fake_find_one)
     monkeypatch.setattr(models_collection, "insert_one", fake_insert_one)
@@ -85,6 +221,9 @@ async def test_create_model_for_brand(monkeypatch):
     from app.services import brand_service
 
     monkeypatch.setattr(brand_service, "get_brand_by_id", fake_get_brand_by_id)
+    monkeypatch.setattr(
+        brand_service, "record_price_change", fake_record_price_change
+    )
 
     async def fake_get_next_sequence(name: str) -> int:
         return 1
@@ -102,23 +241,213 @@ async def test_create_model_for_brand(monkeypatch):
     assert model["id"] == 1
     assert model["name"] == "ILX"
     assert model["average_price"] == 300000
+    assert price_changes == [(1, None, 300000)]
 
 
 @pytest.mark.asyncio
-async def test_update_model(monkeypatch):
-    fake_model = {"_id": 1, "name": "ILX", "average_price": 300000}
+async def test_create_model_for_brand_duplicate(monkeypatch):
+    async def fake_get_brand_by_id(brand_id):
+        return {"_id": 1, "name": "Acura", "id": 1}
 
-    async def fake_find_one(query):
-        return fake_model
+    async def fake_insert_one(document):
+        raise DuplicateKeyError("E11000 duplicate key error")
+
+    async def fake_get_next_sequence(name: str) -> int:
+        return 2
+
+    models_collection = get_storage().models.collection
+    from app.services import brand_service
+
+    monkeypatch.setattr(models_collection, "insert_one", fake_insert_one)
+    monkeypatch.setattr(brand_service, "get_brand_by_id", fake_get_brand_by_id)
+    monkeypatch.setattr(
+        "app.services.model_service.get_next_sequence", fake_get_next_sequence
+    )
+
+    model, error = await create_model_for_brand(
+        1, ModelCreate(name="ILX", average_price=300000)
+    )
+    assert model is None
+    assert error == "El modelo ya existe para la marca"
+
+
+@pytest.mark.asyncio
+async def test_update_model(monkeypatch):
+    fake_model = {"_id": 1, "brand_id": 1, "name": "ILX", "average_price": 300000}
 
-    async def fake_update_one(query, update):
+    async def fake_find_one_and_update(query, update, return_document=None):
+        previous = dict(fake_model)
         fake_model["average_price"] = update["$set"]["average_price"]
+        return previous
 
-    from app.config import models_collection
+    price_changes = []
 
-    monkeypatch.setattr(models_collection, "find_one", fake_find_one)
-    monkeypatch.setattr(models_collection, "update_one", fake_update_one)
+    async def fake_record_price_change(brand_id, old_price=None, new_price=None):
+        price_changes.append((brand_id, old_price, new_price))
+
+    history_writes = []
+
+    async def fake_history_bulk_write(requests, ordered=True):
+        history_writes.extend(requests)
+
+    models_collection = get_storage().models.collection
+    history_collection = get_storage().price_history.collection
+    from app.services import brand_service
+
+    monkeypatch.setattr(
+        models_collection, "find_one_and_update", fake_find_one_and_update
+    )
+    monkeypatch.setattr(
+        brand_service, "record_price_change", fake_record_price_change
+    )
+    monkeypatch.setattr(history_collection, "bulk_write", fake_history_bulk_write)
 
     updated_model, error = await update_model("1", ModelUpdate(average_price=350000))
     assert error is None
     assert updated_model["average_price"] == 350000
+    assert fake_model["average_price"] == 350000
+    assert price_changes == [(1, 300000, 350000)]
+    [upsert] = history_writes
+    change = upsert._doc["$push"]["changes"]["$each"][0]
+    assert upsert._filter["model_id"] == 1
+    assert upsert._filter["count"] == {"$lte": PRICE_HISTORY_BUCKET_SIZE - 1}
+    assert (change["price"], change["previous"]) == (350000, 300000)
+
+
+@pytest.mark.asyncio
+async def test_update_model_not_found(monkeypatch):
+    async def fake_find_one_and_update(query, update, return_document=None):
+        return None
+
+    models_collection = get_storage().models.collection
+
+    monkeypatch.setattr(
+        models_collection, "find_one_and_update", fake_find_one_and_update
+    )
+
+    updated_model, error = await update_model("99", ModelUpdate(average_price=350000))
+    assert updated_model is None
+    assert error == "El modelo no existe"
+
+
+@pytest.mark.asyncio
+async def test_create_models_for_brand(monkeypatch):
+    async def fake_get_brand_by_id(brand_id):
+        return {"_id": 1, "name": "Acura", "id": 1}
+
+    async def fake_reserve_sequence(name, count):
+        return list(range(20, 20 + count))
+
+    async def fake_insert_many(documents, ordered=True):
+        raise BulkWriteError(
+            {
+                "writeErrors": [
+                    {"index": 1, "code": 11000, "errmsg": "E11000 duplicate key"}
+                ],
+                "nInserted": 2,
+            }
+        )
+
+    deltas = []
+
+    async def fake_apply_brand_price_deltas(brand_deltas):
+        deltas.append(brand_deltas)
+
+    models_collection = get_storage().models.collection
+    from app.services import brand_service, model_service
+
+    monkeypatch.setattr(models_collection, "insert_many", fake_insert_many)
+    monkeypatch.setattr(brand_service, "get_brand_by_id", fake_get_brand_by_id)
+    monkeypatch.setattr(
+        brand_service, "apply_brand_price_deltas", fake_apply_brand_price_deltas
+    )
+    monkeypatch.setattr(model_service, "reserve_sequence", fake_reserve_sequence)
+
+    results, error = await create_models_for_brand(
+        1,
+        [
+            ModelCreate(name="ILX", average_price=300000),
+            ModelCreate(name="ILX", average_price=400000),
+            ModelCreate(name="MDX"),
+        ],
+    )
+    assert error is None
+    assert results[0][0]["id"] == 20
+    assert results[1] == (None, "El modelo ya existe para la marca")
+    assert results[2][0]["id"] == 22
+    assert deltas == [{1: (300000, 1)}]
+
+
+@pytest.mark.asyncio
+async def test_update_models(monkeypatch):
+    stored = [
+        {"_id": 1, "brand_id": 1, "name": "ILX", "average_price": 300000},
+        {"_id": 2, "brand_id": 2, "name": "A3", "average_price": None},
+    ]
+    writes = []
+    deltas = []
+
+    def fake_find(query):
+        return FakeQuery([m for m in stored if m["_id"] in query["_id"]["$in"]])
+
+    async def fake_bulk_write(requests, ordered=True):
+        writes.extend(requests)
+
+    async def fake_apply_brand_price_deltas(brand_deltas):
+        deltas.append(brand_deltas)
+
+    history_writes = []
+
+    async def fake_history_bulk_write(requests, ordered=True):
+        history_writes.extend(requests)
+
+    models_collection = get_storage().models.collection
+    from app.services import brand_service
+
+    monkeypatch.setattr(models_collection, "find", fake_find)
+    monkeypatch.setattr(models_collection, "bulk_write", fake_bulk_write)
+    monkeypatch.setattr(
+        get_storage().price_history.collection, "bulk_write", fake_history_bulk_write
+    )
+    monkeypatch.setattr(
+        brand_service, "apply_brand_price_deltas", fake_apply_brand_price_deltas
+    )
+
+    results = await update_models(
+        [
+            ModelPriceUpdate(id=1, average_price=350000),
+            ModelPriceUpdate(id=99, average_price=350000),
+            ModelPriceUpdate(id=2, average_price=200000),
+            ModelPriceUpdate(id=1, average_price=400000),
+        ]
+    )
+    assert results[0][0]["average_price"] == 350000
+    assert results[1] == (None, "El modelo no existe")
+    assert results[3][0]["average_price"] == 400000
+    assert writes == [
+        UpdateOne({"_id": 1}, {"$set": {"average_price": 400000}}),
+        UpdateOne({"_id": 2}, {"$set": {"average_price": 200000}}),
+    ]
+    assert deltas == [{1: [100000, 0], 2: [200000, 1]}]
+    # Both updates of model 1 are kept in its history, in order, with one upsert.
+    assert [
+        [
+            (change["previous"], change["price"])
+            for change in upsert._doc["$push"]["changes"]["$each"]
+        ]
+        for upsert in history_writes
+    ] == [[(300000, 350000), (350000, 400000)], [(None, 200000)]]
+
+
+def test_validate_batch():
+    results = validate_batch(
+        ModelCreateList,
+        ModelCreate,
+        [{"name": "ILX"}, {"name": "MDX", "average_price": 5}, {}],
+    )
+    assert results[0] == (ModelCreate(name="ILX"), None)
+    assert results[1] == (
+        None,
+        "El precio promedio debe siempre debe ser un valor mayor a 100,000.00",
+    )
+    assert results[2] == (None, "name: Field required")
@@ -0,0 +1,71 @@
+import os
+import sys
+
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.main import app
+from app.utils.pagination import decode_cursor, encode_cursor, keyset_filter
+
+
+def test_cursor_round_trip():
+    token = encode_cursor([395753, 3])
+    assert "=" not in token
+    assert decode_cursor(token, 2) == [395753, 3]
+
+
+def test_decode_invalid_cursor():
+    assert decode_cursor("not a cursor", 2) is None
+    assert decode_cursor(encode_cursor([1]), 2) is None
+    assert decode_cursor(encode_cursor({"a": 1}), 1) is None
+
+
+def test_decode_cursor_checks_the_value_types():
+    assert decode_cursor(encode_cursor([None, 3]), 2) == [None, 3]
+    assert decode_cursor(encode_cursor([395753.5, 3]), 2) == [395753.5, 3]
+    for values in ([{"$gt": 0}, 1], ["x", 1], [1, {"$gt": 0}], [1, "3"], [1, 2.5]):
+        assert decode_cursor(encode_cursor(values), 2) is None
+    assert decode_cursor(encode_cursor([True]), 1) is None
+    assert decode_cursor(encode_cursor([{"$gt": 0}]), 1) is None
+
+
+def test_forged_cursors_are_rejected(memory_storage):
+    client = TestClient(app)
+    acura = client.post("/brands", json={"name": "Acura"}).json()
+    client.post(
+        f"/brands/{acura['id']}/models", json={"name": "ILX", "average_price": 300000}
+    )
+    for path, values in (
+        ("/models", ["x", 1]),
+        ("/models", [1, {"$gt": 0}]),
+        (f"/brands/{acura['id']}/models", [{"$gt": 0}]),
+    ):
+        response = client.get(path, params={"limit": 5, "after": encode_cursor(values)})
+        assert response.status_code == 400
+
+
+def test_keyset_filter():
+    assert keyset_filter("average_price", 300000, 5) == {
+        "$or": [
+            {"average_price": {"$gt": 300000}},
+            {"average_price": 300000, "_id": {"$gt": 5}},
+        ]
+    }
+    assert keyset_filter("average_price", 300000, 5, descending=True) == {
+        "$or": [
+            {"average_price": {"$lt": 300000}},
+            {"average_price": 300000, "_id": {"$lt": 5}},
+            {"average_price": None},
+        ]
+    }
+    assert keyset_filter("average_price", None, 5) == {
+        "$or": [
+            {"average_price": None, "_id": {"$gt": 5}},
+            {"average_price": {"$ne": None}},
+        ]
+    }
+    assert keyset_filter("average_price", None, 5, descending=True) == {
+        "average_price": None,
+        "_id": {"$lt": 5},
+    }
@@ -0,0 +1,143 @@
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.main import app
+from app.routes import metrics as metrics_routes
+from app.services import model_service
+from app.services import price_index as price_index_module
+from app.services.cache import cache
+from app.services.price_index import PriceIndex, PriceIndexCheck, check_price_index
+
+MODELS = [
+    {"_id": 1, "name": "ModelA", "average_price": 150000, "brand_id": 1},
+    {"_id": 2, "name": "ModelB", "average_price": 250000, "brand_id": 1},
+    {"_id": 3, "name": "ModelC", "average_price": 150000, "brand_id": 2},
+    {"_id": 4, "name": "ModelD", "average_price": None, "brand_id": 2},
+]
+
+
+def test_range_bounds_are_exclusive():
+    index = PriceIndex()
+    index.load(MODELS)
+
+    assert index.count() == 3
+    assert [m["id"] for m in index.range(greater=150000)] == [2]
+    assert [m["id"] for m in index.range(lower=250000)] == [1, 3]
+    assert index.range(greater=150000, lower=250000) == []
+    assert index.prices(greater=100000, lower=300000) == [150000, 150000, 250000]
+    assert index.range(greater=300000, lower=100000) == []
+
+
+def test_upsert_moves_models():
+    index = PriceIndex()
+    index.upsert(5, "ModelE", 1000, 1)
+    assert not index.ready and index.count() == 0
+
+    index.load(MODELS)
+    index.upsert(1, "ModelA", 300000, 1)
+    index.upsert(4, "ModelD", 100000, 2)
+    index.upsert(2, "ModelB", None, 1)
+    index.upsert(5, "ModelE", 200000, 1)
+
+    assert index.range() == [
+        {"id": 4, "name": "ModelD", "average_price": 100000},
+        {"id": 3, "name": "ModelC", "average_price": 150000},
+        {"id": 5, "name": "ModelE", "average_price": 200000},
+        {"id": 1, "name": "ModelA", "average_price": 300000},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_build_replays_the_writes_made_while_reading(monkeypatch, memory_storage):
+    index = PriceIndex()
+
+    async def iter_by_price(greater=None, lower=None, batch_size=None):
+        for number, model in enumerate(MODELS):
+            if number == 2:
+                # Written while the rest of the snapshot is read.
+                index.upsert(1, "ModelA", 300000, 1)
+                index.upsert(5, "ModelE", 200000, 1)
+                index.remove(2)
+            yield model
+
+    monkeypatch.setattr(memory_storage.models, "iter_by_price", iter_by_price)
+    await index.build()
+
+    assert [(m["id"], m["average_price"]) for m in index.range()] == [
+        (3, 150000),
+        (5, 200000),
+        (1, 300000),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_get_models_filtered_uses_ready_index(monkeypatch, memory_storage):
+    index = PriceIndex()
+    index.load(MODELS)
+    monkeypatch.setattr(model_service, "price_index", index)
+
+    models = await model_service.get_models_filtered(greater=100000)
+    assert [m["id"] for m in models] == [1, 3, 2]
+
+
+@pytest.mark.asyncio
+async def test_check_price_index(memory_storage):
+    await memory_storage.models.insert_many(MODELS)
+
+    index = PriceIndex()
+    await index.build()
+    assert await check_price_index(index, greater=0) == {
+        "missing": [],
+        "unexpected": [],
+        "mismatched": [],
+    }
+
+    index.load([m for m in MODELS if m["_id"] != 2])
+    index.upsert(1, "ModelA", 1, 1)
+    index.upsert(6, "ModelF", 5, 1)
+    assert await check_price_index(index, greater=0) == {
+        "missing": [2],
+        "unexpected": [6],
+        "mismatched": [1],
+    }
+
+
+@pytest.mark.asyncio
+async def test_price_index_check_reports_drift_of_the_live_index(
+    monkeypatch, memory_storage
+):
+    await memory_storage.models.insert_many(MODELS)
+    index = PriceIndex(enabled=True)
+    await index.build()
+    check = PriceIndexCheck(index, interval=0)
+    assert not any((await check.run()).values())
+
+    # The index drifts; the database itself is not read into it again.
+    index.upsert(1, "ModelA", 1, 1)
+    assert (await check.run())["mismatched"] == [1]
+    assert check.checks == 2
+
+    monkeypatch.setattr(metrics_routes, "price_index_check", check)
+    metrics_text = TestClient(app).get("/metrics").text
+    assert 'catalog_price_index_drift{kind="mismatched"} 1' in metrics_text
+    assert "catalog_price_index_checks_total 2" in metrics_text
+
+
+@pytest.mark.asyncio
+async def test_price_index_check_ignores_concurrent_writes(monkeypatch, memory_storage):
+    index = PriceIndex(enabled=True)
+    index.load([])
+    check = PriceIndexCheck(index, interval=0)
+
+    async def racing_check(index):
+        cache.invalidate("models", 1)
+        return {"missing": [1], "unexpected": [], "mismatched": []}
+
+    monkeypatch.setattr(price_index_module, "check_price_index", racing_check)
+    assert await check.run() is None
+    assert (check.checks, check.inconclusive, check.report) == (0, 1, None)
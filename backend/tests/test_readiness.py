@@ -0,0 +1,103 @@
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import main
+from app.repositories import MemoryStorage, use_storage
+from app.services.readiness import Readiness
+
+
+@pytest.mark.asyncio
+async def test_steps_run_in_background():
+    readiness = Readiness()
+    gate = asyncio.Event()
+    ran = []
+
+    async def first():
+        ran.append("first")
+
+    async def second():
+        await gate.wait()
+        ran.append("second")
+
+    task = readiness.start([("first", first), ("second", second)])
+    await asyncio.sleep(0)
+    assert not readiness.ready
+    assert readiness.report()["status"] == "starting"
+    assert readiness.steps["first"]["status"] == "done"
+    assert readiness.steps["second"] == {"status": "running"}
+
+    gate.set()
+    await task
+    report = readiness.report()
+    assert ran == ["first", "second"]
+    assert report["status"] == "ready"
+    assert report["ready_after_seconds"] >= 0
+    assert {step["status"] for step in report["steps"].values()} == {"done"}
+
+
+@pytest.mark.asyncio
+async def test_failed_step_stops_warm_up():
+    readiness = Readiness()
+    ran = []
+
+    async def broken():
+        raise RuntimeError("índice inconsistente")
+
+    async def never():
+        ran.append("never")
+
+    await readiness.start([("indexes", broken), ("cache", never)])
+    assert readiness.failed and not readiness.ready
+    assert readiness.report()["error"] == "indexes: índice inconsistente"
+    assert readiness.steps["cache"] == {"status": "pending"}
+    assert ran == []
+
+
+@pytest.mark.asyncio
+async def test_stop_cancels_running_warm_up():
+    readiness = Readiness()
+
+    async def slow():
+        await asyncio.sleep(60)
+
+    task = readiness.start([("population", slow)])
+    await asyncio.sleep(0)
+    await readiness.stop()
+    assert task.cancelled()
+
+
+def test_probes_follow_warm_up(monkeypatch):
+    gate = asyncio.Event()
+
+    async def open_storage():
+        use_storage(MemoryStorage())
+
+    async def blocked_population():
+        await gate.wait()
+
+    monkeypatch.setattr(main, "open_storage", open_storage)
+    monkeypatch.setattr(main, "startup_db_population", blocked_population)
+    monkeypatch.setattr(main, "readiness", Readiness())
+    monkeypatch.setattr("app.routes.health.readiness", main.readiness)
+
+    with TestClient(main.app) as client:
+        assert client.get("/healthz").json() == {"status": "alive"}
+        response = client.get("/readyz")
+        assert response.status_code == 503
+        assert response.json()["steps"]["population"]["status"] == "running"
+
+        client.portal.call(gate.set)
+        for _ in range(100):
+            response = client.get("/readyz")
+            if response.status_code == 200:
+                break
+            time.sleep(0.01)
+        assert response.json()["status"] == "ready"
+        assert response.json()["steps"]["cache"]["status"] == "done"
@@ -0,0 +1,52 @@
+import os
+import sys
+
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.main import app
+from app.models import ModelResponseList
+from app.utils.responses import trusted_json
+
+
+def test_trusted_json_matches_response_model_output():
+    response = trusted_json(
+        ModelResponseList,
+        [{"id": 1, "name": "ILX", "average_price": 300000, "brand_id": 1}],
+        headers={"ETag": '"1"'},
+    )
+
+    assert response.body == b'[{"id":1,"name":"ILX","average_price":300000.0}]'
+    assert response.headers["etag"] == '"1"'
+    assert response.media_type == "application/json"
+
+
+def test_list_endpoints_serialize_service_output(memory_storage):
+    client = TestClient(app)
+    brand = client.post("/brands", json={"name": "Acura"}).json()
+    client.post(
+        f"/brands/{brand['id']}/models", json={"name": "ILX", "average_price": 300000}
+    )
+    client.post(f"/brands/{brand['id']}/models", json={"name": "MDX"})
+
+    response = client.get("/brands")
+    assert response.json() == [{"id": 1, "name": "Acura", "average_price": 300000.0}]
+    assert (
+        client.get(
+            "/brands", headers={"If-None-Match": response.headers["etag"]}
+        ).status_code
+        == 304
+    )
+
+    assert client.get(f"/brands/{brand['id']}/models").json() == [
+        {"id": 1, "name": "ILX", "average_price": 300000.0},
+        {"id": 2, "name": "MDX", "average_price": 0.0},
+    ]
+    assert client.get("/models", params={"greater": 100000}).json() == [
+        {"id": 1, "name": "ILX", "average_price": 300000.0}
+    ]
+    page = client.get("/models", params={"limit": 1, "order": "desc"})
+    assert page.headers["etag"] == client.get("/models").headers["etag"]
+    assert page.json()["items"] == [{"id": 1, "name": "ILX", "average_price": 300000.0}]
+    assert page.json()["next_cursor"] is not None
@@ -0,0 +1,258 @@
+import os
+import re
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.main import app
+from app.models import BrandCreate, ModelCreate
+from app.services import brand_service, model_service
+from app.services.cache import CatalogCache
+from app.services.invalidation import ChangeWatcher
+from app.services.price_index import PriceIndex
+from app.services.search_index import (
+    MODEL,
+    SearchIndex,
+    edit_distance,
+    normalize,
+    search_catalog,
+    search_index,
+)
+from app.utils.text import SEPARATOR, name_pattern
+
+BRANDS = [
+    {"_id": 1, "name": "Acura"},
+    {"_id": 2, "name": "Audi"},
+    {"_id": 3, "name": "Citroën"},
+]
+
+MODELS = [
+    {"_id": 1, "name": "ILX", "brand_id": 1},
+    {"_id": 2, "name": "ILX Hybrid", "brand_id": 1},
+    {"_id": 3, "name": "RDX", "brand_id": 1},
+    {"_id": 4, "name": "A4", "brand_id": 2},
+    {"_id": 5, "name": "Q5 Sportback", "brand_id": 2},
+    {"_id": 6, "name": "C4 Cactus", "brand_id": 3},
+    {"_id": 7, "name": "Berlingo", "brand_id": 3},
+]
+
+
+def build_index():
+    index = SearchIndex(enabled=True)
+    index.load(BRANDS, MODELS)
+    return index
+
+
+def names(results):
+    return [result["name"] for result in results]
+
+
+def test_normalize_and_edit_distance():
+    assert normalize("  Citroën  C4-Cactus ") == "citroen c4 cactus"
+    assert edit_distance("volt", "volt") == 0
+    assert edit_distance("ovlt", "volt") == 1
+    assert edit_distance("ovlt", "bolt") == 2
+    assert edit_distance("kitten", "sitting") == 3
+
+
+def test_search_ranks_matches_by_tier():
+    index = build_index()
+
+    assert names(index.search("ilx")) == ["ILX", "ILX Hybrid"]
+    assert names(index.search("a")) == ["Acura", "Audi", "A4"]
+    assert names(index.search("sport")) == ["Q5 Sportback"]
+    assert names(index.search("CITROEN")) == ["Citroën"]
+    assert names(index.search("erl")) == ["Berlingo"]
+    assert names(index.search("c")) == ["Citroën", "C4 Cactus"]
+    assert names(index.search("a", limit=2)) == ["Acura", "Audi"]
+    assert index.search("   ") == []
+    assert index.search("tesla") == []
+
+    assert index.search("hybrid")[0] == {
+        "type": "model",
+        "id": 2,
+        "name": "ILX Hybrid",
+        "brand_id": 1,
+        "brand_name": "Acura",
+    }
+
+
+def test_search_corrects_typos():
+    index = build_index()
+
+    assert names(index.search("berlnigo")) == ["Berlingo"]
+    assert names(index.search("ilx hybird")) == ["ILX Hybrid"]
+    assert names(index.search("acrua")) == ["Acura"]
+    # Words used by some name are not corrected.
+    index.add_model(8, "Acrua Concept", 1)
+    assert names(index.search("acrua")) == ["Acrua Concept"]
+
+
+def test_add_and_remove():
+    index = SearchIndex(enabled=True)
+    index.add_brand(1, "Acura")
+    assert not index.ready and len(index) == 0
+
+    index = build_index()
+    index.add_model(8, "ILX Type S", 1)
+    index.add_model(8, "ILX Type S", 1)
+    assert names(index.search("ilx")) == ["ILX", "ILX Hybrid", "ILX Type S"]
+    assert names(index.search("type")) == ["ILX Type S"]
+
+    index.remove(MODEL, 2)
+    assert names(index.search("ilx")) == ["ILX", "ILX Type S"]
+    assert len(index) == 10
+
+
+@pytest.mark.asyncio
+async def test_build_replays_the_writes_made_while_reading(monkeypatch, memory_storage):
+    index = SearchIndex(enabled=True)
+    await memory_storage.brands.insert_many(BRANDS)
+
+    async def iter_by_price(greater=None, lower=None, batch_size=None):
+        for number, model in enumerate(MODELS):
+            if number == 2:
+                # Written while the rest of the snapshot is read.
+                index.add_model(8, "ILX Type S", 1)
+                index.remove(MODEL, 2)
+            yield model
+
+    monkeypatch.setattr(memory_storage.models, "iter_by_price", iter_by_price)
+    await index.build()
+
+    assert names(index.search("ilx")) == ["ILX", "ILX Type S"]
+
+
+@pytest.mark.asyncio
+async def test_services_add_to_the_index(monkeypatch, memory_storage):
+    index = SearchIndex(enabled=True)
+    await index.build()
+    monkeypatch.setattr(brand_service, "search_index", index)
+    monkeypatch.setattr(model_service, "search_index", index)
+
+    brand, _ = await brand_service.create_brand(BrandCreate(name="Volvo"))
+    await model_service.create_model_for_brand(
+        brand["id"], ModelCreate(name="XC90", average_price=900000)
+    )
+
+    assert index.search("volvo")[0]["id"] == brand["id"]
+    assert index.search("xc")[0]["brand_name"] == "Volvo"
+
+
+@pytest.mark.asyncio
+async def test_search_falls_back_to_the_storage(monkeypatch, memory_storage):
+    monkeypatch.setattr(search_index, "ready", False)
+    await memory_storage.brands.insert_many(BRANDS)
+    await memory_storage.models.insert_many(MODELS)
+
+    brand_queries = []
+    get_many = memory_storage.brands.get_many
+
+    async def counted_get_many(brand_ids):
+        brand_queries.append(sorted(brand_ids))
+        return await get_many(brand_ids)
+
+    monkeypatch.setattr(memory_storage.brands, "get_many", counted_get_many)
+
+    results = await search_catalog("ilx", 10)
+    assert names(results) == ["ILX", "ILX Hybrid"]
+    assert results[0]["brand_name"] == "Acura"
+    # The brands of the models are loaded at once.
+    assert brand_queries == [[1]]
+    # Matched like the index: without accents, case or punctuation.
+    assert names(await search_catalog("CITROEN", 10)) == ["Citroën"]
+    assert names(await search_catalog("c4-cactus", 10)) == ["C4 Cactus"]
+    assert (await search_catalog("cactus", 10))[0]["brand_name"] == "Citroën"
+    assert await search_catalog("!!", 10) == []
+
+
+@pytest.mark.asyncio
+async def test_mongo_search_names_query(monkeypatch, mongo_storage):
+    queries = []
+
+    class Cursor:
+        async def to_list(self, length):
+            queries.append(length)
+            return []
+
+    def find(query):
+        queries.append(query)
+        return Cursor()
+
+    monkeypatch.setattr(mongo_storage.models.collection, "find", find)
+
+    assert await mongo_storage.models.search_names("C4-Cactus", 5) == []
+    assert queries == [
+        {"name": {"$regex": name_pattern("c4 cactus"), "$options": "i"}},
+        5,
+    ]
+
+
+def test_name_pattern_matches_the_normalized_names():
+    def matches(query, name):
+        # Python has no `\p{...}` classes: `\W` stands for the separators here.
+        pattern = name_pattern(normalize(query)).replace(SEPARATOR, r"[\W_]+")
+        return re.search(pattern, name, re.IGNORECASE) is not None
+
+    assert matches("citroen c4", "CITROËN  C4 Cactus")
+    assert matches("Citroën", "citroen")
+    assert matches("c4-cactus", "C4 Cactus")
+    assert matches("a.4", "A4") is False
+    assert matches("q5 sport", "Q5 Sportback")
+    assert matches("ilx", "RDX") is False
+
+
+@pytest.mark.asyncio
+async def test_watcher_applies_changes_to_the_index():
+    index = build_index()
+    watcher = ChangeWatcher(
+        CatalogCache(max_entries=10, ttl=60, enabled=True),
+        PriceIndex(enabled=False),
+        index,
+    )
+
+    await watcher.apply(
+        {
+            "_id": {"_data": "1"},
+            "operationType": "insert",
+            "ns": {"db": "nexu-test", "coll": "models"},
+            "documentKey": {"_id": 8},
+            "fullDocument": {"_id": 8, "name": "TLX", "brand_id": 1},
+        }
+    )
+    await watcher.apply(
+        {
+            "_id": {"_data": "2"},
+            "operationType": "delete",
+            "ns": {"db": "nexu-test", "coll": "models"},
+            "documentKey": {"_id": 3},
+        }
+    )
+
+    assert names(index.search("tlx")) == ["TLX"]
+    assert index.search("rdx") == []
+
+
+def test_search_endpoint(monkeypatch, memory_storage):
+    monkeypatch.setattr(search_index, "ready", False)
+    client = TestClient(app)
+    acura = client.post("/brands", json={"name": "Acura"}).json()
+    client.post(f"/brands/{acura['id']}/models", json={"name": "ILX"})
+
+    response = client.get("/search", params={"q": "acu"})
+    assert response.status_code == 200
+    assert response.json() == [
+        {
+            "type": "brand",
+            "id": acura["id"],
+            "name": "Acura",
+            "brand_id": None,
+            "brand_name": None,
+        }
+    ]
+    assert client.get("/search", params={"q": "ilx"}).json()[0]["brand_name"] == "Acura"
+    assert client.get("/search", params={"q": ""}).status_code == 422
+    assert client.get("/search", params={"q": "a", "limit": 101}).status_code == 422
@@ -0,0 +1,122 @@
+import os
+import sys
+
+import pytest
+from pymongo import UpdateOne
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.repositories import get_storage
+from app.services import seed_service
+from app.services.seed_service import bulk_populate
+
+
+class FakeCursor:
+    def __init__(self, data):
+        self.data = data
+
+    async def __aiter__(self):
+        for d in self.data:
+            yield d
+
+
+@pytest.mark.asyncio
+async def test_bulk_populate(monkeypatch):
+    inserted_brands = []
+    inserted_models = []
+    brand_updates = []
+
+    def fake_find_brands(query, projection):
+        return FakeCursor([{"_id": 1, "name": "Acura"}])
+
+    model_queries = []
+
+    def fake_find_models(query, projection):
+        model_queries.append(query)
+        return FakeCursor([{"brand_id": 1, "name": "ILX"}])
+
+    async def fake_insert_brands(documents, ordered=True):
+        inserted_brands.extend(documents)
+
+    async def fake_insert_models(documents, ordered=True):
+        inserted_models.append(list(documents))
+
+    async def fake_bulk_write(requests, ordered=True):
+        brand_updates.extend(requests)
+
+    async def fake_reserve_sequence(name, count):
+        start = 10 if name == "brands" else 100
+        return list(range(start, start + count))
+
+    brands_collection = get_storage().brands.collection
+    models_collection = get_storage().models.collection
+
+    monkeypatch.setattr(brands_collection, "find", fake_find_brands)
+    monkeypatch.setattr(brands_collection, "insert_many", fake_insert_brands)
+    monkeypatch.setattr(brands_collection, "bulk_write", fake_bulk_write)
+    monkeypatch.setattr(models_collection, "find", fake_find_models)
+    monkeypatch.setattr(models_collection, "insert_many", fake_insert_models)
+    monkeypatch.setattr(seed_service, "reserve_sequence", fake_reserve_sequence)
+
+    rows = [
+        {"name": "ILX", "average_price": 303176, "brand_name": "Acura"},
+        {"name": "MDX", "average_price": 448193, "brand_name": "Acura"},
+        {"name": "A3", "average_price": -1, "brand_name": "Audi"},
+        {"name": "A4", "average_price": 500000, "brand_name": "Audi"},
+        {"name": "A4", "average_price": 600000, "brand_name": "Audi"},
+        {"name": "A5", "average_price": 5000, "brand_name": "Audi"},
+    ]
+    summary = await bulk_populate(rows, batch_size=2)
+
+    assert summary["brands_created"] == 1
+    assert summary["models_inserted"] == 3
+    assert summary["duplicates_skipped"] == 2
+    assert summary["invalid_rows"] == 1
+    # Only the names being written are looked up, not every model of their brands.
+    assert model_queries == [
+        {
+            "$or": [
+                {"brand_id": 1, "name": {"$in": ["ILX", "MDX"]}},
+                {"brand_id": 10, "name": {"$in": ["A3", "A4"]}},
+            ]
+        }
+    ]
+    assert inserted_brands == [
+        {"_id": 10, "name": "Audi", "price_sum": 0, "price_count": 0}
+    ]
+    assert inserted_models == [
+        [
+            {"brand_id": 1, "name": "MDX", "average_price": 448193, "_id": 100},
+            {"brand_id": 10, "name": "A3", "average_price": 0, "_id": 101},
+        ],
+        [{"brand_id": 10, "name": "A4", "average_price": 500000, "_id": 102}],
+    ]
+    assert brand_updates == [
+        UpdateOne({"_id": 1}, {"$inc": {"price_sum": 448193, "price_count": 1}}),
+        UpdateOne({"_id": 10}, {"$inc": {"price_sum": 500000, "price_count": 2}}),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_duplicates_rejected_on_insert_are_skipped(monkeypatch, memory_storage):
+    await bulk_populate(
+        [{"brand_name": "Acura", "name": "ILX", "average_price": 200000}]
+    )
+
+    # A model inserted after the lookup, e.g. by a concurrent batch, is only caught by
+    # the unique index.
+    async def nothing_stored(keys):
+        return set()
+
+    monkeypatch.setattr(memory_storage.models, "existing_keys", nothing_stored)
+    summary = await bulk_populate(
+        [
+            {"brand_name": "Acura", "name": "ILX", "average_price": 300000},
+            {"brand_name": "Acura", "name": "MDX", "average_price": 400000},
+        ]
+    )
+
+    assert summary["models_inserted"] == 1
+    assert summary["duplicates_skipped"] == 1
+    models = [model async for model in memory_storage.models.iter_by_price()]
+    assert sorted(model["name"] for model in models) == ["ILX", "MDX"]
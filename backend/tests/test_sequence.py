@@ -0,0 +1,75 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.repositories import MemoryStorage, use_storage
+from app.utils.sequence import SequenceAllocator, get_allocator
+
+
+class FakeCounters:
+    def __init__(self, seq=0):
+        self.seq = seq
+        self.calls = 0
+
+    async def claim(self, name, count):
+        self.calls += 1
+        await asyncio.sleep(0)
+        self.seq += count
+        return self.seq
+
+
+@pytest.mark.asyncio
+async def test_allocator_serves_ids_from_blocks():
+    counters = FakeCounters(seq=5)
+
+    allocator = SequenceAllocator("models", block_size=10, repository=counters)
+    ids = [await allocator.next() for _ in range(12)]
+
+    assert ids == list(range(6, 18))
+    assert counters.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_allocators_are_unique_across_workers():
+    counters = FakeCounters()
+
+    workers = [
+        SequenceAllocator("models", block_size=7, repository=counters) for _ in range(3)
+    ]
+    ids = await asyncio.gather(
+        *(worker.next() for worker in workers for _ in range(20))
+    )
+
+    assert len(ids) == len(set(ids)) == 60
+    assert counters.calls == 9
+
+
+@pytest.mark.asyncio
+async def test_reserve_uses_remaining_block_and_one_claim():
+    counters = FakeCounters()
+
+    allocator = SequenceAllocator("models", block_size=10, repository=counters)
+    assert await allocator.next() == 1
+    ids = await allocator.reserve(25)
+
+    assert ids == list(range(2, 27))
+    assert counters.calls == 2
+    assert counters.seq == 30
+    assert await allocator.next() == 27
+
+
+@pytest.mark.asyncio
+async def test_allocator_follows_the_active_storage():
+    first = MemoryStorage()
+    previous = use_storage(first)
+    try:
+        assert await get_allocator("models").next() == 1
+        use_storage(MemoryStorage())
+        assert get_allocator("models").repository is not first.sequences
+        assert await get_allocator("models").next() == 1
+    finally:
+        use_storage(previous)
@@ -0,0 +1,78 @@
+import os
+import sys
+
+import pytest
+from uvicorn import Server
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import server
+
+
+def test_available_cpus_is_capped_by_the_cgroup_quota(tmp_path):
+    cpu_max = tmp_path / "cpu.max"
+    affinity = server.available_cpus(str(tmp_path / "missing"))
+    assert affinity >= 1
+
+    cpu_max.write_text("max 100000\n")
+    assert server.available_cpus(str(cpu_max)) == affinity
+
+    cpu_max.write_text("50000 100000\n")
+    assert server.available_cpus(str(cpu_max)) == 1
+
+    cpu_max.write_text(f"{(affinity + 4) * 100000} 100000\n")
+    assert server.available_cpus(str(cpu_max)) == affinity
+
+
+def test_workers_default_to_the_available_cpus(monkeypatch):
+    monkeypatch.setattr(server, "STORAGE_BACKEND", "mongo")
+    monkeypatch.setattr(server, "available_cpus", lambda: 3)
+    assert server.parse_args([]).workers == 3
+    assert server.parse_args(["--workers", "5"]).workers == 5
+
+
+def test_memory_backend_runs_a_single_worker(monkeypatch):
+    monkeypatch.setattr(server, "STORAGE_BACKEND", "memory")
+    with pytest.raises(SystemExit):
+        server.parse_args(["--workers", "2"])
+
+    args = server.parse_args(["--workers", "1", "--max-requests", "100"])
+    assert args.workers == 1
+    assert args.max_requests == 0
+
+
+def test_build_config(monkeypatch):
+    monkeypatch.setattr(server, "STORAGE_BACKEND", "mongo")
+    args = server.parse_args(
+        ["--workers", "4", "--port", "9000", "--backlog", "512", "--keep-alive", "10"]
+    )
+    config = server.build_config(args)
+    assert config.workers == 4
+    assert config.port == 9000
+    assert config.backlog == 512
+    assert config.timeout_keep_alive == 10
+    assert config.limit_max_requests == args.max_requests
+    assert config.loop in ("uvloop", "asyncio")
+    assert config.http in ("httptools", "h11")
+
+    args.max_requests = 0
+    assert server.build_config(args).limit_max_requests is None
+
+
+def test_recycling_limit_is_jittered_per_worker(monkeypatch):
+    monkeypatch.setattr(server, "STORAGE_BACKEND", "mongo")
+    monkeypatch.setattr(Server, "run", lambda self, sockets=None: None)
+    args = server.parse_args(["--workers", "2", "--max-requests", "1000"])
+
+    limits = set()
+    for _ in range(20):
+        worker = server.RecyclingServer(server.build_config(args), jitter=500)
+        worker.run()
+        limits.add(worker.config.limit_max_requests)
+    assert all(1000 <= limit <= 1500 for limit in limits)
+    assert len(limits) > 1
+
+    args.max_requests = 0
+    worker = server.RecyclingServer(server.build_config(args), jitter=500)
+    worker.run()
+    assert worker.config.limit_max_requests is None
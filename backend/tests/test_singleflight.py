@@ -0,0 +1,149 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services import brand_service
+from app.services.cache import CatalogCache
+from app.services.singleflight import SingleFlight
+
+
+class Loader:
+    """
+    Load that blocks until the test releases it, counting how many times it ran.
+    """
+
+    def __init__(self, value="value", error=None):
+        self.value = value
+        self.error = error
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return [self.value]
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_load():
+    flights = SingleFlight(enabled=True)
+    loader = Loader()
+
+    callers = [
+        asyncio.create_task(flights.do("key", loader, "brands")) for _ in range(5)
+    ]
+    other = asyncio.create_task(flights.do("other", loader, "brands"))
+    await settle()
+    assert flights.in_flight() == 2
+    loader.release.set()
+    results = await asyncio.gather(*callers)
+
+    assert loader.calls == 2
+    assert all(result is results[0] for result in results)
+    assert await other == ["value"]
+    assert flights.in_flight() == 0
+    assert flights.stats() == {
+        "brands": {"calls": 6, "loads": 2, "coalesced": 4, "errors": 0}
+    }
+
+    # A call after the load finished loads again.
+    assert await flights.do("key", loader, "brands") == ["value"]
+    assert loader.calls == 3
+
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_caller():
+    flights = SingleFlight(enabled=True)
+    loader = Loader(error=RuntimeError("database down"))
+
+    callers = [asyncio.create_task(flights.do("key", loader)) for _ in range(3)]
+    await settle()
+    loader.release.set()
+    results = await asyncio.gather(*callers, return_exceptions=True)
+
+    assert loader.calls == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert flights.stats()[""]["errors"] == 1
+
+    # The failed load is not reused.
+    loader.error = None
+    assert await flights.do("key", loader) == ["value"]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_the_load():
+    flights = SingleFlight(enabled=True)
+    loader = Loader()
+
+    first = asyncio.create_task(flights.do("key", loader))
+    second = asyncio.create_task(flights.do("key", loader))
+    await settle()
+    first.cancel()
+    await settle()
+    loader.release.set()
+
+    assert await second == ["value"]
+    assert first.cancelled()
+    assert loader.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_disabled_loads_every_call():
+    flights = SingleFlight(enabled=False)
+    loader = Loader()
+    loader.release.set()
+
+    await asyncio.gather(*(flights.do("key", loader) for _ in range(3)))
+    assert loader.calls == 3
+    assert flights.stats()[""] == {"calls": 3, "loads": 3, "coalesced": 0, "errors": 0}
+
+
+@pytest.mark.asyncio
+async def test_cache_does_not_share_loads_across_writes():
+    cache = CatalogCache(
+        max_entries=10, ttl=60, enabled=False, single_flight=SingleFlight(enabled=True)
+    )
+    loader = Loader()
+
+    before = [
+        asyncio.create_task(cache.get_or_load("brands", "all", loader, True))
+        for _ in range(2)
+    ]
+    await settle()
+    cache.invalidate("brands", 1)
+    after = asyncio.create_task(cache.get_or_load("brands", "all", loader, True))
+    await settle()
+    loader.release.set()
+    await asyncio.gather(*before, after)
+
+    # The callers before the write share a load; the one after it does not join it.
+    assert loader.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_get_all_brands_burst_reads_once(monkeypatch, memory_storage):
+    await memory_storage.brands.insert_many([{"_id": 1, "name": "Acura"}])
+    reads = []
+    list_all = memory_storage.brands.list_all
+
+    async def slow_list_all():
+        reads.append(1)
+        await asyncio.sleep(0.01)
+        return await list_all()
+
+    monkeypatch.setattr(memory_storage.brands, "list_all", slow_list_all)
+
+    results = await asyncio.gather(*(brand_service.get_all_brands() for _ in range(20)))
+    assert len(reads) == 1
+    assert results[0] == [{"id": 1, "name": "Acura", "average_price": 0}]
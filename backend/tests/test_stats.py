@@ -0,0 +1,167 @@
+import os
+import statistics
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.main import app
+from app.services.cache import cache
+from app.services.price_index import price_index
+from app.services.stats_service import get_price_stats, summarize_prices
+
+MODELS = [
+    {"_id": 1, "name": "ILX", "average_price": 300000, "brand_id": 1},
+    {"_id": 2, "name": "MDX", "average_price": 500000, "brand_id": 1},
+    {"_id": 3, "name": "RDX", "average_price": None, "brand_id": 1},
+    {"_id": 4, "name": "A4", "average_price": 400000, "brand_id": 2},
+    {"_id": 5, "name": "A6", "average_price": 700000, "brand_id": 2},
+]
+
+
+def test_summarize_prices():
+    prices = [100.0, 200.0, 200.0, 300.0, 700.0]
+    stats = summarize_prices(prices, buckets=3)
+
+    assert stats["count"] == 5
+    assert (stats["min"], stats["max"]) == (100.0, 700.0)
+    assert stats["mean"] == statistics.fmean(prices)
+    assert stats["std"] == round(statistics.pstdev(prices), 2)
+    assert stats["percentiles"]["p50"] == 200.0
+    assert stats["percentiles"]["p25"] == 200.0
+    assert stats["percentiles"]["p75"] == 300.0
+    assert stats["percentiles"]["p90"] == 540.0
+    assert stats["histogram"] == [
+        {"lower": 100.0, "upper": 300.0, "count": 3},
+        {"lower": 300.0, "upper": 500.0, "count": 1},
+        {"lower": 500.0, "upper": 700.0, "count": 1},
+    ]
+    assert sum(b["count"] for b in summarize_prices(prices, 7)["histogram"]) == 5
+
+
+def test_summarize_prices_edge_cases():
+    assert summarize_prices([]) == {
+        "count": 0,
+        "min": None,
+        "max": None,
+        "mean": None,
+        "std": None,
+        "percentiles": {},
+        "histogram": [],
+    }
+    single = summarize_prices([250.0])
+    assert single["std"] == 0
+    assert single["percentiles"]["p99"] == 250.0
+    assert single["histogram"] == [{"lower": 250.0, "upper": 250.0, "count": 1}]
+
+
+@pytest.mark.asyncio
+async def test_repository_prices(memory_storage):
+    await memory_storage.models.insert_many(MODELS)
+
+    assert await memory_storage.models.prices() == [300000, 400000, 500000, 700000]
+    assert await memory_storage.models.prices(greater=300000, lower=700000) == [
+        400000,
+        500000,
+    ]
+    assert await memory_storage.models.prices(brand_id=1) == [300000, 500000]
+    assert await memory_storage.models.prices(lower=400000, brand_id=1) == [300000]
+
+
+@pytest.mark.asyncio
+async def test_mongo_prices_query(monkeypatch, mongo_storage):
+    queries = []
+
+    class Cursor:
+        def __init__(self, documents):
+            self.documents = iter(documents)
+
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            try:
+                return next(self.documents)
+            except StopIteration:
+                raise StopAsyncIteration
+
+    def find(query, projection):
+        queries.append((query, projection))
+        return Cursor([{"average_price": 500000}, {"average_price": 300000}])
+
+    monkeypatch.setattr(mongo_storage.models.collection, "find", find)
+
+    assert await mongo_storage.models.prices(brand_id=1) == [300000, 500000]
+    await mongo_storage.models.prices(greater=100)
+    assert queries == [
+        (
+            {"average_price": {"$ne": None}, "brand_id": 1},
+            {"_id": 0, "average_price": 1},
+        ),
+        ({"average_price": {"$gt": 100}}, {"_id": 0, "average_price": 1}),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_stats_are_cached_until_models_change(monkeypatch, memory_storage):
+    await memory_storage.models.insert_many(MODELS)
+    loads = []
+    prices = memory_storage.models.prices
+
+    async def counting_prices(*args):
+        loads.append(args)
+        return await prices(*args)
+
+    monkeypatch.setattr(memory_storage.models, "prices", counting_prices)
+
+    first = await get_price_stats(greater=350000)
+    assert first["count"] == 3
+    assert await get_price_stats(greater=350000) is first
+    assert len(loads) == 1
+
+    await memory_storage.models.set_price(4, 100000)
+    cache.invalidate("models", 4)
+    assert (await get_price_stats(greater=350000))["count"] == 2
+    assert len(loads) == 2
+
+
+@pytest.mark.asyncio
+async def test_catalog_stats_use_the_price_index(monkeypatch, memory_storage):
+    monkeypatch.setattr(price_index, "ready", True)
+    monkeypatch.setattr(price_index, "prices", lambda greater, lower: [1.0, 3.0])
+
+    stats = await get_price_stats(lower=5)
+    assert (stats["count"], stats["mean"]) == (2, 2.0)
+
+
+def test_stats_endpoints(memory_storage):
+    client = TestClient(app)
+    acura = client.post("/brands", json={"name": "Acura"}).json()
+    for name, price in (("ILX", 300000), ("MDX", 500000), ("TLX", 400000)):
+        client.post(
+            f"/brands/{acura['id']}/models", json={"name": name, "average_price": price}
+        )
+
+    response = client.get("/stats", params={"greater": 300000, "buckets": 2})
+    stats = response.json()
+    assert stats["count"] == 2
+    assert stats["percentiles"]["p50"] == 450000.0
+    assert stats["histogram"] == [
+        {"lower": 400000.0, "upper": 450000.0, "count": 1},
+        {"lower": 450000.0, "upper": 500000.0, "count": 1},
+    ]
+    assert (
+        client.get(
+            "/stats",
+            params={"greater": 300000, "buckets": 2},
+            headers={"If-None-Match": response.headers["etag"]},
+        ).status_code
+        == 304
+    )
+
+    brand = client.get(f"/brands/{acura['id']}/stats").json()
+    assert (brand["count"], brand["min"], brand["max"]) == (3, 300000.0, 500000.0)
+    assert client.get("/brands/999/stats").status_code == 404
+    assert client.get("/stats", params={"buckets": 0}).status_code == 422
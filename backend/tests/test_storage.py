@@ -0,0 +1,138 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.models import BrandCreate, ModelCreate, ModelPriceUpdate, ModelUpdate
+from app.repositories import DuplicateError, MemoryStorage
+from app.services.brand_service import (
+    create_brand,
+    get_all_brands,
+    recompute_brand_price_totals,
+)
+from app.services.model_service import (
+    create_model_for_brand,
+    create_models_for_brand,
+    get_models_by_brand_page,
+    get_models_filtered,
+    get_models_filtered_page,
+    update_model,
+    update_models,
+)
+from app.services.seed_service import bulk_populate
+
+
+@pytest.mark.asyncio
+async def test_services_on_memory_storage(memory_storage):
+    acura, _ = await create_brand(BrandCreate(name="Acura"))
+    assert await create_brand(BrandCreate(name="Acura")) == (None, "La marca ya existe")
+
+    await create_model_for_brand(
+        acura["id"], ModelCreate(name="ILX", average_price=300000)
+    )
+    _, error = await create_model_for_brand(acura["id"], ModelCreate(name="ILX"))
+    assert error == "El modelo ya existe para la marca"
+
+    results, _ = await create_models_for_brand(
+        acura["id"],
+        [
+            ModelCreate(name="MDX", average_price=500000),
+            ModelCreate(name="MDX", average_price=600000),
+            ModelCreate(name="RDX"),
+        ],
+    )
+    assert results[1] == (None, "El modelo ya existe para la marca")
+
+    updated, _ = await update_model(
+        str(results[0][0]["id"]), ModelUpdate(average_price=400000)
+    )
+    assert updated["average_price"] == 400000
+    await update_models(
+        [ModelPriceUpdate(id=results[2][0]["id"], average_price=200000)]
+    )
+
+    assert await get_all_brands() == [
+        {"id": 1, "name": "Acura", "average_price": 300000}
+    ]
+    assert [m["name"] for m in await get_models_filtered(greater=250000)] == [
+        "ILX",
+        "MDX",
+    ]
+    assert await recompute_brand_price_totals() == 0
+
+
+@pytest.mark.asyncio
+async def test_memory_pagination_matches_mongo_order(memory_storage):
+    await bulk_populate([{"brand_name": "Acura", "name": "M0", "average_price": 0}])
+    await memory_storage.models.set_prices({1: None})
+    await create_models_for_brand(
+        1,
+        [
+            ModelCreate(name="M1", average_price=200000),
+            ModelCreate(name="M2", average_price=150000),
+            ModelCreate(name="M3"),
+            ModelCreate(name="M4", average_price=200000),
+        ],
+    )
+
+    seen = []
+    after = None
+    while True:
+        page, error = await get_models_filtered_page(limit=2, after=after)
+        assert error is None
+        seen.extend(m["id"] for m in page["items"])
+        after = page["next_cursor"]
+        if after is None:
+            break
+    assert seen == [1, 4, 3, 2, 5]
+
+    page, _ = await get_models_filtered_page(greater=100000, limit=2, descending=True)
+    assert [m["id"] for m in page["items"]] == [5, 2]
+    page, _ = await get_models_filtered_page(
+        greater=100000, limit=2, after=page["next_cursor"], descending=True
+    )
+    assert [m["id"] for m in page["items"]] == [3]
+
+    page, _ = await get_models_by_brand_page(1, limit=3, descending=True)
+    assert [m["id"] for m in page["items"]] == [5, 4, 3]
+    assert page["items"][1]["average_price"] == 0
+
+
+@pytest.mark.asyncio
+async def test_memory_journal_replay(tmp_path):
+    path = str(tmp_path / "catalog.journal")
+    storage = MemoryStorage(path)
+    assert await storage.sequences.claim("brands", 50) == 50
+    await storage.brands.insert(
+        {"_id": 1, "name": "Acura", "price_sum": 0, "price_count": 0}
+    )
+    await storage.models.insert_many(
+        [
+            {"_id": 1, "brand_id": 1, "name": "ILX", "average_price": 300000},
+            {"_id": 2, "brand_id": 1, "name": "MDX", "average_price": None},
+        ]
+    )
+    await storage.models.set_price(2, 500000)
+    await storage.brands.increment_totals(1, 800000, 2)
+    await storage.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('["models","set_prices",[[1,')
+
+    restored = MemoryStorage(path)
+    assert await restored.sequences.claim("brands", 50) == 100
+    assert await restored.brands.get(1) == {
+        "_id": 1,
+        "name": "Acura",
+        "price_sum": 800000,
+        "price_count": 2,
+    }
+    assert [
+        m["_id"] for m in await restored.models.page_by_price(400000, None, 10)
+    ] == [2]
+    with pytest.raises(DuplicateError):
+        await restored.models.insert({"_id": 3, "brand_id": 1, "name": "ILX"})
+    await restored.close()
+    with open(path, encoding="utf-8") as f:
+        assert f.read().endswith("\n")
@@ -0,0 +1,119 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.models import ModelUpdate
+from app.services import brand_service, model_service
+from app.services.write_queue import PriceWriteQueue
+from app.utils.metrics import price_write_batch_size
+
+
+class FakeWriter:
+    """
+    Stand-in for `update_models` that records every batch it writes.
+    """
+
+    def __init__(self, error=None):
+        self.batches = []
+        self.error = error
+
+    async def __call__(self, updates):
+        self.batches.append([(update.id, update.average_price) for update in updates])
+        if self.error is not None:
+            raise self.error
+        return [
+            ({"id": update.id, "average_price": update.average_price}, None)
+            for update in updates
+        ]
+
+
+@pytest.mark.asyncio
+async def test_updates_are_coalesced_and_flushed_on_time():
+    writer = FakeWriter()
+    queue = PriceWriteQueue(
+        enabled=True, batch_size=10, flush_interval=0.01, writer=writer
+    )
+    price_write_batch_size.clear()
+
+    first = queue.submit(1, 150000)
+    second = queue.submit(2, 200000)
+    last = queue.submit(1, 300000)
+    assert queue.pending() == 2
+    results = await asyncio.gather(first, second, last)
+
+    assert writer.batches == [[(1, 300000), (2, 200000)]]
+    assert results[0] == results[2] == ({"id": 1, "average_price": 300000}, None)
+    assert results[1] == ({"id": 2, "average_price": 200000}, None)
+    assert queue.stats() == {
+        "pending": 0,
+        "updates": 3,
+        "coalesced": 1,
+        "flushes": 1,
+        "failures": 0,
+    }
+    assert "catalog_price_write_batch_size_count 1" in price_write_batch_size.render()
+
+
+@pytest.mark.asyncio
+async def test_full_batch_is_flushed_without_waiting():
+    writer = FakeWriter()
+    queue = PriceWriteQueue(
+        enabled=True, batch_size=2, flush_interval=60, writer=writer
+    )
+
+    futures = [queue.submit(model_id, 150000) for model_id in (1, 2, 3)]
+    await asyncio.wait_for(asyncio.gather(*futures[:2]), 1)
+    assert writer.batches == [[(1, 150000), (2, 150000)]]
+    assert queue.pending() == 1
+
+    await queue.drain()
+    assert writer.batches[-1] == [(3, 150000)]
+    assert futures[2].done()
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_reaches_every_caller():
+    queue = PriceWriteQueue(
+        enabled=True,
+        batch_size=10,
+        flush_interval=0.001,
+        writer=FakeWriter(error=RuntimeError("database down")),
+    )
+
+    futures = [queue.submit(1, 150000), queue.submit(2, 150000)]
+    results = await asyncio.gather(*futures, return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert queue.failures == 1
+
+
+@pytest.mark.asyncio
+async def test_update_model_waits_for_the_flush(monkeypatch, memory_storage):
+    await memory_storage.brands.insert_many([{"_id": 1, "name": "Acura"}])
+    await memory_storage.models.insert_many(
+        [
+            {"_id": 1, "name": "ILX", "average_price": 300000, "brand_id": 1},
+            {"_id": 2, "name": "MDX", "average_price": None, "brand_id": 1},
+        ]
+    )
+    await brand_service.recompute_brand_price_totals()
+    queue = PriceWriteQueue(enabled=True, batch_size=100, flush_interval=0.01)
+    monkeypatch.setattr(model_service, "price_write_queue", queue)
+
+    results = await asyncio.gather(
+        model_service.update_model("1", ModelUpdate(average_price=400000)),
+        model_service.update_model("2", ModelUpdate(average_price=500000)),
+        model_service.update_model("3", ModelUpdate(average_price=500000)),
+    )
+
+    assert queue.flushes == 1
+    assert results[0][0]["average_price"] == 400000
+    assert results[1][0]["name"] == "MDX"
+    assert results[2] == (None, "El modelo no existe")
+    assert (await memory_storage.models.get_many([1]))[0]["average_price"] == 400000
+    brands = await brand_service.get_all_brands()
+    assert brands[0]["average_price"] == 450000